@@ -0,0 +1,236 @@
+"""
+generate_synthetic_data.py
+
+Generador de datos sintéticos para pruebas de escala de TelcoVision.
+
+Funcionalidad:
+1. Ajusta un perfil sobre `data/raw/telco_churn.csv`:
+   - churn y contract_type como distribución conjunta
+   - resto de categóricas condicionadas a churn (phone_service/multiple_lines en conjunto)
+   - tenure_months | (contract_type, churn) y monthly_charges | internet_service por cuantiles empíricos
+   - total_charges = tenure_months * monthly_charges * ratio (ratio con su distribución empírica)
+2. Genera N filas con el mismo esquema crudo, vectorizado con NumPy
+3. Los chunks se generan y serializan en paralelo (joblib) y se escriben en orden al CSV de salida
+4. `customer_id` estable: depende sólo de la posición global de la fila (y de --id-offset);
+   con la misma semilla y --chunk-size, el resultado no depende de --n-jobs
+
+Uso:
+python scripts/generate_synthetic_data.py --rows 10000000 --out data/raw/telco_churn_10m.csv
+
+Notas:
+- Las semillas se derivan por chunk (SeedSequence), por eso --chunk-size afecta los valores generados
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+
+RAW_COLUMNS = [
+    "customer_id", "age", "gender", "region", "contract_type", "tenure_months",
+    "monthly_charges", "total_charges", "internet_service", "phone_service",
+    "multiple_lines", "payment_method", "churn",
+]
+CHURN_CONDITIONED = ["gender", "region", "internet_service", "payment_method"]
+QUANTILE_LEVELS = np.linspace(0.0, 1.0, 201)
+
+
+def _quantiles(x: pd.Series) -> List[float]:
+    return np.quantile(x.to_numpy(dtype=np.float64), QUANTILE_LEVELS).tolist()
+
+
+def fit_profile(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Ajusta el perfil (marginales + dependencias clave) a partir del dataset crudo.
+
+    Returns:
+        Diccionario serializable a JSON con tablas de probabilidad y cuantiles
+    """
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    df["churn"] = pd.to_numeric(df["churn"], errors="coerce").fillna(0).astype(int)
+    for col in ("age", "tenure_months", "monthly_charges", "total_charges"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["age", "tenure_months", "monthly_charges", "total_charges"])
+
+    profile: Dict[str, Any] = {"n_source_rows": int(len(df))}
+
+    # churn x contract_type conjunta
+    joint = df.groupby(["churn", "contract_type"]).size()
+    profile["churn_contract"] = {
+        "cells": [[int(c), str(k)] for c, k in joint.index],
+        "p": (joint / joint.sum()).tolist(),
+    }
+
+    # categóricas condicionadas a churn
+    profile["categorical"] = {}
+    for col in CHURN_CONDITIONED + ["phone_lines"]:
+        if col == "phone_lines":
+            values = df["phone_service"].astype(str) + "|" + df["multiple_lines"].astype(str)
+        else:
+            values = df[col].astype(str)
+        table = pd.crosstab(df["churn"], values, normalize="index")
+        profile["categorical"][col] = {
+            "categories": table.columns.tolist(),
+            "p": {str(c): table.loc[c].tolist() for c in table.index},
+        }
+
+    profile["age"] = _quantiles(df["age"])
+    profile["tenure_months"] = {
+        f"{c}|{k}": _quantiles(g["tenure_months"]) for (c, k), g in df.groupby(["churn", "contract_type"])
+    }
+    profile["monthly_charges"] = {
+        str(k): _quantiles(g["monthly_charges"]) for k, g in df.groupby("internet_service")
+    }
+    ratio = df["total_charges"] / (df["tenure_months"] * df["monthly_charges"]).clip(lower=1e-9)
+    profile["charges_ratio"] = _quantiles(ratio)
+    profile["bounds"] = {
+        col: [float(df[col].min()), float(df[col].max())]
+        for col in ("age", "tenure_months", "monthly_charges", "total_charges")
+    }
+    return profile
+
+
+def _sample_quantiles(rng: np.random.Generator, quantiles: List[float], n: int) -> np.ndarray:
+    """Muestreo por CDF inversa interpolando los cuantiles empíricos."""
+    return np.interp(rng.random(n), QUANTILE_LEVELS, quantiles)
+
+
+def _sample_conditional(rng: np.random.Generator, table: np.ndarray, cond: np.ndarray) -> np.ndarray:
+    """Muestrea un código por fila desde la fila `cond` de una tabla de probabilidades."""
+    cum = np.cumsum(table, axis=1)[cond]
+    cum[:, -1] = 1.0
+    return (rng.random(cond.size)[:, None] > cum).sum(axis=1)
+
+
+def generate_chunk(profile: Dict[str, Any], start: int, n: int, seed: np.random.SeedSequence,
+                   id_offset: int = 0, id_width: int = 8) -> pd.DataFrame:
+    """Genera `n` filas con el esquema crudo; los ids van desde start + id_offset + 1."""
+    rng = np.random.default_rng(seed)
+    bounds = profile["bounds"]
+
+    cells = profile["churn_contract"]["cells"]
+    cell = rng.choice(len(cells), size=n, p=profile["churn_contract"]["p"])
+    churn = np.array([c for c, _ in cells], dtype=np.int64)[cell]
+    contract = np.array([k for _, k in cells], dtype=object)[cell]
+
+    out: Dict[str, Any] = {}
+    for col, spec in profile["categorical"].items():
+        cats = np.asarray(spec["categories"], dtype=object)
+        table = np.array([spec["p"].get(str(c), spec["p"][next(iter(spec["p"]))]) for c in (0, 1)])
+        out[col] = cats[_sample_conditional(rng, table, churn)]
+    phone_lines = pd.Series(out.pop("phone_lines")).str.split("|", n=1, expand=True)
+
+    tenure = np.empty(n, dtype=np.float64)
+    for key, q in profile["tenure_months"].items():
+        c, k = key.split("|", 1)
+        mask = (churn == int(c)) & (contract == k)
+        tenure[mask] = _sample_quantiles(rng, q, int(mask.sum()))
+    tenure = np.clip(np.rint(tenure), *bounds["tenure_months"]).astype(np.int64)
+
+    monthly = np.empty(n, dtype=np.float64)
+    for key, q in profile["monthly_charges"].items():
+        mask = out["internet_service"] == key
+        monthly[mask] = _sample_quantiles(rng, q, int(mask.sum()))
+    monthly = np.round(np.clip(monthly, *bounds["monthly_charges"]), 2)
+
+    total = tenure * monthly * _sample_quantiles(rng, profile["charges_ratio"], n)
+    total = np.round(np.maximum(total, bounds["total_charges"][0]), 2)
+
+    age = np.clip(np.rint(_sample_quantiles(rng, profile["age"], n)), *bounds["age"]).astype(np.int64)
+    ids = np.arange(start + id_offset + 1, start + id_offset + n + 1)
+
+    return pd.DataFrame({
+        "customer_id": np.char.add("CUST", np.char.zfill(ids.astype(str), id_width)),
+        "age": age,
+        "gender": out["gender"],
+        "region": out["region"],
+        "contract_type": contract,
+        "tenure_months": tenure,
+        "monthly_charges": monthly,
+        "total_charges": total,
+        "internet_service": out["internet_service"],
+        "phone_service": phone_lines[0].to_numpy(),
+        "multiple_lines": phone_lines[1].to_numpy(),
+        "payment_method": out["payment_method"],
+        "churn": churn,
+    }, columns=RAW_COLUMNS)
+
+
+def _chunk_csv(profile: Dict[str, Any], start: int, n: int, seed: np.random.SeedSequence,
+               id_offset: int, id_width: int) -> bytes:
+    """Genera y serializa un chunk en el worker (la serialización CSV es lo más costoso)."""
+    df = generate_chunk(profile, start, n, seed, id_offset, id_width)
+    return df.to_csv(index=False, header=False).encode("utf-8")
+
+
+def generate_to_csv(
+    profile: Dict[str, Any],
+    rows: int,
+    out_path: Path,
+    chunk_size: int = 500_000,
+    n_jobs: int = -1,
+    seed: int = 42,
+    id_offset: int = 0
+) -> float:
+    """
+    Genera `rows` filas en paralelo y las escribe en orden en `out_path`.
+
+    Returns:
+        Segundos totales de generación
+    """
+    id_width = max(8, len(str(rows + id_offset)))
+    starts = list(range(0, rows, chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(out_path, "wb") as f:
+        f.write((",".join(RAW_COLUMNS) + "\n").encode("utf-8"))
+        chunks = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(_chunk_csv)(profile, s, min(chunk_size, rows - s), sd, id_offset, id_width)
+            for s, sd in zip(starts, seeds)
+        )
+        for i, data in enumerate(chunks, 1):
+            f.write(data)
+            print(f"   chunk {i}/{len(starts)} escrito")
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar dataset crudo sintético para pruebas de escala")
+    parser.add_argument("--source", default="data/raw/telco_churn.csv", help="CSV crudo para ajustar el perfil")
+    parser.add_argument("--rows", type=int, required=True, help="Cantidad de filas a generar")
+    parser.add_argument("--out", required=True, help="CSV de salida (mismo esquema que el crudo)")
+    parser.add_argument("--chunk-size", type=int, default=500_000, help="Filas por chunk (default: 500000)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Procesos en paralelo (default: -1 = todos)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla base (default: 42)")
+    parser.add_argument("--id-offset", type=int, default=0, help="Desplazamiento para customer_id (default: 0)")
+    parser.add_argument("--save-profile", help="Guardar el perfil ajustado en JSON (opcional)")
+
+    args = parser.parse_args()
+
+    print(f"🔍 Ajustando perfil sobre: {args.source}")
+    profile = fit_profile(pd.read_csv(args.source))
+    if args.save_profile:
+        Path(args.save_profile).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save_profile, "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=2)
+        print(f"💾 Perfil guardado: {args.save_profile}")
+
+    print(f"🚀 Generando {args.rows:,} filas en chunks de {args.chunk_size:,}...")
+    elapsed = generate_to_csv(profile, args.rows, Path(args.out), args.chunk_size,
+                              args.n_jobs, args.seed, args.id_offset)
+    print(f"\n✅ Dataset sintético guardado: {args.out}")
+    print(f"   Filas: {args.rows:,} | Tiempo: {elapsed:.1f}s | {args.rows / max(elapsed, 1e-9):,.0f} filas/s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
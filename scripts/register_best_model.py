@@ -6,7 +6,11 @@ Script para registrar el mejor modelo en MLflow Model Registry.
 Flujo:
 1. Busca todos los runs del experimento
 2. Ordena por la métrica especificada (default: roc_auc)
-3. Registra el mejor run en el Model Registry con el nombre especificado
+3. Sube al artefacto del modelo el umbral, el calibrador y las medianas de imputación
+   (`models/`), verificando que se ajustaron para el modelo de ese run
+4. Registra el mejor run en el Model Registry con el nombre especificado
+5. Promueve la versión al stage (default: Production) archivando las anteriores;
+   `serving.py` con `source: mlflow` recarga la versión nueva de ese stage
 
 Uso:
 python scripts/register_best_model.py --experiment telcovision_experiments --metric roc_auc --model-name TelcoChurn_Model
@@ -14,9 +18,11 @@ python scripts/register_best_model.py --experiment telcovision_experiments --met
 Requisitos:
 - MLflow debe estar configurado (MLFLOW_TRACKING_URI en .env)
 - Debe haber al menos un run completado en el experimento
+- Los sidecars de `models/` deben corresponder al modelo del run (tag `model_version` de train.py)
 """
 
 import argparse
+import json
 import os
 from pathlib import Path
 from typing import Optional
@@ -24,6 +30,10 @@ from typing import Optional
 import mlflow
 from mlflow.tracking import MlflowClient
 
+SIDECAR_FILES = ["decision_policy.json", "calibrator.json", "imputation.json"]
+# Ajustados para un artefacto puntual: guardan su sha256 en `model_version`
+VERSIONED_SIDECARS = ["decision_policy.json", "calibrator.json"]
+
 
 def find_best_run(
     experiment_name: str,
@@ -66,6 +76,44 @@ def find_best_run(
     return runs[0]
 
 
+def log_sidecars(
+    run_id: str,
+    sidecar_dir: str = "models",
+    artifact_path: str = "model"
+) -> None:
+    """
+    Sube los sidecars de scoring al artefacto del modelo del run (quedan en la versión registrada).
+    
+    Args:
+        run_id: ID del run que contiene el modelo
+        sidecar_dir: Directorio con decision_policy.json, calibrator.json e imputation.json
+        artifact_path: Path del artefacto del modelo dentro del run
+    
+    Raises:
+        FileNotFoundError: si falta algún sidecar
+        ValueError: si el umbral o el calibrador se ajustaron para otro modelo
+    """
+    client = MlflowClient()
+    run_version = client.get_run(run_id).data.tags.get("model_version")
+    if run_version is None:
+        raise ValueError(f"El run {run_id} no tiene el tag 'model_version' (reentrenar con src/train.py)")
+    
+    for name in SIDECAR_FILES:
+        path = Path(sidecar_dir) / name
+        if not path.exists():
+            raise FileNotFoundError(f"Falta {path}: correr calibrate y threshold antes de registrar")
+        if name in VERSIONED_SIDECARS:
+            with open(path, "r", encoding="utf-8") as f:
+                fitted_for = json.load(f).get("model_version")
+            if fitted_for != run_version:
+                raise ValueError(
+                    f"{path} se ajustó para el modelo {fitted_for}, no para el del run ({run_version}); "
+                    "usar --run-id con el run de ese modelo o recalcular calibrate/threshold"
+                )
+        client.log_artifact(run_id, str(path), artifact_path)
+        print(f"📎 {name} agregado a runs:/{run_id}/{artifact_path}")
+
+
 def register_model(
     run_id: str,
     model_name: str,
@@ -112,6 +160,25 @@ def register_model(
         raise
 
 
+def promote_model(model_name: str, version: str, stage: str = "Production") -> None:
+    """
+    Mueve la versión al stage y archiva las que estaban en él (el servicio sigue ese stage).
+    
+    Args:
+        model_name: Nombre del modelo en el registry
+        version: Versión a promover
+        stage: Stage destino (Staging o Production)
+    """
+    client = MlflowClient()
+    client.transition_model_version_stage(
+        name=model_name,
+        version=version,
+        stage=stage,
+        archive_existing_versions=True
+    )
+    print(f"🚀 {model_name} versión {version} promovida a {stage} (versiones previas archivadas)")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Registrar mejor modelo en MLflow Model Registry")
     parser.add_argument(
@@ -143,6 +210,16 @@ def main():
         "--run-id",
         help="Run ID específico a registrar (opcional, ignora búsqueda automática)"
     )
+    parser.add_argument(
+        "--sidecar-dir",
+        default="models",
+        help="Directorio con umbral, calibrador e imputación del modelo (default: models)"
+    )
+    parser.add_argument(
+        "--stage",
+        default="Production",
+        help="Stage al que se promueve la versión (default: Production; 'None' para no promover)"
+    )
     
     args = parser.parse_args()
     
@@ -176,12 +253,16 @@ def main():
         print(f"   {args.metric}: {best_run.data.metrics.get(args.metric, 'N/A')}")
         print(f"   Otros params: {best_run.data.params}")
     
-    # Registrar modelo
+    # Registrar modelo (con sus sidecars) y promoverlo
     try:
+        log_sidecars(run_id, args.sidecar_dir, args.artifact_path)
         version = register_model(run_id, args.model_name, args.artifact_path)
+        if args.stage != "None":
+            promote_model(args.model_name, version, args.stage)
         print(f"\n🎉 Registro exitoso!")
         print(f"   Modelo: {args.model_name}")
         print(f"   Versión: {version}")
+        print(f"   Stage: {args.stage}")
         print(f"   Run ID: {run_id}")
         
     except Exception as e:
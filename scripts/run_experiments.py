@@ -5,13 +5,24 @@ Script para ejecutar múltiples experimentos con diferentes configuraciones de h
 
 Funcionalidad:
 1. Lee configuraciones desde params_experiments/*.yaml
-2. Ejecuta train.py para cada configuración
-3. Registra cada experimento en MLflow con tags descriptivos
-4. Genera reporte comparativo al final
+2. Ejecuta train.py para cada configuración (en paralelo con --jobs)
+3. Cada experimento escribe en su propio directorio: models/experiments/<config>/
+4. Registra cada experimento en MLflow con tags descriptivos
+5. Genera reporte comparativo al final:
+   - agrega el costo de serving de cada experimento (`serving_cost.json`: tamaño, carga,
+     nodos de árbol, latencia p50/p99 a batch 1/100/10k)
+   - marca los experimentos Pareto-óptimos (ROC-AUC vs latencia y tamaño) y grafica la vista
+   - con --seeds N, media e IC 95% por métrica (train.py --seeds); el ranking usa la media
+   - excluye de la selección del mejor modelo a los que no cumplen los presupuestos
+     (`experiments_report.budgets` en params.yaml o --max-model-mb / --max-p99-ms)
 
 Uso:
 python scripts/run_experiments.py --configs params_experiments/ --experiment telcovision_experiments
 
+# Sólo reporte, a partir de las métricas ya generadas (stage `experiments_report` de DVC);
+# recorre la lista `experiments` de params.yaml, igual que el foreach de `train_experiment`
+python scripts/run_experiments.py --report-only
+
 Estructura esperada de params_experiments/:
     params_experiments/
     ├── exp1_rf_baseline.yaml
@@ -25,11 +36,17 @@ import json
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
 import yaml
 import pandas as pd
 
+# Módulos de src/ (gobernador de CPU compartido con train.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from resources import cpu_budget, plan_parallelism, thread_env  # noqa: E402
+
 
 def load_experiment_configs(configs_dir: Path) -> List[Dict[str, Any]]:
     """Carga todas las configuraciones .yaml del directorio."""
@@ -58,10 +75,20 @@ def load_experiment_configs(configs_dir: Path) -> List[Dict[str, Any]]:
     return configs
 
 
+def experiment_output_paths(models_dir: Path, config_path: Path) -> Tuple[Path, Path]:
+    """Rutas de modelo y métricas propias de un experimento (no se pisan entre sí)."""
+    exp_dir = models_dir / config_path.stem
+    return exp_dir / "model.joblib", exp_dir / "metrics.json"
+
+
 def run_training(
     config_path: Path,
     experiment_name: str,
-    use_mlflow: bool = True
+    use_mlflow: bool = True,
+    models_dir: Path = Path("models/experiments"),
+    seeds: int = 0,
+    seed_jobs: int = -1,
+    threads: int = 0
 ) -> Dict[str, Any]:
     """
     Ejecuta train.py con una configuración específica.
@@ -69,17 +96,22 @@ def run_training(
     Returns:
         Diccionario con métricas del experimento
     """
+    model_path, metrics_path = experiment_output_paths(models_dir, config_path)
     cmd = [
         sys.executable,
         "src/train.py",
-        "--params", str(config_path)
+        "--params", str(config_path),
+        "--out", str(model_path),
+        "--metrics", str(metrics_path)
     ]
     
     if not use_mlflow:
         cmd.append("--no-mlflow")
+    if seeds > 1:
+        cmd += ["--seeds", str(seeds), "--seed-jobs", str(seed_jobs)]
     
-    # Configurar variables de entorno
-    env = os.environ.copy()
+    # Configurar variables de entorno (cada train hereda su parte del presupuesto de CPU)
+    env = thread_env(threads) if threads else os.environ.copy()
     env["MLFLOW_EXPERIMENT"] = experiment_name
     
     # ✅ ASEGURAR: Si no hay MLFLOW_TRACKING_URI, usar local
@@ -102,15 +134,16 @@ def run_training(
         print("✅ Entrenamiento completado")
         print(result.stdout)
         
-        # Intentar leer métricas del archivo
-        metrics_path = Path("models/metrics.json")
+        # Intentar leer métricas del archivo del experimento
         if metrics_path.exists():
             with open(metrics_path, "r") as f:
                 metrics = json.load(f)
                 return {
                     "config": config_path.name,
                     "status": "success",
-                    **metrics
+                    **metrics,
+                    **load_serving_cost(metrics_path),
+                    **load_seed_summary(metrics_path)
                 }
         
         return {
@@ -129,18 +162,159 @@ def run_training(
         }
 
 
-def generate_report(results: List[Dict[str, Any]], output_path: Path):
-    """Genera un reporte comparativo de los experimentos."""
+def load_serving_cost(metrics_path: Path) -> Dict[str, Any]:
+    """Costo de serving que `train.py` guarda junto al modelo (vacío si no se midió)."""
+    cost_path = metrics_path.with_name("serving_cost.json")
+    if not cost_path.exists():
+        return {}
+    with open(cost_path, "r") as f:
+        return json.load(f)
+
+
+def load_seed_summary(metrics_path: Path) -> Dict[str, Any]:
+    """Media e IC por métrica de `seed_metrics.json` (vacío si el experimento no corrió semillas)."""
+    seed_path = metrics_path.with_name("seed_metrics.json")
+    if not seed_path.exists():
+        return {}
+    with open(seed_path, "r") as f:
+        seed = json.load(f)
+    flat: Dict[str, Any] = {"n_seeds": seed["n_seeds_run"]}
+    for metric, ci in seed["summary"].items():
+        flat[f"{metric}_mean"] = ci["mean"]
+        flat[f"{metric}_ci_low"] = ci["ci_low"]
+        flat[f"{metric}_ci_high"] = ci["ci_high"]
+    return flat
+
+
+def collect_results(configs_dir: Path, models_dir: Path, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Arma los resultados a partir de las métricas ya guardadas por cada experimento.
+
+    Con `names` (lista `experiments` de params.yaml, la misma que recorre el `foreach` de DVC) sólo
+    entran esos; un YAML del directorio que no está en la lista no tiene salidas y no se reporta.
+    """
+    if names is not None:
+        config_paths = [configs_dir / f"{name}.yaml" for name in names]
+    else:
+        config_paths = sorted(configs_dir.glob("*.yaml")) + sorted(configs_dir.glob("*.yml"))
+    results = []
+    for config_path in config_paths:
+        _, metrics_path = experiment_output_paths(models_dir, config_path)
+        if metrics_path.exists():
+            with open(metrics_path, "r") as f:
+                metrics = json.load(f)
+            results.append({"config": config_path.name, "status": "success", **metrics,
+                            **load_serving_cost(metrics_path), **load_seed_summary(metrics_path)})
+        else:
+            print(f"⚠️  Sin métricas para {config_path.name}: {metrics_path}")
+            results.append({"config": config_path.name, "status": "missing", "metrics_file": "not_found"})
+    return results
+
+
+def load_experiment_names(params_path: Path) -> Optional[List[str]]:
+    """Lista `experiments` de params.yaml (None si no está: se reportan todos los YAML del directorio)."""
+    if not params_path.exists():
+        return None
+    with open(params_path, "r", encoding="utf-8") as f:
+        names = (yaml.safe_load(f) or {}).get("experiments")
+    return [str(n) for n in names] if names else None
+
+
+def load_report_settings(params_path: Path) -> Dict[str, Any]:
+    """Sección `experiments_report` de params.yaml (batch de referencia y presupuestos)."""
+    if not params_path.exists():
+        return {}
+    with open(params_path, "r", encoding="utf-8") as f:
+        return (yaml.safe_load(f) or {}).get("experiments_report", {}) or {}
+
+
+def pareto_front(score: np.ndarray, costs: np.ndarray) -> np.ndarray:
+    """
+    Máscara de puntos no dominados: mayor `score` y menor en cada columna de `costs`.
+
+    Un punto queda dominado si otro es igual o mejor en todo y estrictamente mejor en algo.
+    """
+    better_eq = (score[None, :] >= score[:, None]) & np.all(costs[None, :, :] <= costs[:, None, :], axis=2)
+    strictly = (score[None, :] > score[:, None]) | np.any(costs[None, :, :] < costs[:, None, :], axis=2)
+    return ~np.any(better_eq & strictly, axis=1)
+
+
+def budget_violations(row: pd.Series, budgets: Dict[str, Any]) -> List[str]:
+    """Lista de presupuestos que incumple un experimento (vacía si entra en todos)."""
+    violations = []
+    for key, col in (("max_model_size_mb", "model_size_mb"), ("max_load_time_ms", "load_time_ms")):
+        limit = budgets.get(key)
+        if limit is not None and not row.get(col, np.nan) <= limit:
+            violations.append(f"{col}>{limit}")
+    for batch, limit in (budgets.get("max_latency_p99_ms") or {}).items():
+        col = f"latency_p99_ms_b{batch}"
+        if limit is not None and not row.get(col, np.nan) <= limit:
+            violations.append(f"{col}>{limit}")
+    return violations
+
+
+def plot_pareto(df: pd.DataFrame, latency_col: str, out_path: Path, latency_budget: float = None):
+    """ROC-AUC vs latencia p99 (tamaño del punto = tamaño del modelo), con la frontera de Pareto."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 7))
+    sizes = 40 + 400 * df["model_size_mb"] / max(df["model_size_mb"].max(), 1e-9)
+    colors = np.where(df["within_budget"], "steelblue", "lightgray")
+    ax.scatter(df[latency_col], df["roc_auc"], s=sizes, c=colors, edgecolors="black", alpha=0.8)
+    for _, row in df.iterrows():
+        ax.annotate(Path(row["config"]).stem, (row[latency_col], row["roc_auc"]),
+                    textcoords="offset points", xytext=(6, 6), fontsize=9)
+    front = df[df["pareto_optimal"]].sort_values(latency_col)
+    ax.step(front[latency_col], front["roc_auc"], where="post", color="darkorange", lw=2, label="Frontera de Pareto")
+    if latency_budget is not None:
+        ax.axvline(latency_budget, color="red", linestyle="--", label=f"Presupuesto p99 ({latency_budget} ms)")
+    ax.set_xscale("log")
+    ax.set_xlabel(f"Latencia p99 (ms, {latency_col.rsplit('_b', 1)[-1]} filas por llamada)", fontsize=12)
+    ax.set_ylabel("ROC-AUC", fontsize=12)
+    ax.set_title("Precisión vs costo de serving", fontsize=14, fontweight="bold")
+    ax.legend(loc="lower right")
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    print(f"📈 Vista de Pareto guardada: {out_path}")
+
+
+def generate_report(results: List[Dict[str, Any]], output_path: Path,
+                    budgets: Dict[str, Any] = None, latency_batch: int = 1):
+    """
+    Genera un reporte comparativo de los experimentos.
+
+    Con costo de serving disponible agrega `pareto_optimal` (ROC-AUC vs latencia p99 a
+    `latency_batch` y tamaño), `within_budget`/`budget_violations` y elige el mejor modelo
+    sólo entre los que cumplen los presupuestos.
+    """
     if not results:
         print("⚠️  No hay resultados para generar reporte")
         return
+    budgets = budgets or {}
     
     # Convertir a DataFrame para mejor visualización
     df = pd.DataFrame(results)
     
-    # Ordenar por mejor métrica (por ejemplo, roc_auc)
-    if "roc_auc" in df.columns:
-        df = df.sort_values("roc_auc", ascending=False)
+    # Ordenar por mejor métrica: media multi-semilla si existe, si no la corrida única
+    score_col = "roc_auc_mean" if "roc_auc_mean" in df.columns and df["roc_auc_mean"].notna().any() else "roc_auc"
+    if score_col in df.columns:
+        df = df.sort_values(score_col, ascending=False)
+
+    latency_col = f"latency_p99_ms_b{latency_batch}"
+    has_cost = {"roc_auc", "model_size_mb", latency_col}.issubset(df.columns)
+    if has_cost:
+        violations = df.apply(lambda row: budget_violations(row, budgets), axis=1)
+        df["within_budget"] = violations.str.len() == 0
+        df["budget_violations"] = violations.str.join(";")
+        df["pareto_optimal"] = False
+        valid = df[["roc_auc", "model_size_mb", latency_col]].notna().all(axis=1)
+        df.loc[valid, "pareto_optimal"] = pareto_front(
+            df.loc[valid, "roc_auc"].to_numpy(), df.loc[valid, ["model_size_mb", latency_col]].to_numpy()
+        )
     
     # Guardar reporte
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -153,8 +327,12 @@ def generate_report(results: List[Dict[str, Any]], output_path: Path):
     # JSON
     json_path = output_path.with_suffix(".json")
     with open(json_path, "w") as f:
-        json.dump(results, f, indent=2)
+        json.dump(json.loads(df.to_json(orient="records")), f, indent=2)
     print(f"📊 Reporte JSON guardado: {json_path}")
+
+    if has_cost:
+        plot_pareto(df[valid], latency_col, output_path.with_name(output_path.stem + "_pareto.png"),
+                    (budgets.get("max_latency_p99_ms") or {}).get(latency_batch))
     
     # Mostrar resumen en consola
     print("\n" + "="*80)
@@ -163,7 +341,9 @@ def generate_report(results: List[Dict[str, Any]], output_path: Path):
     
     # Seleccionar columnas relevantes para mostrar
     display_cols = ["config", "status"]
-    metric_cols = ["accuracy", "precision", "recall", "f1", "roc_auc"]
+    metric_cols = ["accuracy", "precision", "recall", "f1", "roc_auc",
+                   "roc_auc_mean", "roc_auc_ci_low", "roc_auc_ci_high", "n_seeds",
+                   "model_size_mb", latency_col, "pareto_optimal", "within_budget"]
     display_cols.extend([c for c in metric_cols if c in df.columns])
     
     if display_cols:
@@ -173,12 +353,28 @@ def generate_report(results: List[Dict[str, Any]], output_path: Path):
     
     print("="*80)
     
-    # Mejor modelo
-    if "roc_auc" in df.columns and not df["roc_auc"].isna().all():
-        best_idx = df["roc_auc"].idxmax()
+    # Mejor modelo (sólo entre los que cumplen los presupuestos de serving)
+    candidates = df[df["within_budget"]] if has_cost else df
+    if score_col in df.columns and not candidates[score_col].isna().all():
+        best_idx = candidates[score_col].idxmax()
         best_config = df.loc[best_idx, "config"]
-        best_score = df.loc[best_idx, "roc_auc"]
+        best_score = df.loc[best_idx, score_col]
         print(f"\n🏆 Mejor modelo: {best_config} (ROC-AUC: {best_score:.4f})")
+        if score_col == "roc_auc_mean":
+            print(f"   IC 95% ({int(df.loc[best_idx, 'n_seeds'])} semillas): "
+                  f"[{df.loc[best_idx, 'roc_auc_ci_low']:.4f}, {df.loc[best_idx, 'roc_auc_ci_high']:.4f}]")
+            overlap = candidates[(candidates.index != best_idx)
+                                 & (candidates["roc_auc_ci_high"] >= df.loc[best_idx, "roc_auc_ci_low"])]
+            if not overlap.empty:
+                print(f"   ⚠️  IC superpuesto con: {', '.join(overlap['config'])} (diferencia no concluyente)")
+        if has_cost:
+            print(f"   {df.loc[best_idx, 'model_size_mb']:.2f} MB | p99 a batch {latency_batch}: "
+                  f"{df.loc[best_idx, latency_col]:.2f} ms")
+            excluded = df[~df["within_budget"]]
+            for _, row in excluded.iterrows():
+                print(f"   ⛔ Excluido por presupuesto: {row['config']} ({row['budget_violations']})")
+    elif has_cost and "roc_auc" in df.columns:
+        print("\n⚠️  Ningún experimento cumple los presupuestos de serving")
 
 
 def main():
@@ -203,10 +399,68 @@ def main():
         action="store_true",
         help="Desactivar MLflow tracking"
     )
+    parser.add_argument(
+        "--models-dir",
+        default="models/experiments",
+        help="Directorio base de salidas por experimento (default: models/experiments)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Experimentos a entrenar en paralelo (default: 1)"
+    )
+    parser.add_argument(
+        "--seeds",
+        type=int,
+        default=0,
+        help="Semillas por experimento para media e IC de cada métrica (train.py --seeds)"
+    )
+    parser.add_argument(
+        "--seed-jobs",
+        type=int,
+        default=-1,
+        help="Procesos por experimento para las semillas (con --jobs > 1 conviene acotarlo)"
+    )
+    parser.add_argument(
+        "--params",
+        default="params.yaml",
+        help="params.yaml con las secciones experiments_report (presupuestos de serving) y resources (CPU)"
+    )
+    parser.add_argument(
+        "--max-model-mb",
+        type=float,
+        help="Presupuesto de tamaño del modelo en MB (override de experiments_report.budgets)"
+    )
+    parser.add_argument(
+        "--max-p99-ms",
+        type=float,
+        help="Presupuesto de latencia p99 en ms al batch de referencia (override de experiments_report.budgets)"
+    )
+    parser.add_argument(
+        "--report-only",
+        action="store_true",
+        help="No entrenar: generar el reporte con las métricas ya guardadas"
+    )
     
     args = parser.parse_args()
     
     configs_dir = Path(args.configs)
+    models_dir = Path(args.models_dir)
+
+    settings = load_report_settings(Path(args.params))
+    latency_batch = int(settings.get("latency_batch", 1))
+    budgets = dict(settings.get("budgets") or {})
+    budgets["max_latency_p99_ms"] = {int(k): v for k, v in (budgets.get("max_latency_p99_ms") or {}).items()}
+    if args.max_model_mb is not None:
+        budgets["max_model_size_mb"] = args.max_model_mb
+    if args.max_p99_ms is not None:
+        budgets["max_latency_p99_ms"][latency_batch] = args.max_p99_ms
+
+    if args.report_only:
+        results = collect_results(configs_dir, models_dir, load_experiment_names(Path(args.params)))
+        generate_report(results, Path(args.report), budgets, latency_batch)
+        return 0 if results and all(r.get("status") == "success" for r in results) else 1
     
     print("="*80)
     print("EJECUTOR DE EXPERIMENTOS - TelcoVision")
@@ -224,10 +478,12 @@ def main():
         return 1
     
     print(f"\n📋 Se ejecutarán {len(configs)} experimentos\n")
+    if args.jobs > 1:
+        print("⚠️  Con --jobs > 1 las latencias de serving se miden con CPU compartida; para compararlas,"
+              " volver a medir con: python src/serving_cost.py --model <modelo>\n")
     
-    # Ejecutar experimentos
-    results = []
-    for i, config in enumerate(configs, 1):
+    # Ejecutar experimentos (cada uno escribe en su propio directorio, así que pueden ir en paralelo)
+    def run_one(i: int, config: Dict[str, Any]) -> Dict[str, Any]:
         config_file = config.get("_config_file", f"config_{i}.yaml")
         config_path = configs_dir / config_file
         
@@ -235,20 +491,28 @@ def main():
         print(f"EXPERIMENTO {i}/{len(configs)}: {config_file}")
         print(f"{'='*80}")
         
-        result = run_training(
+        return run_training(
             config_path=config_path,
             experiment_name=args.experiment,
-            use_mlflow=not args.no_mlflow
+            use_mlflow=not args.no_mlflow,
+            models_dir=models_dir,
+            seeds=args.seeds,
+            seed_jobs=args.seed_jobs,
+            threads=plan.threads
         )
-        
-        results.append(result)
+
+    # Procesos x threads por train <= presupuesto de CPU (resources.cpu_budget / TELCO_CPU_BUDGET)
+    plan = plan_parallelism(len(configs), args.jobs, cpu_budget(args.params))
+    print(f"🧮 Presupuesto de CPU: {plan.processes} trains en paralelo x {plan.threads} threads cada uno\n")
+    with ThreadPoolExecutor(max_workers=plan.processes) as pool:
+        results = list(pool.map(run_one, range(1, len(configs) + 1), configs))
     
     # Generar reporte
     print(f"\n{'='*80}")
     print("GENERANDO REPORTE FINAL")
     print(f"{'='*80}")
     
-    generate_report(results, Path(args.report))
+    generate_report(results, Path(args.report), budgets, latency_batch)
     
     # Resumen final
     successful = sum(1 for r in results if r.get("status") == "success")
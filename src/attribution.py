@@ -0,0 +1,175 @@
+"""
+attribution.py
+
+Atribucion de features para TelcoVision (RandomForest y LogisticRegression).
+- Permutation importance en paralelo sobre (feature, repeticion), con caida de ROC-AUC
+- Contribuciones por fila de `explain.py`: camino de arbol (estilo Saabas/SHAP) para el bosque,
+  vectorizadas sobre filas, y lineales exactas (coef * (x - media)) para LogisticRegression
+- Las dummies se agrupan en su columna categorica de origen (la del CSV crudo de `process_telco`)
+- Guarda `metrics/feature_attribution.json` y `plots/feature_attribution.png`
+
+Uso:
+python src/attribution.py
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from joblib import delayed
+from sklearn.metrics import roc_auc_score
+
+from data_prep import feature_source_map, raw_columns
+from evaluate import load_artifacts, load_params
+from explain import build_explainer, contributions
+from resources import governed_parallel, plan_parallelism
+
+
+def model_contributions(model, X: pd.DataFrame) -> Tuple[str, float, np.ndarray]:
+    """Contribuciones por fila con el metodo que corresponde al estimador final del Pipeline."""
+    explainer = build_explainer(model, X)
+    return explainer["method"], explainer["expected_value"], contributions(model, explainer, X)
+
+
+def group_columns(feature_names: List[str], source_map: Dict[str, str]) -> Dict[str, List[int]]:
+    groups: Dict[str, List[int]] = {}
+    for i, name in enumerate(feature_names):
+        groups.setdefault(source_map[name], []).append(i)
+    return groups
+
+
+def _permuted_score(est, X_scaled: np.ndarray, y: np.ndarray, cols: List[int], seed: int) -> float:
+    rng = np.random.default_rng(seed)
+    X_perm = X_scaled.copy()
+    # Las dummies de una misma categorica se permutan juntas (filas completas del grupo)
+    X_perm[:, cols] = X_scaled[rng.permutation(X_scaled.shape[0])][:, cols]
+    return roc_auc_score(y, est.predict_proba(X_perm)[:, 1])
+
+
+def permutation_importance(model, X: pd.DataFrame, y: pd.Series, groups: Dict[str, List[int]],
+                           n_repeats: int = 5, n_jobs: int = -1, random_state: int = 42) -> Tuple[float, Dict[str, Dict[str, float]]]:
+    """
+    Caida de ROC-AUC al permutar cada grupo de columnas, en paralelo sobre (grupo, repeticion).
+
+    El escalado se aplica una sola vez: StandardScaler es columna a columna, asi que permutar
+    columnas escaladas equivale a escalar columnas permutadas.
+    """
+    X_scaled = model[:-1].transform(X)
+    est = model[-1]
+    y = np.asarray(y)
+    tasks = [(name, r) for name in groups for r in range(n_repeats)]
+    plan = plan_parallelism(len(tasks), n_jobs)
+    if "n_jobs" in est.get_params():
+        # El paralelismo va por tareas; cada worker usa sólo su parte del presupuesto de CPU
+        est.set_params(n_jobs=plan.threads)
+
+    baseline = roc_auc_score(y, est.predict_proba(X_scaled)[:, 1])
+    with governed_parallel(plan) as parallel:
+        scores = parallel(
+            delayed(_permuted_score)(est, X_scaled, y, groups[name], random_state + 1000 * k + r)
+            for k, (name, r) in enumerate(tasks)
+        )
+
+    drops: Dict[str, List[float]] = {}
+    for (name, _), score in zip(tasks, scores):
+        drops.setdefault(name, []).append(baseline - score)
+    return float(baseline), {
+        name: {"mean": float(np.mean(v)), "std": float(np.std(v))} for name, v in drops.items()
+    }
+
+
+def plot_attribution(perm: Dict[str, Dict[str, float]], attrib: Dict[str, float], method: str,
+                     out_path: str, top_n: int = 15):
+    """Grafica permutation importance y atribucion media absoluta por feature de origen"""
+    fig, axes = plt.subplots(1, 2, figsize=(16, 8))
+
+    perm_sorted = sorted(perm.items(), key=lambda kv: kv[1]["mean"], reverse=True)[:top_n]
+    axes[0].barh([k for k, _ in perm_sorted], [v["mean"] for _, v in perm_sorted],
+                 xerr=[v["std"] for _, v in perm_sorted], color='steelblue')
+    axes[0].set_xlabel('Caida de ROC-AUC', fontsize=12)
+    axes[0].set_title('Permutation Importance', fontsize=14, fontweight='bold')
+    axes[0].invert_yaxis()
+
+    attrib_sorted = sorted(attrib.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
+    axes[1].barh([k for k, _ in attrib_sorted], [v for _, v in attrib_sorted], color='darkorange')
+    axes[1].set_xlabel('Media |contribucion|' + (' (logit)' if method == "linear" else ' (probabilidad)'), fontsize=12)
+    axes[1].set_title(f'Atribucion {method}', fontsize=14, fontweight='bold')
+    axes[1].invert_yaxis()
+
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+    print(f"[OK] Atribucion de features guardada: {out_path}")
+
+
+def main():
+    """Funcion principal de atribucion de features"""
+    print("="*80)
+    print("ATRIBUCION DE FEATURES - TELCOVISION")
+    print("="*80)
+
+    params = load_params()
+    cfg = params.get("attribution", {}) or {}
+    n_repeats = int(cfg.get("n_repeats", 5))
+    n_jobs = int(cfg.get("n_jobs", -1))
+    max_rows = cfg.get("max_rows")
+    top_n = int(cfg.get("top_n", 15))
+    raw_path = cfg.get("raw_data", "data/raw/telco_churn.csv")
+
+    print("\n[INFO] Cargando modelo y datos...")
+    model, X_test, y_test = load_artifacts()
+    if max_rows and len(X_test) > max_rows:
+        X_test = X_test.sample(n=int(max_rows), random_state=params.get("random_state", 42))
+        y_test = y_test.loc[X_test.index]
+    print(f"[OK] Datos de atribucion: {len(X_test)} muestras")
+
+    feature_names = X_test.columns.tolist()
+    source_map = feature_source_map(feature_names, raw_columns(params, raw_path))
+    groups = group_columns(feature_names, source_map)
+
+    print(f"\n[INFO] Permutation importance ({len(groups)} features x {n_repeats} repeticiones)...")
+    baseline, perm = permutation_importance(model, X_test, y_test, groups, n_repeats, n_jobs,
+                                            params.get("random_state", 42))
+    print(f"[OK] ROC-AUC base: {baseline:.4f}")
+
+    print("\n[INFO] Contribuciones por fila...")
+    method, bias, contrib = model_contributions(model, X_test)
+    mean_abs_col = np.abs(contrib).mean(axis=0)
+    grouped = np.column_stack([contrib[:, idx].sum(axis=1) for idx in groups.values()])
+    mean_abs_src = dict(zip(groups.keys(), np.abs(grouped).mean(axis=0).tolist()))
+    print(f"[OK] Metodo: {method} (valor esperado: {bias:.4f})")
+
+    result: Dict[str, Any] = {
+        "model_type": type(model[-1]).__name__,
+        "n_rows": int(len(X_test)),
+        "scoring": "roc_auc",
+        "baseline_score": baseline,
+        "n_repeats": n_repeats,
+        "feature_sources": source_map,
+        "permutation_importance": perm,
+        "attribution_method": method,
+        "expected_value": bias,
+        "mean_abs_attribution": mean_abs_src,
+        "mean_abs_attribution_by_column": dict(zip(feature_names, mean_abs_col.tolist())),
+    }
+
+    os.makedirs('metrics', exist_ok=True)
+    os.makedirs('plots', exist_ok=True)
+    with open('metrics/feature_attribution.json', 'w') as f:
+        json.dump(result, f, indent=4)
+    print("[OK] Atribucion guardada: metrics/feature_attribution.json")
+    plot_attribution(perm, mean_abs_src, method, 'plots/feature_attribution.png', top_n)
+
+    print("\n" + "="*80)
+    print("Top features (permutation importance):")
+    for name, v in sorted(perm.items(), key=lambda kv: kv[1]["mean"], reverse=True)[:top_n]:
+        print(f"   {name:20s} {v['mean']:.4f} +/- {v['std']:.4f}")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+backtest.py
+
+Backtesting rolling-origin sobre snapshots mensuales del dataset raw de TelcoVision.
+- Lee un directorio de snapshots con el esquema de `data/raw/telco_churn.csv`; el mes sale del
+  nombre del archivo (`telco_churn_2024-03.csv`, `2024_03.csv`, ...)
+- Para cada mes de corte entrena con los meses hasta el corte (ventana creciente, o de
+  `window_months` meses) y evalúa sobre el mes siguiente: no hay fuga de información futura
+- Cada snapshot se preprocesa una sola vez (`process_telco` + features habilitadas) y las columnas
+  se alinean entre meses; las ventanas solapadas reutilizan esas filas desde un memmap compartido
+- Los folds corren en paralelo en procesos (joblib); procesos x threads por estimador respetan el
+  presupuesto de CPU (`resources.py`)
+- Reporte de performance en el tiempo (métricas por mes + pendiente del ROC-AUC por mes) y gráfico
+
+Uso:
+python src/backtest.py --snapshots data/snapshots
+"""
+
+import argparse
+import json
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+from joblib import delayed
+
+from data_prep import process_telco
+from features import build_feature_dataset
+from resources import governed_parallel, plan_parallelism
+
+_MONTH_RE = re.compile(r"(\d{4})[-_]?(\d{2})")
+
+
+def snapshot_month(path: Path) -> pd.Period:
+    """Mes del snapshot a partir del nombre del archivo (YYYY-MM, YYYY_MM o YYYYMM)."""
+    match = _MONTH_RE.search(path.stem)
+    if not match:
+        raise ValueError(f"No se encontró el mes (YYYY-MM) en el nombre del snapshot: {path.name}")
+    return pd.Period(f"{match.group(1)}-{match.group(2)}", freq="M")
+
+
+def load_snapshots(snapshots_dir: Path, pattern: str, target: str, features_cfg: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Preprocesa cada snapshot una vez y los apila con una columna `month` (ordinal del mes).
+
+    Las dummies se generan completas por snapshot (`drop_first=False`) y luego se alinean a la
+    unión de columnas: una categoría ausente en un mes queda en 0 en lugar de desplazar columnas.
+    """
+    files = sorted(snapshots_dir.glob(pattern), key=snapshot_month)
+    if not files:
+        raise FileNotFoundError(f"No hay snapshots '{pattern}' en {snapshots_dir}")
+    frames = []
+    for path in files:
+        month = snapshot_month(path)
+        df = process_telco(pd.read_csv(path), drop_first=False)
+        df = build_feature_dataset(df, list(features_cfg.get("enabled") or []), list(features_cfg.get("drop") or []))
+        frames.append(df.assign(month=month.ordinal))
+        print(f"[INFO] Snapshot {month}: {len(df):,} filas ({path.name})")
+    data = pd.concat(frames, ignore_index=True, sort=False)
+    dummy_cols = [c for c in data.columns if data[c].isna().any() and c not in (target, "month")]
+    data[dummy_cols] = data[dummy_cols].fillna(0)
+    feature_cols = [c for c in data.columns if c not in (target, "month")]
+    data[feature_cols] = data[feature_cols].astype(np.float64)
+    return data
+
+
+def _fit_fold(X: np.ndarray, y: np.ndarray, month: np.ndarray, columns: List[str], model_cfg: Dict[str, Any],
+              cutoff: int, window_months: Optional[int], random_state: int, threads: int = 1) -> Dict[str, Any]:
+    """Entrena con los meses <= cutoff (dentro de la ventana) y evalúa sobre cutoff + 1."""
+    from train import build_pipeline_from_params, evaluate
+
+    start = cutoff - window_months + 1 if window_months else -np.inf
+    train_mask = (month <= cutoff) & (month >= start)
+    test_mask = month == cutoff + 1
+    model = build_pipeline_from_params(model_cfg, random_state)
+    if "n_jobs" in model[-1].get_params():
+        model[-1].set_params(n_jobs=threads)
+    model.fit(pd.DataFrame(X[train_mask], columns=columns), y[train_mask])
+    metrics = evaluate(model, pd.DataFrame(X[test_mask], columns=columns), y[test_mask])
+    return {
+        "cutoff": str(pd.Period(ordinal=cutoff, freq="M")),
+        "test_month": str(pd.Period(ordinal=cutoff + 1, freq="M")),
+        "n_train": int(train_mask.sum()),
+        "n_test": int(test_mask.sum()),
+        "test_churn_rate": float(y[test_mask].mean()),
+        **metrics,
+    }
+
+
+def run_backtest(data: pd.DataFrame, target: str, model_cfg: Dict[str, Any], min_train_months: int = 3,
+                 window_months: Optional[int] = None, n_jobs: int = -1, random_state: int = 42) -> Dict[str, Any]:
+    """Un fold por mes de corte (desde el mes `min_train_months`), en paralelo sobre un memmap compartido."""
+    months = np.sort(data["month"].unique())
+    cutoffs = [int(m) for m in months[min_train_months - 1:-1] if int(m) + 1 in set(months.tolist())]
+    if not cutoffs:
+        raise ValueError(f"Se necesitan al menos {min_train_months + 1} meses consecutivos de snapshots")
+    columns = [c for c in data.columns if c not in (target, "month")]
+
+    tmp = Path(tempfile.mkdtemp(prefix="telco_backtest_"))
+    try:
+        np.save(tmp / "X.npy", data[columns].to_numpy(dtype=np.float64))
+        np.save(tmp / "y.npy", data[target].to_numpy())
+        np.save(tmp / "month.npy", data["month"].to_numpy(dtype=np.int64))
+        X_mm, y_mm, month_mm = (np.load(tmp / f"{n}.npy", mmap_mode="r") for n in ("X", "y", "month"))
+        plan = plan_parallelism(len(cutoffs), n_jobs)
+        with governed_parallel(plan) as parallel:
+            folds = parallel(
+                delayed(_fit_fold)(X_mm, y_mm, month_mm, columns, model_cfg, c, window_months, random_state, plan.threads)
+                for c in cutoffs
+            )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    summary = {}
+    for metric in ("accuracy", "precision", "recall", "f1", "roc_auc"):
+        values = np.array([np.nan if f[metric] is None else f[metric] for f in folds], dtype=np.float64)
+        summary[metric] = {"mean": float(np.nanmean(values)), "min": float(np.nanmin(values)),
+                           "max": float(np.nanmax(values))}
+    # Pendiente de una recta sobre el ROC-AUC por mes evaluado (< 0: el modelo se degrada)
+    auc = np.array([np.nan if f["roc_auc"] is None else f["roc_auc"] for f in folds], dtype=np.float64)
+    valid = ~np.isnan(auc)
+    slope = float(np.polyfit(np.asarray(cutoffs)[valid], auc[valid], 1)[0]) if valid.sum() > 1 else None
+    return {
+        "n_snapshots": int(len(months)),
+        "n_folds": len(folds),
+        "window_months": window_months,
+        "folds": folds,
+        "summary": summary,
+        "roc_auc_slope_per_month": slope,
+    }
+
+
+def plot_backtest(report: Dict[str, Any], out_path: Path):
+    import matplotlib.pyplot as plt
+
+    months = [f["test_month"] for f in report["folds"]]
+    plt.figure(figsize=(10, 6))
+    for metric in ("roc_auc", "recall", "precision", "f1"):
+        plt.plot(months, [f[metric] for f in report["folds"]], marker="o", label=metric)
+    plt.xlabel("Mes evaluado")
+    plt.ylabel("Valor")
+    plt.title("Backtest rolling-origin: performance en el tiempo", fontsize=14, fontweight="bold")
+    plt.xticks(rotation=45)
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.savefig(out_path, dpi=200, bbox_inches="tight")
+    plt.close()
+    print(f"[OK] Gráfico de backtest guardado: {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest rolling-origin sobre snapshots mensuales")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (secciones model y backtest)")
+    parser.add_argument("--snapshots", help="Directorio de snapshots (override de backtest.snapshots_dir)")
+    parser.add_argument("--jobs", type=int, help="Procesos en paralelo (override de backtest.n_jobs)")
+    parser.add_argument("--report", help="Reporte JSON (override de backtest.report_path)")
+    args = parser.parse_args()
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        params = yaml.safe_load(f) or {}
+    cfg = params.get("backtest", {}) or {}
+    target = params.get("target", "churn")
+    snapshots_dir = Path(args.snapshots or cfg.get("snapshots_dir", "data/snapshots"))
+    report_path = Path(args.report or cfg.get("report_path", "reports/backtest_report.json"))
+
+    data = load_snapshots(snapshots_dir, cfg.get("pattern", "*.csv"), target, params.get("features", {}) or {})
+    report = run_backtest(
+        data, target, params.get("model", {}) or {}, int(cfg.get("min_train_months", 3)),
+        cfg.get("window_months"), args.jobs if args.jobs is not None else int(cfg.get("n_jobs", -1)),
+        int(params.get("random_state", 42)),
+    )
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[SAVE] Reporte de backtest guardado: {report_path} ({report['n_folds']} folds)")
+    plot_backtest(report, Path(cfg.get("plot_path", "reports/backtest_over_time.png")))
+
+    for fold in report["folds"]:
+        auc = f"{fold['roc_auc']:.4f}" if fold["roc_auc"] is not None else "N/A"
+        print(f"  {fold['cutoff']} -> {fold['test_month']}: n_train={fold['n_train']:,} "
+              f"n_test={fold['n_test']:,} roc_auc={auc} recall={fold['recall']:.4f}")
+    if report["roc_auc_slope_per_month"] is not None:
+        print(f"[INFO] Tendencia del ROC-AUC: {report['roc_auc_slope_per_month']:+.4f} por mes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+calibrate.py
+
+Calibracion de probabilidades para TelcoVision.
+- Ajusta un calibrador (isotonic o Platt) sobre las probabilidades out-of-fold de train
+  que guarda `train.py` en `models/oof_predictions.csv` (no usa el set de test)
+- Lo guarda como tabla compacta en `models/calibrator.json`:
+    * isotonic: puntos de quiebre (x, y) -> `np.interp`
+    * platt:    coeficientes (a, b) -> sigmoide(a * logit(p) + b)
+- Reporta Brier score y ECE de test antes/despues en `metrics/calibration.json`
+
+Uso:
+python src/calibrate.py
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss
+
+from evaluate import load_params
+from predict import DEFAULT_CALIBRATOR_PATH, apply_calibration
+from score_cache import model_version
+
+
+def _logit(p: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    p = np.clip(p, eps, 1 - eps)
+    return np.log(p / (1 - p))
+
+
+def fit_calibrator(proba: np.ndarray, y: np.ndarray, method: str = "isotonic",
+                   sample_weight: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Ajusta el calibrador y lo devuelve como diccionario serializable.
+
+    `sample_weight` compensa un train submuestreado (sección `sampling`): con los pesos el calibrador
+    apunta a la tasa base original y no a la de la muestra.
+    """
+    if method == "isotonic":
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(proba, y, sample_weight=sample_weight)
+        return {"method": "isotonic", "x": iso.X_thresholds_.tolist(), "y": iso.y_thresholds_.tolist()}
+    if method == "platt":
+        lr = LogisticRegression(C=1e6, max_iter=1000).fit(_logit(proba).reshape(-1, 1), y, sample_weight=sample_weight)
+        return {"method": "platt", "a": float(lr.coef_[0, 0]), "b": float(lr.intercept_[0])}
+    raise ValueError("calibration.method debe ser 'isotonic' o 'platt'.")
+
+
+def expected_calibration_error(y: np.ndarray, proba: np.ndarray, n_bins: int = 10) -> float:
+    """ECE con bins de igual ancho, vectorizado con bincount."""
+    bins = np.minimum((proba * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    conf = np.bincount(bins, weights=proba, minlength=n_bins)
+    acc = np.bincount(bins, weights=y, minlength=n_bins)
+    mask = counts > 0
+    return float(np.sum(np.abs(acc[mask] - conf[mask])) / y.size)
+
+
+def main():
+    """Funcion principal de calibracion"""
+    print("="*80)
+    print("CALIBRACION DE PROBABILIDADES - TELCOVISION")
+    print("="*80)
+
+    params = load_params()
+    cfg = params.get("calibration", {}) or {}
+    method = cfg.get("method", "isotonic")
+    paths = params.get("paths", {})
+    model_path = Path(paths.get("model_path", "models/model.joblib"))
+    oof_path = model_path.with_name("oof_predictions.csv")
+    calibrator_path = Path(paths.get("calibrator_path", DEFAULT_CALIBRATOR_PATH))
+
+    if not oof_path.exists():
+        raise FileNotFoundError(f"No se encontraron predicciones out-of-fold: {oof_path} (definir oof_folds en params.yaml)")
+    oof = pd.read_csv(oof_path)
+    train = oof[oof["split"] == "train"]
+    test = oof[oof["split"] == "test"]
+    print(f"\n[INFO] Ajustando calibrador '{method}' sobre {len(train)} probabilidades out-of-fold...")
+
+    weight = train["weight"].to_numpy() if "weight" in train.columns else None
+    calibrator = fit_calibrator(train["proba"].to_numpy(), train["y_true"].to_numpy(), method, weight)
+    # Sólo vale para el artefacto que generó las OOF: `predict.load_calibrator` lo verifica
+    calibrator["model_version"] = model_version(str(model_path))
+    calibrator_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(calibrator_path, "w", encoding="utf-8") as f:
+        json.dump(calibrator, f, indent=2)
+    print(f"[OK] Calibrador guardado: {calibrator_path}")
+
+    y_test = test["y_true"].to_numpy()
+    raw = test["proba"].to_numpy()
+    calibrated = apply_calibration(raw, calibrator)
+    n_bins = int(cfg.get("n_bins", 10))
+    summary = {
+        "method": method,
+        "n_fit_samples": int(len(train)),
+        "n_parameters": len(calibrator.get("x", [])) * 2 if method == "isotonic" else 2,
+        "test": {
+            "brier_raw": float(brier_score_loss(y_test, raw)),
+            "brier_calibrated": float(brier_score_loss(y_test, calibrated)),
+            "ece_raw": expected_calibration_error(y_test, raw, n_bins),
+            "ece_calibrated": expected_calibration_error(y_test, calibrated, n_bins),
+            "mean_proba_raw": float(raw.mean()),
+            "mean_proba_calibrated": float(calibrated.mean()),
+            "churn_rate": float(y_test.mean()),
+        },
+    }
+    Path('metrics').mkdir(exist_ok=True)
+    with open('metrics/calibration.json', 'w') as f:
+        json.dump(summary, f, indent=4)
+    print("[OK] Resumen de calibracion guardado: metrics/calibration.json")
+
+    t = summary["test"]
+    print("\n" + "="*80)
+    print(f"   Brier: {t['brier_raw']:.4f} -> {t['brier_calibrated']:.4f}")
+    print(f"   ECE:   {t['ece_raw']:.4f} -> {t['ece_calibrated']:.4f}")
+    print(f"   Media de probabilidad: {t['mean_proba_raw']:.4f} -> {t['mean_proba_calibrated']:.4f} "
+          f"(tasa real: {t['churn_rate']:.4f})")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
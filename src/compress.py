@@ -0,0 +1,204 @@
+"""
+compress.py
+
+Compresion del modelo de produccion de TelcoVision (post-entrenamiento, sin reentrenar el bosque).
+- Poda: elige un subconjunto de arboles del RandomForest con seleccion greedy hacia adelante,
+  hasta que el ROC-AUC del subconjunto quede dentro de `tolerance` del bosque completo.
+  Las probabilidades por arbol se calculan una sola vez y el AUC de todos los candidatos
+  de cada paso se evalua de forma vectorizada (rangos por columna)
+- Destilacion (opcional): ajusta un alumno chico sobre el logit de la probabilidad del bosque
+  en train (`trees`: pocos arboles poco profundos con gradient boosting; `linear`: Ridge con
+  interacciones de a pares) y lo guarda como `DistilledChurnModel`
+- El test se divide en dos mitades: `seleccion` (eleccion de arboles) y `reporte` (AUC final),
+  asi el delta de AUC reportado no esta sesgado por la propia seleccion
+- Guarda artefactos alternativos (`models/model_pruned.joblib`, `models/model_distilled.joblib`)
+  y `metrics/compression.json` con speedup, tamano y delta de AUC de cada variante
+
+Uso:
+python src/compress.py
+"""
+
+import copy
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+from ensemble import DistilledChurnModel, to_logit
+from evaluate import load_params
+from serving_cost import count_tree_nodes, measure_latency
+
+
+def load_split(params: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
+    """Mismo split train/test que `train.py` (X_train para destilar, test para seleccionar/reportar)."""
+    df = pd.read_csv(params['paths']['processed_data'])
+    X = df.drop(columns=[params['target']])
+    y = df[params['target']]
+    X_train, X_test, _, y_test = train_test_split(
+        X, y, test_size=params['test_size'], random_state=params['random_state'], stratify=y
+    )
+    return X_train, X_test, y_test
+
+
+def tree_probabilities(model, X: pd.DataFrame) -> np.ndarray:
+    """Matriz (n_filas x n_arboles) con la probabilidad de churn de cada arbol del bosque."""
+    Xs = model[:-1].transform(X)
+    return np.column_stack([t.predict_proba(Xs)[:, 1] for t in model[-1].estimators_])
+
+
+def auc_columns(y: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """ROC-AUC de cada columna de `scores` (Mann-Whitney con rangos promedio para empates)."""
+    ranks = rankdata(scores, axis=0)
+    pos = y == 1
+    n_pos, n_neg = pos.sum(), (~pos).sum()
+    return (ranks[pos].sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def greedy_tree_selection(P: np.ndarray, y: np.ndarray, tolerance: float,
+                          min_trees: int = 1) -> Tuple[List[int], List[float]]:
+    """
+    Seleccion greedy hacia adelante: en cada paso agrega el arbol que mas sube el AUC del promedio.
+
+    Se detiene en el primer subconjunto (con al menos `min_trees`) cuyo AUC llega a
+    AUC(bosque completo) - tolerance. Devuelve los indices elegidos y la curva de AUC.
+    """
+    target = auc_columns(y, P.mean(axis=1, keepdims=True))[0] - tolerance
+    selected: List[int] = []
+    remaining = np.ones(P.shape[1], dtype=bool)
+    running = np.zeros(P.shape[0])
+    curve: List[float] = []
+    while remaining.any():
+        candidates = np.flatnonzero(remaining)
+        aucs = auc_columns(y, (running[:, None] + P[:, candidates]) / (len(selected) + 1))
+        best = candidates[int(np.argmax(aucs))]
+        selected.append(int(best))
+        remaining[best] = False
+        running += P[:, best]
+        curve.append(float(aucs.max()))
+        if len(selected) >= min_trees and curve[-1] >= target:
+            break
+    return selected, curve
+
+
+def prune_forest(model, tree_idx: List[int]):
+    """Copia del Pipeline con sólo los arboles elegidos (mismo preprocesamiento, misma interfaz)."""
+    pruned = copy.deepcopy(model)
+    est = pruned[-1]
+    est.estimators_ = [est.estimators_[i] for i in tree_idx]
+    est.n_estimators = len(tree_idx)
+    return pruned
+
+
+def distill(model, X_train: pd.DataFrame, cfg: Dict[str, Any], random_state: int) -> DistilledChurnModel:
+    """Ajusta un alumno sobre el logit de la probabilidad del maestro en train."""
+    Xs = model[:-1].transform(X_train)
+    target = to_logit(model[-1].predict_proba(Xs)[:, 1])
+    kind = cfg.get("type", "trees")
+    if kind == "trees":
+        student = GradientBoostingRegressor(
+            n_estimators=int(cfg.get("n_estimators", 50)), max_depth=int(cfg.get("max_depth", 3)),
+            learning_rate=float(cfg.get("learning_rate", 0.1)), random_state=random_state
+        )
+    elif kind == "linear":
+        student = make_pipeline(PolynomialFeatures(degree=2, interaction_only=True, include_bias=False),
+                                Ridge(alpha=float(cfg.get("alpha", 1.0))))
+    else:
+        raise ValueError("compression.distill.type debe ser 'trees' o 'linear'.")
+    student.fit(Xs, target)
+    return DistilledChurnModel(model[:-1], student, X_train.columns)
+
+
+def variant_summary(name: str, model, path: Path, X: pd.DataFrame, y: np.ndarray,
+                    batch_sizes: List[int]) -> Dict[str, Any]:
+    """AUC de reporte, tamano serializado, nodos y latencia p50 de una variante ya guardada."""
+    latency = measure_latency(model, X, batch_sizes)
+    return {
+        "artifact": str(path),
+        "roc_auc": float(roc_auc_score(y, model.predict_proba(X)[:, 1])),
+        "model_size_mb": path.stat().st_size / 1024 ** 2,
+        "n_tree_nodes": count_tree_nodes(model.student if name == "distilled" else model),
+        **{f"latency_p50_ms_b{b}": lat["p50_ms"] for b, lat in latency.items()},
+    }
+
+
+def main():
+    """Funcion principal de compresion del modelo"""
+    print("="*80)
+    print("COMPRESION DEL MODELO - TELCOVISION")
+    print("="*80)
+
+    params = load_params()
+    cfg = params.get("compression", {}) or {}
+    tolerance = float(cfg.get("tolerance", 0.002))
+    batch_sizes = list(cfg.get("batch_sizes", [1, 10_000]))
+    random_state = params.get("random_state", 42)
+    model_path = Path(params['paths']['model_path'])
+    pruned_path = Path(cfg.get("pruned_path", "models/model_pruned.joblib"))
+    distilled_path = Path(cfg.get("distilled_path", "models/model_distilled.joblib"))
+
+    model = joblib.load(model_path)
+    if not hasattr(model[-1], "estimators_"):
+        raise ValueError(f"La poda requiere un bosque; el modelo es {type(model[-1]).__name__}.")
+    X_train, X_test, y_test = load_split(params)
+    X_sel, X_rep, y_sel, y_rep = train_test_split(
+        X_test, y_test.to_numpy(), test_size=0.5, random_state=random_state, stratify=y_test
+    )
+    print(f"[OK] Bosque de {len(model[-1].estimators_)} arboles | seleccion: {len(X_sel)} | reporte: {len(X_rep)}")
+
+    print(f"\n[INFO] Seleccion greedy de arboles (tolerancia de AUC: {tolerance})...")
+    P = tree_probabilities(model, X_sel)
+    tree_idx, curve = greedy_tree_selection(P, y_sel, tolerance, int(cfg.get("min_trees", 1)))
+    pruned = prune_forest(model, tree_idx)
+    pruned_path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(pruned, pruned_path)
+    print(f"[SAVE] Bosque podado ({len(tree_idx)} arboles) guardado: {pruned_path}")
+
+    variants = {"original": (model, model_path), "pruned": (pruned, pruned_path)}
+    distill_cfg = cfg.get("distill") or {}
+    if distill_cfg.get("enabled", False):
+        print(f"\n[INFO] Destilando el bosque en un alumno '{distill_cfg.get('type', 'trees')}'...")
+        student = distill(model, X_train, distill_cfg, random_state)
+        joblib.dump(student, distilled_path)
+        variants["distilled"] = (student, distilled_path)
+        print(f"[SAVE] Modelo destilado guardado: {distilled_path}")
+
+    print("\n[INFO] Midiendo AUC y latencia de cada variante sobre la mitad de reporte...")
+    summary = {name: variant_summary(name, m, p, X_rep, y_rep, batch_sizes) for name, (m, p) in variants.items()}
+    base = summary["original"]
+    for name, s in summary.items():
+        s["roc_auc_delta"] = s["roc_auc"] - base["roc_auc"]
+        s["size_ratio"] = s["model_size_mb"] / base["model_size_mb"]
+        for b in batch_sizes:
+            s[f"speedup_b{b}"] = base[f"latency_p50_ms_b{b}"] / s[f"latency_p50_ms_b{b}"]
+    summary["pruned"]["n_trees"] = len(tree_idx)
+    summary["pruned"]["selected_trees"] = tree_idx
+    summary["pruned"]["selection_auc_curve"] = curve
+    summary["original"]["n_trees"] = len(model[-1].estimators_)
+
+    os.makedirs('metrics', exist_ok=True)
+    with open('metrics/compression.json', 'w') as f:
+        json.dump({"tolerance": tolerance, "variants": summary}, f, indent=4)
+    print("[OK] Resumen de compresion guardado: metrics/compression.json")
+
+    print("\n" + "="*80)
+    b = batch_sizes[-1]
+    print(f"{'Variante':12s} {'ROC-AUC':>8s} {'Delta':>8s} {'MB':>8s} {f'p50@{b} ms':>12s} {'Speedup':>8s}")
+    for name, s in summary.items():
+        print(f"{name:12s} {s['roc_auc']:8.4f} {s['roc_auc_delta']:+8.4f} {s['model_size_mb']:8.2f} "
+              f"{s[f'latency_p50_ms_b{b}']:12.2f} {s[f'speedup_b{b}']:7.2f}x")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,38 @@ Script de limpieza y transformación de datos para TelcoVision.
 - Lee el dataset crudo `data/raw/telco_churn.csv`
 - Aplica limpieza, conversión de tipos, codificación de categóricas y genera el dataset limpio
 - Guarda el resultado en `data/processed/telco_churn_processed.csv`
+- Alternativa al CSV: `--store DIR --as-of FECHA` arma el raw con el ultimo estado de cada cliente
+  a esa fecha desde el almacen de snapshots (`snapshot_store.py`)
+- Alternativa al CSV: `--db BASE --query SQL` lee el raw desde SQLite en lotes (`sql_source.py`)
+- `--params`: si `sql_source.database` esta definido, el raw sale de esa base (query, batch_size y
+  dtypes de params) en lugar de `--input`; es lo que corre el stage DVC
 
 Uso:
 python src/data_prep.py --input data/raw/telco_churn.csv --out data/processed/telco_churn_processed.csv
+python src/data_prep.py --store data/snapshot_store --as-of 2024-06-30 --out data/processed/telco_churn_processed.csv
+python src/data_prep.py --db data/raw/telco_churn.db --query "SELECT * FROM customers ORDER BY rowid" --out data/processed/telco_churn_processed.csv
+python src/data_prep.py --input data/raw/telco_churn.csv --params params.yaml --out data/processed/telco_churn_processed.csv
 """
 
 import argparse
 from pathlib import Path
+from typing import Dict, List, Optional
 import pandas as pd
+import yaml
 
+IMPUTED_COLUMNS = ["age", "tenure_months", "monthly_charges", "total_charges"]
+DEFAULT_DTYPES = {"total_charges": "numeric"}  # TEXT en origen (vacios a NaN)
 
-def process_telco(df: pd.DataFrame) -> pd.DataFrame:
+
+def process_telco(df: pd.DataFrame, require_target: bool = True, drop_first: bool = True,
+                  fill_values: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """Limpia y codifica el dataset crudo.
+
+    - `require_target=False` permite procesar lotes de scoring sin columna `churn`
+    - `drop_first=False` genera todas las dummies (para alinear luego con las columnas del modelo)
+    - `fill_values` imputa las numericas con valores fijos (medianas de train, `imputation.json`)
+      en lugar de las medianas del propio lote: en scoring un lote chico no tiene estadisticas propias
+    """
     df = df.copy()
     df.columns = [c.strip().lower() for c in df.columns]
     for id_col in ("customer_id", "customerid", "customer_id "):
@@ -24,16 +45,23 @@ def process_telco(df: pd.DataFrame) -> pd.DataFrame:
             break
     if "total_charges" in df.columns:
         df["total_charges"] = df["total_charges"].replace("", pd.NA)
-        df["total_charges"] = pd.to_numeric(df["total_charges"], errors="coerce")
-        median_tc = df["total_charges"].median()
-        df["total_charges"].fillna(median_tc, inplace=True)
-    numeric_cols = [c for c in ["age", "tenure_months", "monthly_charges", "total_charges"] if c in df.columns]
+    numeric_cols = [c for c in IMPUTED_COLUMNS if c in df.columns]
     for c in numeric_cols:
-        if df[c].isna().any():
-            df[c].fillna(int(df[c].median()), inplace=True)
+        # Un lote con sólo nulos en la columna llega como object: se fuerza el tipo numérico
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+        if not df[c].isna().any():
+            continue
+        if fill_values is not None and c in fill_values:
+            value = fill_values[c]
+        elif df[c].isna().all():
+            raise ValueError(f"No hay valores para imputar '{c}': pasar fill_values (medianas de train)")
+        else:
+            median = df[c].median()
+            value = median if c == "total_charges" else int(median)
+        df[c] = df[c].fillna(value)
     if "churn" in df.columns:
         df["churn"] = pd.to_numeric(df["churn"], errors="coerce").fillna(0).astype(int)
-    else:
+    elif require_target:
         raise ValueError("La columna 'churn' no está presente en el dataset")
     replace_no_service = ["No phone service", "No internet service", "No phone service ", "No internet service "]
     replace_map = {v: "No" for v in replace_no_service}
@@ -43,16 +71,83 @@ def process_telco(df: pd.DataFrame) -> pd.DataFrame:
             df[col] = df[col].replace(replace_map)
     cat_cols = [c for c in df.columns if df[c].dtype == "object" and c != "churn"]
     if cat_cols:
-        dummies = pd.get_dummies(df[cat_cols], drop_first=True, dummy_na=True)
+        dummies = pd.get_dummies(df[cat_cols], drop_first=drop_first, dummy_na=True)
         df = pd.concat([df.drop(columns=cat_cols), dummies], axis=1)
     return df
 
-def main(input_path: str, out_path: str):
+def fit_fill_values(X: pd.DataFrame) -> Dict[str, float]:
+    """Medianas de train de las numericas imputadas (se guardan junto al modelo para el scoring)."""
+    return {c: float(X[c].median()) for c in IMPUTED_COLUMNS if c in X.columns}
+
+def feature_source_map(feature_names: List[str], raw_columns: List[str]) -> Dict[str, str]:
+    """Mapea cada columna procesada (p.ej. `contract_type_One year`) a su columna cruda de origen."""
+    sources = sorted({c.strip().lower() for c in raw_columns}, key=len, reverse=True)
+    mapping = {}
+    for name in feature_names:
+        mapping[name] = name
+        if name in sources:
+            continue
+        for src in sources:
+            if name.startswith(f"{src}_"):
+                mapping[name] = src
+                break
+    return mapping
+
+def load_raw(input_path: Optional[str] = None, store_dir: Optional[str] = None, as_of: Optional[str] = None,
+             database: Optional[str] = None, query: Optional[str] = None, batch_size: Optional[int] = None,
+             dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Raw desde un CSV, el almacen de snapshots (`store_dir` + `as_of`) o una query SQL (`database`)."""
+    if database:
+        from sql_source import DEFAULT_BATCH_SIZE, DEFAULT_QUERY, read_query
+
+        return read_query(database, query or DEFAULT_QUERY, batch_size=batch_size or DEFAULT_BATCH_SIZE, dtypes=dtypes)
+    if store_dir:
+        from snapshot_store import SnapshotStore
+
+        if not as_of:
+            raise ValueError("--store requiere --as-of (fecha del corte)")
+        df = SnapshotStore(store_dir).as_of(as_of)
+        print(f"[INFO] Estado al {as_of} desde {store_dir}: {len(df):,} clientes")
+        return df.drop(columns=["snapshot_date"])
     inp = Path(input_path)
-    out = Path(out_path)
     if not inp.exists():
         raise FileNotFoundError(f"Archivo de entrada no encontrado: {inp}")
-    df = pd.read_csv(inp)
+    return pd.read_csv(inp)
+
+def sql_config(params: Dict) -> Dict:
+    """
+    Seccion `sql_source` de params. Con `database` definido, `dep_path` (el archivo que DVC sigue
+    como raw en los stages que leen esta fuente) tiene que ser esa base: si no, DVC no re-ejecutaria
+    nada cuando cambian los datos.
+    """
+    cfg = params.get("sql_source", {}) or {}
+    database, dep_path = cfg.get("database"), cfg.get("dep_path")
+    if database and dep_path and Path(dep_path) != Path(database):
+        raise ValueError(f"sql_source.dep_path ({dep_path}) debe ser la base de sql_source.database ({database})")
+    return cfg
+
+def load_raw_from_params(params: Dict, csv_path: str) -> pd.DataFrame:
+    """Raw para los stages que lo releen (claves de segmento, atribución): SQL si `sql_source.database`, si no el CSV."""
+    cfg = sql_config(params)
+    if cfg.get("database"):
+        return load_raw(database=cfg["database"], query=cfg.get("query"), batch_size=cfg.get("batch_size"),
+                        dtypes=cfg.get("dtypes"))
+    return pd.read_csv(csv_path)
+
+def raw_columns(params: Dict, csv_path: str) -> List[str]:
+    """Columnas del raw sin leer filas (misma fuente que `load_raw_from_params`)."""
+    cfg = sql_config(params)
+    if cfg.get("database"):
+        from sql_source import DEFAULT_QUERY, query_columns
+
+        return query_columns(cfg["database"], cfg.get("query") or DEFAULT_QUERY)
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+def main(input_path: Optional[str], out_path: str, store_dir: Optional[str] = None, as_of: Optional[str] = None,
+         database: Optional[str] = None, query: Optional[str] = None, batch_size: Optional[int] = None,
+         dtypes: Optional[Dict[str, str]] = None):
+    out = Path(out_path)
+    df = load_raw(input_path, store_dir, as_of, database, query, batch_size, dtypes or DEFAULT_DTYPES)
     df_processed = process_telco(df)
     out.parent.mkdir(parents=True, exist_ok=True)
     df_processed.to_csv(out, index=False)
@@ -60,7 +155,22 @@ def main(input_path: str, out_path: str):
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--input", required=True, help="Ruta al CSV crudo")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", help="Ruta al CSV crudo")
+    src.add_argument("--store", help="Almacen de snapshots (alternativa a --input, requiere --as-of)")
+    src.add_argument("--db", help="Base SQLite con el raw (alternativa a --input, ver --query)")
+    ap.add_argument("--as-of", help="Fecha del corte point-in-time para --store (YYYY-MM-DD)")
+    ap.add_argument("--query", help="Query SQL para --db (default: SELECT * FROM customers ORDER BY rowid)")
+    ap.add_argument("--batch-size", type=int, help="Filas por fetchmany para --db")
+    ap.add_argument("--params", help="params.yaml: con sql_source.database el raw sale de esa base en vez de --input (y sus dtypes)")
     ap.add_argument("--out", required=True, help="Ruta al CSV limpio")
     args = ap.parse_args()
-    main(args.input, args.out)
+    database, query, batch_size, dtypes = args.db, args.query, args.batch_size, None
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as f:
+            sql_cfg = sql_config(yaml.safe_load(f) or {})
+        dtypes = sql_cfg.get("dtypes")
+        if sql_cfg.get("database") and args.input:  # la base reemplaza al CSV, no a --store/--db explicitos
+            database, query, batch_size = sql_cfg["database"], sql_cfg.get("query"), sql_cfg.get("batch_size")
+            print(f"[INFO] Raw desde {database} (sql_source en {args.params})")
+    main(args.input, args.out, args.store, args.as_of, database, query, batch_size, dtypes)
@@ -0,0 +1,258 @@
+"""
+drift.py
+
+Monitoreo de data drift para TelcoVision.
+- `reference`: construye sketches de referencia sobre el dataset crudo de entrenamiento
+    * numericas: histograma con bordes en cuantiles de referencia
+    * categoricas: tabla de frecuencias
+- `monitor`: actualiza sketches en streaming (por chunks, memoria constante) sobre un lote de scoring
+  y calcula PSI, KS (sobre el histograma) y Jensen-Shannon por feature
+- Solo se guardan conteos: los datos crudos de scoring nunca se persisten
+
+Uso:
+python src/drift.py reference --input data/raw/telco_churn.csv --out models/drift_reference.json
+python src/drift.py monitor --input data/clientes_nuevos.csv --report reports/drift_report.json
+"""
+
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+NUMERIC_FEATURES = ["age", "tenure_months", "monthly_charges", "total_charges"]
+EXCLUDED_COLUMNS = {"customer_id", "customerid", "churn"}
+OTHER_CATEGORY = "__other__"
+EPS = 1e-6
+
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    return df
+
+
+def _distribution(counts: np.ndarray) -> np.ndarray:
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if total == 0:
+        return np.full(counts.shape, 1.0 / max(counts.size, 1))
+    return counts / total
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    e = np.clip(_distribution(expected), EPS, None)
+    a = np.clip(_distribution(actual), EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def jensen_shannon(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Divergencia de Jensen-Shannon en base 2 (0 = iguales, 1 = disjuntas)."""
+    e = _distribution(expected)
+    a = _distribution(actual)
+    m = 0.5 * (e + a)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kl_e = np.where(e > 0, e * np.log2(e / m), 0.0)
+        kl_a = np.where(a > 0, a * np.log2(a / m), 0.0)
+    return float(0.5 * kl_e.sum() + 0.5 * kl_a.sum())
+
+
+def binned_ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Estadistico KS aproximado: maxima diferencia entre CDFs evaluadas en los bordes."""
+    return float(np.max(np.abs(np.cumsum(_distribution(expected)) - np.cumsum(_distribution(actual)))))
+
+
+class FeatureSketch:
+    """Sketch de tamano fijo para una feature (histograma o tabla de frecuencias)."""
+
+    def __init__(self, name: str, kind: str, edges: Optional[List[float]] = None,
+                 categories: Optional[List[str]] = None):
+        self.name = name
+        self.kind = kind
+        self.edges = np.asarray(edges if edges is not None else [], dtype=np.float64)
+        self.categories = list(categories or [])
+        self._index = {c: i for i, c in enumerate(self.categories)}
+        n_slots = self.edges.size + 1 if kind == "numeric" else len(self.categories) + 1
+        self.counts = np.zeros(n_slots, dtype=np.int64)
+        self.nulls = 0
+        self.n = 0
+
+    def update(self, values: pd.Series):
+        self.n += int(values.size)
+        if self.kind == "numeric":
+            x = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+            mask = np.isnan(x)
+            self.nulls += int(mask.sum())
+            bins = np.searchsorted(self.edges, x[~mask], side="right")
+            self.counts += np.bincount(bins, minlength=self.counts.size)
+        else:
+            mask = values.isna().to_numpy()
+            self.nulls += int(mask.sum())
+            codes = values[~mask].astype(str).str.strip().map(self._index)
+            # Ultimo slot: categorias no vistas en referencia
+            codes = codes.fillna(len(self.categories)).to_numpy(dtype=np.int64)
+            self.counts += np.bincount(codes, minlength=self.counts.size)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {"kind": self.kind, "n": self.n, "nulls": self.nulls, "counts": self.counts.tolist()}
+        if self.kind == "numeric":
+            out["edges"] = self.edges.tolist()
+        else:
+            out["categories"] = self.categories
+        return out
+
+    @classmethod
+    def from_dict(cls, name: str, d: Dict[str, Any]) -> "FeatureSketch":
+        sketch = cls(name, d["kind"], edges=d.get("edges"), categories=d.get("categories"))
+        sketch.counts = np.asarray(d["counts"], dtype=np.int64)
+        sketch.nulls = int(d.get("nulls", 0))
+        sketch.n = int(d.get("n", 0))
+        return sketch
+
+    def empty_like(self) -> "FeatureSketch":
+        return FeatureSketch(self.name, self.kind, edges=self.edges.tolist(), categories=self.categories)
+
+
+def build_reference(df: pd.DataFrame, n_bins: int = 20, max_categories: int = 50) -> Dict[str, FeatureSketch]:
+    """Construye los sketches de referencia a partir del dataset crudo."""
+    df = _normalize_columns(df)
+    sketches: Dict[str, FeatureSketch] = {}
+    for col in df.columns:
+        if col in EXCLUDED_COLUMNS:
+            continue
+        if col in NUMERIC_FEATURES:
+            x = pd.to_numeric(df[col], errors="coerce").dropna().to_numpy(dtype=np.float64)
+            edges = np.unique(np.quantile(x, np.linspace(0, 1, n_bins + 1)[1:-1])) if x.size else []
+            sketch = FeatureSketch(col, "numeric", edges=list(edges))
+        else:
+            top = df[col].dropna().astype(str).str.strip().value_counts().index[:max_categories]
+            sketch = FeatureSketch(col, "categorical", categories=sorted(top))
+        sketch.update(df[col])
+        sketches[col] = sketch
+    return sketches
+
+
+def save_reference(sketches: Dict[str, FeatureSketch], out_path: str, source: str = ""):
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "source": source,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "features": {name: s.to_dict() for name, s in sketches.items()},
+        }, f, indent=2)
+
+
+def load_reference(path: str) -> Dict[str, FeatureSketch]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {name: FeatureSketch.from_dict(name, d) for name, d in data["features"].items()}
+
+
+class DriftMonitor:
+    """Acumula sketches de un lote de scoring (chunk a chunk) y los compara con la referencia."""
+
+    def __init__(self, reference: Dict[str, FeatureSketch], psi_warning: float = 0.1, psi_alert: float = 0.25):
+        self.reference = reference
+        self.current = {name: s.empty_like() for name, s in reference.items()}
+        self.psi_warning = psi_warning
+        self.psi_alert = psi_alert
+
+    def update(self, df: pd.DataFrame):
+        df = _normalize_columns(df)
+        for name, sketch in self.current.items():
+            if name in df.columns:
+                sketch.update(df[name])
+
+    def feature_stats(self, name: str) -> Dict[str, Any]:
+        ref, cur = self.reference[name], self.current[name]
+        psi = population_stability_index(ref.counts, cur.counts)
+        status = "alert" if psi >= self.psi_alert else "warning" if psi >= self.psi_warning else "ok"
+        stats = {
+            "kind": ref.kind,
+            "n": cur.n,
+            "null_ratio": cur.nulls / cur.n if cur.n else 0.0,
+            "reference_null_ratio": ref.nulls / ref.n if ref.n else 0.0,
+            "psi": psi,
+            "js_divergence": jensen_shannon(ref.counts, cur.counts),
+            "ks": binned_ks(ref.counts, cur.counts) if ref.kind == "numeric" else None,
+            "status": status,
+        }
+        if ref.kind == "categorical":
+            total = cur.counts.sum()
+            stats["unseen_ratio"] = float(cur.counts[-1] / total) if total else 0.0
+        return stats
+
+    def report(self) -> Dict[str, Any]:
+        features = {name: self.feature_stats(name) for name in self.reference if self.current[name].n}
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "n_rows": max((s.n for s in self.current.values()), default=0),
+            "thresholds": {"psi_warning": self.psi_warning, "psi_alert": self.psi_alert},
+            "drifted_features": sorted(n for n, s in features.items() if s["status"] == "alert"),
+            "features": features,
+        }
+
+    def save_report(self, out_path: str) -> Dict[str, Any]:
+        rep = self.report()
+        out = Path(out_path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+        return rep
+
+
+def monitor_chunks(reference_path: str, chunks: Iterable[pd.DataFrame], report_path: str,
+                   psi_warning: float = 0.1, psi_alert: float = 0.25) -> Dict[str, Any]:
+    monitor = DriftMonitor(load_reference(reference_path), psi_warning, psi_alert)
+    for chunk in chunks:
+        monitor.update(chunk)
+    return monitor.save_report(report_path)
+
+
+def print_report(rep: Dict[str, Any]):
+    print(f"\n{'Feature':20s} {'PSI':>8s} {'JS':>8s} {'KS':>8s}  Estado")
+    for name, s in rep["features"].items():
+        ks = f"{s['ks']:.4f}" if s["ks"] is not None else "-"
+        print(f"{name:20s} {s['psi']:8.4f} {s['js_divergence']:8.4f} {ks:>8s}  {s['status']}")
+    if rep["drifted_features"]:
+        print(f"\n[WARN] Drift significativo en: {', '.join(rep['drifted_features'])}")
+    else:
+        print("\n[OK] Sin drift significativo")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Monitoreo de data drift TelcoVision")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    ref = sub.add_parser("reference", help="Construye los sketches de referencia")
+    ref.add_argument("--input", default="data/raw/telco_churn.csv", help="CSV crudo de referencia")
+    ref.add_argument("--out", default="models/drift_reference.json", help="Ruta de salida de la referencia")
+    ref.add_argument("--bins", type=int, default=20, help="Cantidad de bins por feature numérica")
+
+    mon = sub.add_parser("monitor", help="Compara un lote de scoring contra la referencia")
+    mon.add_argument("--input", required=True, help="CSV crudo a monitorear")
+    mon.add_argument("--reference", default="models/drift_reference.json", help="Referencia de drift")
+    mon.add_argument("--report", default="reports/drift_report.json", help="Ruta del reporte JSON")
+    mon.add_argument("--chunksize", type=int, default=100_000, help="Filas por chunk")
+    mon.add_argument("--psi-warning", type=float, default=0.1)
+    mon.add_argument("--psi-alert", type=float, default=0.25)
+
+    args = ap.parse_args()
+    if args.command == "reference":
+        sketches = build_reference(pd.read_csv(args.input), n_bins=args.bins)
+        save_reference(sketches, args.out, source=args.input)
+        print(f"Referencia de drift guardada en: {args.out} ({len(sketches)} features)")
+    else:
+        rep = monitor_chunks(args.reference, pd.read_csv(args.input, chunksize=args.chunksize),
+                             args.report, args.psi_warning, args.psi_alert)
+        print_report(rep)
+        print(f"Reporte de drift guardado en: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+ensemble.py
+
+Artefactos de scoring compuestos de TelcoVision.
+
+`StackedChurnModel` (ensamble por stacking):
+- Agrupa varios Pipeline(scaler -> modelo) ya entrenados y un meta-modelo liviano
+- Una sola pasada de preprocesamiento: los scalers idénticos (mismo split de train) se aplican una vez
+- Los modelos base se evalúan en paralelo (threads: los árboles de sklearn liberan el GIL)
+- Expone la misma interfaz que usa `predict.py` (`predict_proba`, `classes_`, `feature_names_in_`)
+
+`DistilledChurnModel` (modelo destilado de un bosque):
+- Reusa el preprocesamiento del Pipeline maestro y un regresor chico sobre el logit de su probabilidad
+
+`SegmentRouter` (un modelo por segmento):
+- El segmento de cada fila sale de las dummies de la columna configurada (p.ej. `contract_type_*`)
+- Agrupa las filas por segmento y hace un solo `predict_proba` por grupo; los segmentos sin modelo
+  propio (chicos o no vistos) van al modelo global de respaldo
+
+Este módulo sólo define las clases; los stages que las construyen son `stacking.py`, `compress.py`
+y `train.py` (con `segments.py`).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def to_logit(p: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    p = np.clip(p, eps, 1 - eps)
+    return np.log(p / (1 - p))
+
+
+class StackedChurnModel:
+    """Modelos base + meta-modelo sobre los logits de sus probabilidades de churn."""
+
+    def __init__(self, base_models: List, base_names: List[str], meta_model, n_jobs: int = -1):
+        self.base_models = list(base_models)
+        self.base_names = list(base_names)
+        self.meta_model = meta_model
+        self.n_jobs = n_jobs
+        self.classes_ = np.array([0, 1])
+        self.feature_names_in_ = np.asarray(self.base_models[0].feature_names_in_, dtype=object)
+        self._scaler_groups = self._group_scalers()
+
+    def _group_scalers(self) -> List[List[int]]:
+        """Agrupa modelos cuyo primer paso (scaler) tiene exactamente los mismos parámetros ajustados."""
+        groups: List[List[int]] = []
+        for i, model in enumerate(self.base_models):
+            for group in groups:
+                ref = self.base_models[group[0]][:-1]
+                cur = model[:-1]
+                if (
+                    hasattr(ref[0], "mean_") and hasattr(cur[0], "mean_")
+                    and np.array_equal(ref[0].mean_, cur[0].mean_)
+                    and np.array_equal(ref[0].scale_, cur[0].scale_)
+                ):
+                    group.append(i)
+                    break
+            else:
+                groups.append([i])
+        return groups
+
+    def base_probabilities(self, X: pd.DataFrame) -> np.ndarray:
+        """Matriz (n_filas x n_modelos) de probabilidades de churn de los modelos base."""
+        X = X[list(self.feature_names_in_)]
+        scaled = {}
+        for group in self._scaler_groups:
+            Xs = self.base_models[group[0]][:-1].transform(X)
+            for i in group:
+                scaled[i] = Xs
+
+        def run(i: int) -> np.ndarray:
+            return self.base_models[i][-1].predict_proba(scaled[i])[:, 1]
+
+        n_workers = len(self.base_models) if self.n_jobs in (-1, None) else max(1, min(self.n_jobs, len(self.base_models)))
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            columns = list(pool.map(run, range(len(self.base_models))))
+        return np.column_stack(columns)
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        return self.meta_model.predict_proba(to_logit(self.base_probabilities(X)))
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+
+class DistilledChurnModel:
+    """Preprocesamiento del modelo maestro + regresor alumno que predice el logit de su probabilidad."""
+
+    def __init__(self, preprocessor, student, feature_names):
+        self.preprocessor = preprocessor
+        self.student = student
+        self.classes_ = np.array([0, 1])
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        Xs = self.preprocessor.transform(X[list(self.feature_names_in_)])
+        p = 1.0 / (1.0 + np.exp(-self.student.predict(Xs)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+
+class SegmentRouter:
+    """Modelos por valor de una columna categórica + modelo global de respaldo."""
+
+    BASE_LABEL = "(referencia)"
+
+    def __init__(self, column: Optional[str], segment_models: Dict[str, object], fallback, feature_names,
+                 base_label: Optional[str] = None):
+        self.column = column
+        self.segment_models = dict(segment_models)
+        self.fallback = fallback
+        self.classes_ = np.array([0, 1])
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.dummy_columns = segment_dummy_columns(feature_names, column)
+        # Categoría sin dummy (drop_first), p.ej. "Month-to-Month"; se lee del raw al entrenar
+        self.base_label = base_label or self.BASE_LABEL
+
+    def segment_labels(self, X: pd.DataFrame) -> np.ndarray:
+        return segment_labels(X, self.column, self.dummy_columns, getattr(self, "base_label", self.BASE_LABEL))
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        X = X[list(self.feature_names_in_)]
+        codes, labels = pd.factorize(self.segment_labels(X))
+        proba = np.empty(len(X), dtype=np.float64)
+        # Filas ordenadas por segmento: un bloque contiguo (y un predict_proba) por grupo
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+        for code, label in enumerate(labels):
+            rows = order[bounds[code]:bounds[code + 1]]
+            model = self.segment_models.get(label, self.fallback)
+            proba[rows] = model.predict_proba(X.iloc[rows])[:, 1]
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+
+def segment_dummy_columns(feature_names, column: Optional[str]) -> List[str]:
+    """Dummies de `column` en el dataset procesado (sin la de nulos)."""
+    if not column:
+        return []
+    prefix = f"{column}_"
+    return [c for c in feature_names if str(c).startswith(prefix) and str(c) != f"{column}_nan"]
+
+
+def segment_labels(X: pd.DataFrame, column: Optional[str], dummy_columns: List[str],
+                   base_label: str = SegmentRouter.BASE_LABEL) -> np.ndarray:
+    """Valor de `column` por fila a partir de sus dummies; sin dummy activa es la categoría de referencia."""
+    if not dummy_columns:
+        return np.full(len(X), base_label, dtype=object)
+    D = X[dummy_columns].to_numpy(dtype=np.float64)
+    values = np.array([c[len(column) + 1:] for c in dummy_columns], dtype=object)
+    return np.where(D.max(axis=1) > 0.5, values[D.argmax(axis=1)], base_label)
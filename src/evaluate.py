@@ -15,11 +15,19 @@ from sklearn.metrics import (
     roc_curve,
     roc_auc_score,
     precision_recall_curve,
-    average_precision_score
+    average_precision_score,
+    brier_score_loss
 )
 import os
 import yaml
 
+from predict import (
+    DEFAULT_CALIBRATOR_PATH, DEFAULT_POLICY_PATH, apply_calibration, load_calibrator, load_decision_threshold
+)
+from data_prep import load_raw_from_params
+from score_cache import model_version
+from slices import DEFAULT_SEGMENTS, DEFAULT_TENURE_BANDS, plot_slice_heatmap, segment_keys, slice_metrics, slices_report
+
 # Configurar estilo de graficos
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (10, 6)
@@ -133,11 +141,48 @@ def plot_precision_recall_curve(y_true, y_proba):
     print(f"[OK] Curva PR guardada: plots/precision_recall_curve.png (AP: {avg_precision:.4f})")
 
 
+def plot_reliability_curve(y_true, y_proba_raw, y_proba_calibrated=None, n_bins=10):
+    """Generar y guardar curva de confiabilidad (probabilidad predicha vs tasa real de churn)"""
+    from sklearn.calibration import calibration_curve
+
+    plt.figure(figsize=(10, 7))
+    plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--', label='Calibracion perfecta')
+    curves = [('Sin calibrar', y_proba_raw, 'darkorange')]
+    if y_proba_calibrated is not None:
+        curves.append(('Calibrado', y_proba_calibrated, 'green'))
+    for label, proba, color in curves:
+        frac_pos, mean_pred = calibration_curve(y_true, proba, n_bins=n_bins, strategy='quantile')
+        brier = brier_score_loss(y_true, proba)
+        plt.plot(mean_pred, frac_pos, marker='o', color=color, lw=2.5,
+                 label=f'{label} (Brier = {brier:.4f})')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('Probabilidad predicha', fontsize=12)
+    plt.ylabel('Fraccion real de churn', fontsize=12)
+    plt.title('Curva de Confiabilidad', fontsize=14, fontweight='bold')
+    plt.legend(loc="upper left", fontsize=11)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig('plots/reliability_curve.png', dpi=300, bbox_inches='tight')
+    plt.close()
+    
+    print("[OK] Curva de confiabilidad guardada: plots/reliability_curve.png")
+
+
 def plot_feature_importance(model, feature_names):
     """Generar y guardar importancia de features (si el modelo lo soporta)"""
     try:
-        if hasattr(model, 'feature_importances_'):
-            importances = model.feature_importances_
+        # El modelo cargado es un Pipeline(scaler -> estimador): mirar el estimador final
+        estimator = model[-1] if hasattr(model, 'steps') else model
+        if hasattr(estimator, 'feature_importances_'):
+            importances = estimator.feature_importances_
+        elif hasattr(estimator, 'coef_'):
+            # Variables escaladas: |coeficiente| es comparable entre features
+            importances = np.abs(estimator.coef_).ravel()
+        else:
+            importances = None
+
+        if importances is not None:
             indices = np.argsort(importances)[::-1]
             
             # Top 15 features
@@ -156,7 +201,7 @@ def plot_feature_importance(model, feature_names):
             
             print(f"[OK] Importancia de features guardada: plots/feature_importance.png")
         else:
-            print("[INFO] Modelo no soporta feature_importances_")
+            print("[INFO] Modelo no soporta feature_importances_ ni coef_")
     except Exception as e:
         print(f"[WARNING] No se pudo generar feature importance: {e}")
 
@@ -180,12 +225,13 @@ def generate_classification_report(y_true, y_pred):
     print("[OK] Reporte guardado: metrics/classification_report.json")
 
 
-def generate_evaluation_summary(y_true, y_pred, y_proba):
+def generate_evaluation_summary(y_true, y_pred, y_proba, threshold=0.5, y_proba_raw=None):
     """Generar resumen ejecutivo de la evaluacion"""
     from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
     
     summary = {
         "modelo": "Random Forest Conservador (Experimento 5)",
+        "umbral_decision": float(threshold),
         "dataset": {
             "total_samples": len(y_true),
             "churn_cases": int(y_true.sum()),
@@ -197,7 +243,13 @@ def generate_evaluation_summary(y_true, y_pred, y_proba):
             "precision": float(precision_score(y_true, y_pred)),
             "recall": float(recall_score(y_true, y_pred)),
             "f1_score": float(f1_score(y_true, y_pred)),
-            "roc_auc": float(roc_auc_score(y_true, y_proba))
+            "roc_auc": float(roc_auc_score(y_true, y_proba)),
+            "brier_score": float(brier_score_loss(y_true, y_proba))
+        },
+        "calibracion": {
+            "calibrado": y_proba_raw is not None,
+            "brier_score_sin_calibrar": float(brier_score_loss(y_true, y_proba if y_proba_raw is None else y_proba_raw)),
+            "probabilidad_media": float(np.mean(y_proba))
         },
         "matriz_confusion": {
             "true_negatives": int(confusion_matrix(y_true, y_pred)[0, 0]),
@@ -216,16 +268,59 @@ def generate_evaluation_summary(y_true, y_pred, y_proba):
     return summary
 
 
-def main():
-    """Funcion principal de evaluacion"""
+def evaluate_slices(X_test, y_true, y_pred, y_proba, summary_metrics, do_plots, do_reports):
+    """Metricas por segmento (region, contrato, ... y cruces) con las claves del dataset raw; devuelve los archivos generados"""
+    cfg = load_params().get('slicing', {}) or {}
+    raw = load_raw_from_params(load_params(), cfg.get('raw_data', 'data/raw/telco_churn.csv'))
+    processed_rows = len(pd.read_csv(load_params()['paths']['processed_data'], usecols=[0]))
+    if len(raw) != processed_rows:
+        print(f"[WARNING] El raw ({len(raw)} filas) no esta alineado con el procesado ({processed_rows}); "
+              "se omite la evaluacion por segmentos")
+        return []
+    keys = segment_keys(raw, cfg.get('segments', DEFAULT_SEGMENTS),
+                        cfg.get('tenure_bands', DEFAULT_TENURE_BANDS)).loc[X_test.index]
+    min_support = int(cfg.get('min_support', 30))
+    table, n_filtered = slice_metrics(keys, y_true, y_proba, y_pred, cfg.get('crosses', []), min_support)
+
+    written = []
+    if do_reports:
+        out_path = cfg.get('metrics_path', 'metrics/slice_metrics.json')
+        with open(out_path, 'w') as f:
+            json.dump(slices_report(table, n_filtered, min_support, summary_metrics), f, indent=4)
+        print(f"[OK] Metricas por segmento guardadas: {out_path} "
+              f"({len(table)} slices, {n_filtered} descartados por soporte < {min_support})")
+        worst = table.nsmallest(3, 'recall')
+        for _, row in worst.iterrows():
+            print(f"   Recall bajo: {row['slice']} = {row['value']} -> {row['recall']:.3f} (n={row['support']})")
+        written.append(out_path)
+    if do_plots:
+        plot_path = cfg.get('plot_path', 'plots/slice_heatmap.png')
+        plot_slice_heatmap(table, plot_path)
+        written.append(plot_path)
+    return written
+
+
+def main(stage="all"):
+    """
+    Funcion principal de evaluacion.
+
+    stage: "plots" (solo visualizaciones), "reports" (solo JSON) o "all".
+    El pipeline DVC corre plots y reports como stages separados para no rehacer uno
+    cuando solo cambia el codigo del otro.
+    """
     print("="*80)
     print("EVALUACION AVANZADA DEL MODELO - TELCOVISION")
     print("="*80)
     print()
     
+    do_plots = stage in ("plots", "all")
+    do_reports = stage in ("reports", "all")
+
     # Crear directorios
-    create_plots_directory()
-    os.makedirs('metrics', exist_ok=True)
+    if do_plots:
+        create_plots_directory()
+    if do_reports:
+        os.makedirs('metrics', exist_ok=True)
     
     # Cargar artefactos
     print("\n[INFO] Cargando modelo y datos...")
@@ -235,41 +330,75 @@ def main():
     
     # Generar predicciones
     print("\n[INFO] Generando predicciones...")
-    y_pred = model.predict(X_test)
-    y_proba = model.predict_proba(X_test)[:, 1]
-    print("[OK] Predicciones generadas")
+    paths = load_params()['paths']
+    version = model_version(paths['model_path'])
+    threshold = load_decision_threshold(paths.get('decision_policy_path', DEFAULT_POLICY_PATH), version)
+    calibrator = load_calibrator(paths.get('calibrator_path', DEFAULT_CALIBRATOR_PATH), version)
+    y_proba_raw = model.predict_proba(X_test)[:, 1]
+    y_proba = apply_calibration(y_proba_raw, calibrator)
+    y_pred = (y_proba >= threshold).astype(int)
+    print(f"[OK] Predicciones generadas (umbral de decision: {threshold:.4f}, "
+          f"calibrador: {calibrator['method'] if calibrator else 'ninguno'})")
     
+    artifacts = []
+
     # Generar visualizaciones
-    print("\n[INFO] Generando visualizaciones...")
-    plot_confusion_matrix(y_test, y_pred)
-    plot_roc_curve(y_test, y_proba)
-    plot_precision_recall_curve(y_test, y_proba)
-    plot_feature_importance(model, X_test.columns.tolist())
+    if do_plots:
+        print("\n[INFO] Generando visualizaciones...")
+        plot_confusion_matrix(y_test, y_pred)
+        plot_roc_curve(y_test, y_proba)
+        plot_precision_recall_curve(y_test, y_proba)
+        plot_feature_importance(model, X_test.columns.tolist())
+        plot_reliability_curve(y_test, y_proba_raw, y_proba if calibrator else None)
+        artifacts += [
+            "plots/confusion_matrix.png",
+            "plots/roc_curve.png",
+            "plots/precision_recall_curve.png",
+            "plots/feature_importance.png",
+            "plots/reliability_curve.png",
+        ]
     
     # Generar reportes
-    print("\n[INFO] Generando reportes...")
-    generate_classification_report(y_test, y_pred)
-    summary = generate_evaluation_summary(y_test, y_pred, y_proba)
+    summary = None
+    if do_reports:
+        print("\n[INFO] Generando reportes...")
+        generate_classification_report(y_test, y_pred)
+        summary = generate_evaluation_summary(y_test, y_pred, y_proba, threshold,
+                                              y_proba_raw if calibrator else None)
+        artifacts += [
+            "metrics/classification_report.json",
+            "metrics/evaluation_summary.json",
+        ]
+
+    # Metricas por segmento (una sola pasada agrupada para todos los slices)
+    print("\n[INFO] Evaluando por segmentos...")
+    global_metrics = {
+        "recall": float(((y_pred == 1) & (y_test == 1)).sum() / max((y_test == 1).sum(), 1)),
+        "roc_auc": float(roc_auc_score(y_test, y_proba)),
+    }
+    artifacts += evaluate_slices(X_test, y_test.to_numpy(), y_pred, y_proba, global_metrics, do_plots, do_reports)
     
     # Resumen final
     print("\n" + "="*80)
     print("EVALUACION COMPLETADA EXITOSAMENTE")
     print("="*80)
-    print(f"\nMetricas Principales:")
-    print(f"   Accuracy:  {summary['metricas_principales']['accuracy']:.4f}")
-    print(f"   Precision: {summary['metricas_principales']['precision']:.4f}")
-    print(f"   Recall:    {summary['metricas_principales']['recall']:.4f}")
-    print(f"   F1-Score:  {summary['metricas_principales']['f1_score']:.4f}")
-    print(f"   ROC-AUC:   {summary['metricas_principales']['roc_auc']:.4f}")
+    if summary is not None:
+        print(f"\nMetricas Principales:")
+        print(f"   Accuracy:  {summary['metricas_principales']['accuracy']:.4f}")
+        print(f"   Precision: {summary['metricas_principales']['precision']:.4f}")
+        print(f"   Recall:    {summary['metricas_principales']['recall']:.4f}")
+        print(f"   F1-Score:  {summary['metricas_principales']['f1_score']:.4f}")
+        print(f"   ROC-AUC:   {summary['metricas_principales']['roc_auc']:.4f}")
+        print(f"   Brier:     {summary['metricas_principales']['brier_score']:.4f}")
     print(f"\nArtefactos generados:")
-    print(f"   plots/confusion_matrix.png")
-    print(f"   plots/roc_curve.png")
-    print(f"   plots/precision_recall_curve.png")
-    print(f"   plots/feature_importance.png")
-    print(f"   metrics/classification_report.json")
-    print(f"   metrics/evaluation_summary.json")
+    for path in artifacts:
+        print(f"   {path}")
     print("="*80)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    ap = argparse.ArgumentParser(description="Evaluacion avanzada del modelo")
+    ap.add_argument("--stage", choices=["plots", "reports", "all"], default="all",
+                    help="Que generar: visualizaciones, reportes JSON o ambos (default: all)")
+    main(ap.parse_args().stage)
@@ -0,0 +1,112 @@
+"""
+explain.py
+
+Explicaciones por cliente para TelcoVision.
+- `build_explainer`: precalcula en entrenamiento todo lo que no depende de la fila a explicar
+    * RandomForest: matriz dispersa D (nodos de todos los arboles x features) y valor esperado
+    * LogisticRegression: coeficientes y media de fondo de las features escaladas de train
+- `explain_top_k`: contribuciones por fila agrupadas en la columna cruda de origen y top-k razones.
+  Para el bosque es una sola multiplicacion `decision_path(X) @ D`; para el modelo lineal, un producto elemento a elemento
+- El explainer se guarda junto al modelo (`models/explainer.joblib`)
+
+Las contribuciones del bosque estan en escala de probabilidad (suman predict_proba);
+las del modelo lineal en escala logit (suman decision_function).
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from data_prep import feature_source_map
+
+
+def _tree_contribution_matrix(tree, n_features: int) -> Tuple[float, sparse.csr_matrix]:
+    """
+    Valor raiz y matriz D (nodos x features) de un arbol: `decision_path(X) @ D` da la
+    contribucion de cada feature a la probabilidad de churn (camino de decision, estilo Saabas).
+    """
+    t = tree.tree_
+    value = t.value[:, 0, :]
+    value = value / value.sum(axis=1, keepdims=True)
+    v1 = value[:, 1]
+
+    parent = np.full(t.node_count, -1)
+    internal = np.flatnonzero(t.children_left >= 0)
+    parent[t.children_left[internal]] = internal
+    parent[t.children_right[internal]] = internal
+
+    child = np.flatnonzero(parent >= 0)
+    delta = v1[child] - v1[parent[child]]
+    D = sparse.csr_matrix((delta, (child, t.feature[parent[child]])), shape=(t.node_count, n_features))
+    return float(v1[0]), D
+
+
+def build_explainer(model, X_background: pd.DataFrame) -> Dict[str, Any]:
+    """Precalcula el estado del explainer para el Pipeline entrenado (scaler -> estimador)."""
+    est = model[-1]
+    feature_names = list(X_background.columns)
+    n_features = len(feature_names)
+
+    if hasattr(est, "estimators_"):
+        roots, blocks = zip(*(_tree_contribution_matrix(t, n_features) for t in est.estimators_))
+        n_trees = len(est.estimators_)
+        return {
+            "method": "tree_path",
+            "feature_names": feature_names,
+            "expected_value": float(np.mean(roots)),
+            # Bloques apilados en el mismo orden que los nodos de forest.decision_path
+            "D": (sparse.vstack(blocks).tocsr() / n_trees),
+        }
+    if hasattr(est, "coef_"):
+        background_mean = model[:-1].transform(X_background).mean(axis=0)
+        coef = est.coef_.ravel()
+        return {
+            "method": "linear",
+            "feature_names": feature_names,
+            "expected_value": float(est.intercept_[0] + coef @ background_mean),
+            "coef": coef,
+            "background_mean": background_mean,
+        }
+    raise ValueError(f"Modelo no soportado para explicaciones: {type(est).__name__}")
+
+
+def contributions(model, explainer: Dict[str, Any], X: pd.DataFrame) -> np.ndarray:
+    """Contribuciones por fila y columna del modelo (n_filas x n_features)."""
+    X_scaled = model[:-1].transform(X)
+    if explainer["method"] == "tree_path":
+        indicator, _ = model[-1].decision_path(np.asarray(X_scaled, dtype=np.float32))
+        return (indicator @ explainer["D"]).toarray()
+    return (X_scaled - explainer["background_mean"]) * explainer["coef"]
+
+
+def source_matrix(feature_names: List[str], raw_columns: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Matriz 0/1 (features x columnas crudas) para sumar las dummies en su categorica de origen."""
+    mapping = feature_source_map(feature_names, raw_columns)
+    sources = list(dict.fromkeys(mapping.values()))
+    index = {s: j for j, s in enumerate(sources)}
+    M = np.zeros((len(feature_names), len(sources)))
+    M[np.arange(len(feature_names)), [index[mapping[f]] for f in feature_names]] = 1.0
+    return sources, M
+
+
+def explain_top_k(model, explainer: Dict[str, Any], X: pd.DataFrame, raw_columns: List[str],
+                  top_k: int = 3) -> pd.DataFrame:
+    """
+    Top-k razones por fila: columna de origen y contribucion (ordenadas por |contribucion|).
+
+    Devuelve columnas `reason_i` / `reason_i_contribution` alineadas con el indice de X.
+    """
+    sources, M = source_matrix(explainer["feature_names"], raw_columns)
+    grouped = contributions(model, explainer, X) @ M
+    k = min(top_k, grouped.shape[1])
+    top = np.argsort(-np.abs(grouped), axis=1)[:, :k]
+    top_values = np.take_along_axis(grouped, top, axis=1)
+    names = np.asarray(sources, dtype=object)[top]
+
+    out = {}
+    for i in range(k):
+        out[f"reason_{i + 1}"] = names[:, i]
+        out[f"reason_{i + 1}_contribution"] = top_values[:, i]
+    return pd.DataFrame(out, index=X.index)
@@ -0,0 +1,216 @@
+"""
+features.py
+
+Feature engineering declarativo para TelcoVision (stage entre `data_prep` y `train`).
+- Cada feature derivada se registra con `@register(nombre, deps=[...])`; las dependencias pueden ser
+  columnas del dataset procesado u otras features registradas (se resuelven en orden topologico)
+- Las funciones reciben arrays de NumPy y devuelven un array: todo vectorizado, sin `apply`
+- Cache por feature en `features.cache_dir`: cada feature se guarda como `.npy` con una huella
+  (codigo de la funcion + huellas de sus dependencias); solo se recalculan las que cambiaron
+- `features.enabled` elige las features que entran al dataset de entrenamiento y `features.drop`
+  poda columnas que no aportan; en scoring `add_features` calcula solo las que usa el modelo
+
+Uso:
+python src/features.py --input data/processed/telco_churn_processed.csv --out data/processed/telco_churn_features.csv
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+
+class FeatureSpec(NamedTuple):
+    name: str
+    deps: List[str]
+    func: Callable[..., np.ndarray]
+    description: str
+
+
+FEATURES: Dict[str, FeatureSpec] = {}
+
+
+def register(name: str, deps: List[str]):
+    """Registra una feature derivada; la funcion recibe las dependencias en el orden de `deps`."""
+    def wrap(func: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        FEATURES[name] = FeatureSpec(name, list(deps), func, (func.__doc__ or "").strip())
+        return func
+    return wrap
+
+
+# ---------- Features registradas ----------
+
+@register("avg_monthly_charge", deps=["total_charges", "tenure_months"])
+def _avg_monthly_charge(total, tenure):
+    """Cargo mensual promedio historico (total_charges / tenure_months)."""
+    return total / np.maximum(tenure, 1)
+
+
+@register("charges_delta", deps=["total_charges", "monthly_charges", "tenure_months"])
+def _charges_delta(total, monthly, tenure):
+    """Diferencia entre lo facturado y monthly_charges * tenure_months (cambios de plan/precio)."""
+    return total - monthly * tenure
+
+
+@register("charges_ratio", deps=["total_charges", "monthly_charges", "tenure_months"])
+def _charges_ratio(total, monthly, tenure):
+    """total_charges / (monthly_charges * tenure_months), acotado a [0, 5]."""
+    return np.clip(total / np.maximum(monthly * tenure, 1e-9), 0.0, 5.0)
+
+
+@register("monthly_vs_avg", deps=["monthly_charges", "avg_monthly_charge"])
+def _monthly_vs_avg(monthly, avg_monthly):
+    """Cargo mensual actual menos el promedio historico (> 0: subio el precio)."""
+    return monthly - avg_monthly
+
+
+@register("tenure_bucket", deps=["tenure_months"])
+def _tenure_bucket(tenure):
+    """Tramo de antiguedad: 0 (<=12 meses), 1 (<=24), 2 (<=48), 3 (>48)."""
+    return np.digitize(tenure, [12, 24, 48], right=True).astype(np.float64)
+
+
+@register("is_new_customer", deps=["tenure_months"])
+def _is_new_customer(tenure):
+    """1 si el cliente tiene 6 meses o menos de antiguedad."""
+    return (tenure <= 6).astype(np.float64)
+
+
+# ---------- Resolucion y calculo ----------
+
+def resolve_order(names: List[str]) -> List[str]:
+    """Features a calcular (pedidas + dependencias registradas) en orden topologico."""
+    order: List[str] = []
+    visiting = set()
+
+    def visit(name: str):
+        if name in order or name not in FEATURES:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependencia circular en la feature '{name}'")
+        visiting.add(name)
+        for dep in FEATURES[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        if name not in FEATURES:
+            raise KeyError(f"Feature no registrada: '{name}' (disponibles: {', '.join(FEATURES)})")
+        visit(name)
+    return order
+
+
+def _array_fingerprint(values: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+
+def _feature_fingerprint(spec: FeatureSpec, dep_prints: List[str]) -> str:
+    h = hashlib.sha256(inspect.getsource(spec.func).encode("utf-8"))
+    for p in dep_prints:
+        h.update(p.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def compute_features(df: pd.DataFrame, names: List[str], cache_dir: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Calcula `names` (y sus dependencias) sobre `df`.
+
+    Con `cache_dir`, cada feature se lee de `<cache_dir>/<nombre>.npy` si su huella no cambio;
+    la huella combina el codigo de la funcion y las huellas de sus entradas, asi que cambiar
+    una feature invalida tambien a las que dependen de ella (y a ninguna otra).
+    """
+    manifest: Dict[str, str] = {}
+    manifest_path = cache_dir / "manifest.json" if cache_dir else None
+    if manifest_path and manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    values: Dict[str, np.ndarray] = {}
+    prints: Dict[str, str] = {}
+    recomputed: List[str] = []
+    for name in resolve_order(names):
+        spec = FEATURES[name]
+        args = []
+        for dep in spec.deps:
+            if dep not in values:
+                if dep not in df.columns:
+                    raise KeyError(f"La feature '{name}' necesita la columna '{dep}'")
+                values[dep] = df[dep].to_numpy(dtype=np.float64)
+                if cache_dir:
+                    prints[dep] = _array_fingerprint(values[dep])
+            args.append(values[dep])
+        if cache_dir:
+            prints[name] = _feature_fingerprint(spec, [prints[d] for d in spec.deps])
+            path = cache_dir / f"{name}.npy"
+            if manifest.get(name) == prints[name] and path.exists():
+                values[name] = np.load(path)
+                continue
+        values[name] = np.asarray(spec.func(*args), dtype=np.float64)
+        recomputed.append(name)
+        if cache_dir:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(cache_dir / f"{name}.npy", values[name])
+            manifest[name] = prints[name]
+
+    if manifest_path:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"[INFO] Features recalculadas: {', '.join(recomputed) if recomputed else 'ninguna (cache)'}")
+    return {name: values[name] for name in names}
+
+
+def add_features(df: pd.DataFrame, names: List[str], cache_dir: Optional[Path] = None) -> pd.DataFrame:
+    """Devuelve `df` con las features `names` agregadas (las no registradas se ignoran)."""
+    names = [n for n in names if n in FEATURES and n not in df.columns]
+    if not names:
+        return df
+    computed = compute_features(df, names, cache_dir)
+    return pd.concat([df, pd.DataFrame(computed, index=df.index)], axis=1)
+
+
+def build_feature_dataset(df: pd.DataFrame, enabled: List[str], drop: List[str],
+                          cache_dir: Optional[Path] = None) -> pd.DataFrame:
+    """Dataset de entrenamiento: procesado + features habilitadas - columnas podadas."""
+    out = add_features(df, enabled, cache_dir)
+    missing = [c for c in drop if c not in out.columns]
+    if missing:
+        print(f"[WARN] Columnas a podar que no existen: {', '.join(missing)}")
+    return out.drop(columns=[c for c in drop if c in out.columns])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature engineering declarativo con cache por feature")
+    parser.add_argument("--input", default="data/processed/telco_churn_processed.csv", help="CSV procesado")
+    parser.add_argument("--out", default="data/processed/telco_churn_features.csv", help="CSV con features")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (seccion features)")
+    parser.add_argument("--list", action="store_true", help="Listar las features registradas y salir")
+    args = parser.parse_args()
+
+    if args.list:
+        for spec in FEATURES.values():
+            print(f"{spec.name:20s} <- {', '.join(spec.deps):45s} {spec.description}")
+        return
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        cfg = (yaml.safe_load(f) or {}).get("features", {}) or {}
+    enabled = list(cfg.get("enabled") or [])
+    drop = list(cfg.get("drop") or [])
+    cache_dir = Path(cfg.get("cache_dir", "data/features"))
+
+    df = pd.read_csv(args.input)
+    out = build_feature_dataset(df, enabled, drop, cache_dir)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(args.out, index=False)
+    print(f"[OK] Dataset con features guardado: {args.out} (shape={out.shape}, "
+          f"+{len(enabled)} features, -{len([c for c in drop if c in df.columns])} columnas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+loadtest.py
+
+Generador de carga para el scoring de TelcoVision: ¿dónde satura el modelo?
+- Target `inprocess`: `predict.score_records` con los artefactos de `load_scoring_artifacts`
+  (mismo camino que el scoring online), en un pool de threads del tamaño de la concurrencia
+- Target `http`: POST /predict contra un servicio local (`serving.py serve`), cliente asyncio
+  sin dependencias extra (una conexión por request, como el `ThreadingHTTPServer` del servicio)
+- Barre niveles de concurrencia x tamaños de batch con registros reales muestreados del raw;
+  cada combinación corre `duration_seconds` después de `warmup_seconds` sin medir
+- Reporta throughput (requests/s y registros/s), latencias p50/p90/p99/max, errores (con tipo y
+  mensaje de los primeros distintos), CPU (% de un core, del proceso que puntúa) y RSS (pico)
+  leídos de /proc; con `http` se mide el proceso del servidor si se pasa `--server-pid`
+- Resultado en JSON con la versión del modelo (sha256 del artefacto o versión activa del
+  servicio) para comparar corridas; `--baseline` imprime la variación de throughput y p99
+
+Uso:
+python src/loadtest.py --target inprocess
+python src/loadtest.py --target http --url http://localhost:8000 --server-pid 12345 --baseline reports/loadtest_prev.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import yaml
+
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16]
+DEFAULT_BATCH_SIZES = [1, 10, 100]
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# ---------- Registros ----------
+
+def sample_records(raw_path: str, n: int, target: str = "churn", random_state: int = 42) -> List[Dict[str, Any]]:
+    """`n` clientes del raw (sin la columna objetivo) como dicts listos para JSON."""
+    df = pd.read_csv(raw_path)
+    df = df.drop(columns=[target], errors="ignore").sample(n=min(n, len(df)), random_state=random_state)
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def build_payloads(records: List[Dict[str, Any]], batch_size: int, n_payloads: int = 64,
+                   random_state: int = 42) -> List[List[Dict[str, Any]]]:
+    """Lotes precalculados (así el costo de armar el request no entra en la medición)."""
+    rng = np.random.default_rng(random_state + batch_size)
+    starts = rng.integers(0, max(1, len(records) - batch_size + 1), size=n_payloads)
+    return [records[s:s + batch_size] for s in starts]
+
+
+# ---------- CPU / RSS del proceso que puntúa ----------
+
+class ProcessSampler:
+    """CPU (delta de utime+stime) y RSS de un PID leyendo /proc; fallback al propio proceso."""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid or os.getpid()
+        self.has_proc = Path(f"/proc/{self.pid}/stat").exists()
+        self.peak_rss_mb = 0.0
+
+    def cpu_seconds(self) -> Optional[float]:
+        if self.has_proc:
+            with open(f"/proc/{self.pid}/stat", "r") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / _CLK_TCK
+        if self.pid == os.getpid():
+            t = os.times()
+            return t.user + t.system
+        return None
+
+    def rss_mb(self) -> Optional[float]:
+        if self.has_proc:
+            with open(f"/proc/{self.pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        if self.pid == os.getpid():
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # pico (KB en Linux)
+        return None
+
+    async def watch(self, stop: asyncio.Event, interval: float = 0.1):
+        self.peak_rss_mb = 0.0
+        while not stop.is_set():
+            rss = self.rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+class _NullSampler(ProcessSampler):
+    """Sin PID del servidor: CPU/RSS quedan en None."""
+
+    def __init__(self):
+        self.pid, self.has_proc, self.peak_rss_mb = None, False, 0.0
+
+    def cpu_seconds(self):
+        return None
+
+    def rss_mb(self):
+        return None
+
+
+# ---------- Targets ----------
+
+def inprocess_target(params_path: str = "params.yaml", model_path: Optional[str] = None):
+    """(función bloqueante de scoring, versión del modelo) para el camino de scoring online."""
+    from predict import _load_params, load_fill_values, load_scoring_artifacts, score_records
+    from score_cache import model_version
+
+    model, threshold, calibrator = load_scoring_artifacts(params_path, model_path)
+    resolved = model_path or _load_params(params_path).get("paths", {}).get("model_path", "models/model.joblib")
+    fill_values = load_fill_values(resolved)
+
+    def call(records: List[Dict[str, Any]]):
+        return score_records(model, records, threshold, calibrator=calibrator, fill_values=fill_values)
+
+    return call, model_version(resolved)
+
+
+async def _http_post(host: str, port: int, path: str, body: bytes) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()  # cuerpo completo: la latencia incluye la respuesta
+        parts = status_line.split()
+        if not parts:
+            raise ConnectionError("EmptyResponse")  # el servidor cerró sin responder (saturado)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise ConnectionError(f"Status line inválida: {status_line[:80]!r}")
+        return int(parts[1])
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _http_get_json(host: str, port: int, path: str) -> Dict[str, Any]:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        raw = await reader.read()
+        return json.loads(raw.split(b"\r\n\r\n", 1)[1] or b"{}")
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+# ---------- Carga ----------
+
+def _describe_error(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+async def run_level(send: Callable, payloads: List[Any], batch_size: int, concurrency: int, duration: float,
+                    warmup: float, sampler: ProcessSampler, max_error_kinds: int = 5) -> Dict[str, Any]:
+    """
+    `concurrency` workers enviando requests en loop cerrado durante `warmup + duration` segundos.
+
+    `send` devuelve None si el request salió bien o la descripción del error ("Tipo: mensaje");
+    el reporte guarda los primeros `max_error_kinds` errores distintos con su cantidad.
+    """
+    latencies: List[float] = []
+    errors = 0
+    error_kinds: Dict[str, int] = {}
+    n_records = 0
+    measuring = False
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + warmup + duration
+
+    async def worker(wid: int):
+        nonlocal errors, n_records
+        i = wid
+        while loop.time() < deadline:
+            payload = payloads[i % len(payloads)]
+            i += concurrency
+            t0 = time.perf_counter()
+            error = await send(payload)
+            elapsed = time.perf_counter() - t0
+            if measuring:
+                if error is None:
+                    latencies.append(elapsed)
+                    n_records += batch_size
+                else:
+                    errors += 1
+                    if error in error_kinds or len(error_kinds) < max_error_kinds:
+                        error_kinds[error] = error_kinds.get(error, 0) + 1
+
+    stop = asyncio.Event()
+    workers = [asyncio.create_task(worker(w)) for w in range(concurrency)]
+    await asyncio.sleep(warmup)
+    measuring = True
+    watcher = asyncio.create_task(sampler.watch(stop))
+    cpu0, t0 = sampler.cpu_seconds(), time.perf_counter()
+    await asyncio.gather(*workers)
+    wall = time.perf_counter() - t0
+    cpu1 = sampler.cpu_seconds()
+    stop.set()
+    await watcher
+
+    lat_ms = np.asarray(latencies) * 1000.0
+    pct = (lambda q: float(np.percentile(lat_ms, q))) if len(lat_ms) else (lambda q: None)
+    return {
+        "requests": int(len(lat_ms)),
+        "errors": int(errors),
+        "error_samples": error_kinds,
+        "seconds": round(wall, 3),
+        "requests_per_s": len(lat_ms) / wall if wall > 0 else None,
+        "records_per_s": n_records / wall if wall > 0 else None,
+        "latency_ms": {"p50": pct(50), "p90": pct(90), "p99": pct(99),
+                       "max": float(lat_ms.max()) if len(lat_ms) else None},
+        "cpu_percent": (cpu1 - cpu0) / wall * 100 if cpu0 is not None and cpu1 is not None and wall > 0 else None,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1) if sampler.peak_rss_mb else None,
+    }
+
+
+async def sweep(target: str, records: List[Dict[str, Any]], concurrency_levels: List[int], batch_sizes: List[int],
+                duration: float, warmup: float, params_path: str = "params.yaml", model_path: Optional[str] = None,
+                url: str = "http://localhost:8000", server_pid: Optional[int] = None) -> Dict[str, Any]:
+    """Corre todas las combinaciones concurrencia x batch y arma el reporte."""
+    executor = None
+    if target == "inprocess":
+        call, version = inprocess_target(params_path, model_path)
+        executor = ThreadPoolExecutor(max_workers=max(concurrency_levels))
+        loop = asyncio.get_running_loop()
+        sampler = ProcessSampler()
+
+        async def send(payload):
+            try:
+                await loop.run_in_executor(executor, call, payload)
+                return None
+            except Exception as e:
+                return _describe_error(e)
+        encode = lambda batch: batch  # noqa: E731
+    else:
+        parsed = urlparse(url)
+        host, port = parsed.hostname or "localhost", parsed.port or 80
+        version = (await _http_get_json(host, port, "/status")).get("active_version")
+        sampler = ProcessSampler(server_pid) if server_pid else _NullSampler()
+
+        async def send(body):
+            try:
+                status = await _http_post(host, port, "/predict", body)
+                return None if status == 200 else f"HTTP {status}"
+            except Exception as e:  # cualquier fallo cuenta como error del nivel, no aborta el barrido
+                return _describe_error(e)
+        encode = lambda batch: json.dumps(batch).encode("utf-8")  # noqa: E731
+
+    levels = []
+    try:
+        for batch in batch_sizes:
+            payloads = [encode(p) for p in build_payloads(records, batch)]
+            for conc in concurrency_levels:
+                result = await run_level(send, payloads, batch, conc, duration, warmup, sampler)
+                levels.append({"concurrency": conc, "batch_size": batch, **result})
+                p99 = result["latency_ms"]["p99"]
+                print(f"[INFO] batch={batch:<4} concurrencia={conc:<3} {result['requests_per_s'] or 0:8.1f} req/s "
+                      f"{result['records_per_s'] or 0:10.1f} reg/s p99={'N/A' if p99 is None else f'{p99:.1f}ms'} "
+                      f"errores={result['errors']}")
+                if result["error_samples"]:
+                    first, count = next(iter(result["error_samples"].items()))
+                    print(f"[WARN] batch={batch} concurrencia={conc}: {first} (x{count})")
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    return {
+        "target": target,
+        "url": url if target == "http" else None,
+        "model_version": version,
+        "duration_seconds": duration,
+        "warmup_seconds": warmup,
+        "cpu_count": os.cpu_count(),
+        "levels": levels,
+        "saturation": saturation_points(levels),
+    }
+
+
+def saturation_points(levels: List[Dict[str, Any]], gain: float = 0.05) -> Dict[str, Any]:
+    """Por batch: menor concurrencia a partir de la cual duplicarla mejora el throughput < `gain`."""
+    out = {}
+    for batch in sorted({lv["batch_size"] for lv in levels}):
+        rows = sorted((lv for lv in levels if lv["batch_size"] == batch and lv["requests_per_s"]),
+                      key=lambda lv: lv["concurrency"])
+        best = max(rows, key=lambda lv: lv["records_per_s"]) if rows else None
+        knee = rows[-1]["concurrency"] if rows else None
+        for prev, cur in zip(rows, rows[1:]):
+            if cur["records_per_s"] < prev["records_per_s"] * (1 + gain):
+                knee = prev["concurrency"]
+                break
+        out[str(batch)] = {
+            "saturation_concurrency": knee,
+            "max_records_per_s": best["records_per_s"] if best else None,
+            "at_concurrency": best["concurrency"] if best else None,
+        }
+    return out
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Variación de throughput y p99 contra otra corrida (mismas combinaciones)."""
+    base = {(lv["concurrency"], lv["batch_size"]): lv for lv in baseline.get("levels", [])}
+    print(f"\nComparación {baseline.get('model_version')} -> {report.get('model_version')}:")
+    for lv in report["levels"]:
+        ref = base.get((lv["concurrency"], lv["batch_size"]))
+        if not ref or not ref["records_per_s"] or not lv["records_per_s"]:
+            continue
+        d_thr = lv["records_per_s"] / ref["records_per_s"] - 1
+        p99, ref_p99 = lv["latency_ms"]["p99"], ref["latency_ms"]["p99"]
+        d_p99 = f"{p99 / ref_p99 - 1:+.1%}" if p99 and ref_p99 else "N/A"
+        print(f"  batch={lv['batch_size']:<4} concurrencia={lv['concurrency']:<3} throughput {d_thr:+.1%}  p99 {d_p99}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load testing del scoring (in-process o HTTP) con barrido de concurrencia")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (sección loadtest)")
+    parser.add_argument("--target", choices=["inprocess", "http"], help="Override de loadtest.target")
+    parser.add_argument("--model", help="Artefacto para --target inprocess (override de paths.model_path)")
+    parser.add_argument("--url", help="Servicio para --target http (override de loadtest.url)")
+    parser.add_argument("--server-pid", type=int, help="PID del servidor para medir CPU/RSS con --target http")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="Niveles de concurrencia")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", help="Registros por request")
+    parser.add_argument("--duration", type=float, help="Segundos medidos por combinación")
+    parser.add_argument("--report", help="Reporte JSON (override de loadtest.report_path)")
+    parser.add_argument("--baseline", help="Reporte JSON de otra corrida para comparar")
+    args = parser.parse_args()
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        params = yaml.safe_load(f) or {}
+    cfg = params.get("loadtest", {}) or {}
+    target = args.target or cfg.get("target", "inprocess")
+    records = sample_records(cfg.get("raw_data", "data/raw/telco_churn.csv"), int(cfg.get("pool_size", 5000)),
+                             params.get("target", "churn"), int(params.get("random_state", 42)))
+
+    report = asyncio.run(sweep(
+        target, records,
+        args.concurrency or list(cfg.get("concurrency", DEFAULT_CONCURRENCY)),
+        args.batch_sizes or list(cfg.get("batch_sizes", DEFAULT_BATCH_SIZES)),
+        args.duration or float(cfg.get("duration_seconds", 5)),
+        float(cfg.get("warmup_seconds", 1)),
+        args.params, args.model, args.url or cfg.get("url", "http://localhost:8000"), args.server_pid,
+    ))
+    report_path = Path(args.report or cfg.get("report_path", "reports/loadtest_report.json"))
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[SAVE] Reporte de carga guardado: {report_path} (modelo {report['model_version']})")
+    for batch, sat in report["saturation"].items():
+        if sat["max_records_per_s"] is not None:
+            print(f"[INFO] batch={batch}: satura en concurrencia {sat['saturation_concurrency']} "
+                  f"(máx {sat['max_records_per_s']:.1f} reg/s con {sat['at_concurrency']})")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
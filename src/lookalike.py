@@ -0,0 +1,366 @@
+"""
+lookalike.py
+
+Índice de clientes parecidos ("lookalikes") para retención proactiva en TelcoVision.
+- Vectores: la matriz de features del modelo (`paths.processed_data`, columnas del modelo) pasada
+  por el `StandardScaler` del Pipeline entrenado: misma escala que ve el modelo
+- Modo `exact`: búsqueda exacta por bloques con NumPy (distancia euclídea al cuadrado vía
+  ||q||² + ||x||² - 2 q·x, top-k con `argpartition` y merge por bloque): memoria acotada
+- Modo `ivf`: particiones por k-means (MiniBatchKMeans); las filas se guardan ordenadas por
+  partición (cada lista es un rango contiguo) y cada query revisa sólo las `n_probe` más cercanas
+- Queries en lote: cada partición se compara de una vez contra todas las queries que la sondean
+- Inserts incrementales: las filas nuevas se agregan al final de los archivos (cola asignada a su
+  partición) sin reescribir el índice; `compact` las reordena cuando la cola crece
+- Persistido junto al modelo (`models/lookalike_index/`, binarios crudos + `meta.json`) y abierto
+  con memmap: cargar el índice no lee los vectores a memoria
+
+Uso:
+python src/lookalike.py build
+python src/lookalike.py insert --input data/clientes_nuevos.csv
+python src/lookalike.py query --input data/churn_mes_pasado.csv --out reports/lookalikes.csv
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+
+MODES = ("auto", "exact", "ivf")
+_FILES = {"vectors": "vectors.f32", "ids": "ids.bin", "lists": "lists.i32"}
+
+
+def _sq_distances(q: np.ndarray, q_norms: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Distancias euclídeas al cuadrado (queries x filas) en float32."""
+    d = q_norms[:, None] + np.einsum("ij,ij->i", x, x)[None, :] - 2.0 * (q @ x.T)
+    return np.maximum(d, 0.0, out=d)
+
+
+def _merge_topk(best_d: np.ndarray, best_i: np.ndarray, d: np.ndarray, rows: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Combina el top-k acumulado con las distancias de un bloque (`rows`: índices globales)."""
+    cat_d = np.concatenate([best_d, d], axis=1)
+    cat_i = np.concatenate([best_i, np.broadcast_to(rows, d.shape)], axis=1)
+    part = np.argpartition(cat_d, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(cat_d, part, axis=1), np.take_along_axis(cat_i, part, axis=1)
+
+
+class LookalikeIndex:
+    """Índice de vectores escalados con búsqueda exacta por bloques o IVF, abierto con memmap."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        with open(self.root / "meta.json", "r", encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self._truncate_to_meta()
+        self._open()
+
+    # ---------- Construcción ----------
+
+    @classmethod
+    def build(cls, root: str, vectors: np.ndarray, ids: Sequence[str], columns: List[str], mode: str = "auto",
+              n_lists: Optional[int] = None, exact_max_rows: int = 200_000, model_version: Optional[str] = None,
+              random_state: int = 42) -> "LookalikeIndex":
+        """Escribe el índice en `root` (reemplazo atómico del directorio) y lo abre."""
+        if mode not in MODES:
+            raise ValueError(f"lookalike.mode debe ser uno de {MODES}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray([str(i) for i in ids])
+        if len(vectors) == 0 or len(vectors) != len(ids):
+            raise ValueError("El índice necesita al menos una fila y un id por fila")
+        n = len(vectors)
+        if mode == "auto":
+            mode = "exact" if n <= exact_max_rows else "ivf"
+
+        lists = np.zeros(n, dtype=np.int32)
+        centroids = None
+        if mode == "ivf":
+            from sklearn.cluster import MiniBatchKMeans
+
+            n_lists = int(n_lists or max(1, int(np.sqrt(n))))
+            rng = np.random.default_rng(random_state)
+            sample = vectors[rng.choice(n, size=min(n, 256 * n_lists), replace=False)]
+            kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=3, batch_size=4096,
+                                     random_state=random_state).fit(sample)
+            centroids = kmeans.cluster_centers_.astype(np.float32)
+            lists = np.concatenate([kmeans.predict(vectors[s:s + 100_000])
+                                    for s in range(0, n, 100_000)]).astype(np.int32)
+            order = np.argsort(lists, kind="stable")
+            vectors, ids, lists = vectors[order], ids[order], lists[order]
+
+        root = Path(root)
+        tmp = root.with_name(f".{root.name}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        id_width = max(32, 2 * max(len(i) for i in ids))
+        vectors.tofile(tmp / _FILES["vectors"])
+        ids.astype(f"S{id_width}").tofile(tmp / _FILES["ids"])
+        lists.tofile(tmp / _FILES["lists"])
+        meta = {
+            "mode": mode,
+            "dim": int(vectors.shape[1]),
+            "columns": list(columns),
+            "id_width": id_width,
+            "n_sorted": n,
+            "n_tail": 0,
+            "model_version": model_version,
+        }
+        if centroids is not None:
+            np.save(tmp / "centroids.npy", centroids)
+            meta["n_lists"] = int(len(centroids))
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(root, ignore_errors=True)
+        tmp.rename(root)
+        print(f"[OK] Índice de lookalikes ({mode}) guardado: {root} ({n:,} filas x {meta['dim']} dims"
+              + (f", {meta['n_lists']} particiones)" if centroids is not None else ")"))
+        return cls(str(root))
+
+    # ---------- Apertura (memmap) ----------
+
+    @property
+    def size(self) -> int:
+        return self.meta["n_sorted"] + self.meta["n_tail"]
+
+    def _truncate_to_meta(self):
+        """Descarta bytes de un insert interrumpido (meta.json es el punto de commit)."""
+        row_bytes = {"vectors": 4 * self.meta["dim"], "ids": self.meta["id_width"], "lists": 4}
+        for key, name in _FILES.items():
+            path, expected = self.root / name, self.size * row_bytes[key]
+            if path.stat().st_size > expected:
+                os.truncate(path, expected)
+
+    def _open(self):
+        n, d = self.size, self.meta["dim"]
+        self.vectors = np.memmap(self.root / _FILES["vectors"], dtype=np.float32, mode="r", shape=(n, d))
+        self.ids = np.memmap(self.root / _FILES["ids"], dtype=f"S{self.meta['id_width']}", mode="r", shape=(n,))
+        self.lists = np.memmap(self.root / _FILES["lists"], dtype=np.int32, mode="r", shape=(n,))
+        self.centroids = np.load(self.root / "centroids.npy") if self.meta["mode"] == "ivf" else None
+        if self.centroids is not None:
+            # Filas ordenadas por partición: rango [offsets[l], offsets[l+1]) de cada lista
+            sorted_lists = self.lists[:self.meta["n_sorted"]]
+            self.offsets = np.searchsorted(sorted_lists, np.arange(len(self.centroids) + 1)).astype(np.int64)
+
+    # ---------- Búsqueda ----------
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = 8, block_rows: int = 16_384,
+               query_block: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k vecinos de cada query: (distancias euclídeas, filas), ordenados de menor a mayor."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        k = int(min(k, self.size))
+        out_d = np.empty((len(queries), k), dtype=np.float32)
+        out_i = np.empty((len(queries), k), dtype=np.int64)
+        for s in range(0, len(queries), query_block):
+            q = queries[s:s + query_block]
+            if self.centroids is None:
+                d, i = self._search_exact(q, k, block_rows)
+            else:
+                d, i = self._search_ivf(q, k, n_probe, block_rows)
+            order = np.argsort(d, axis=1)
+            out_d[s:s + len(q)] = np.sqrt(np.take_along_axis(d, order, axis=1))
+            out_i[s:s + len(q)] = np.take_along_axis(i, order, axis=1)
+        return out_d, out_i
+
+    def _search_exact(self, q: np.ndarray, k: int, block_rows: int):
+        q_norms = np.einsum("ij,ij->i", q, q)
+        best_d = np.full((len(q), k), np.inf, dtype=np.float32)
+        best_i = np.full((len(q), k), -1, dtype=np.int64)
+        for start in range(0, self.size, block_rows):
+            x = np.asarray(self.vectors[start:start + block_rows])
+            d = _sq_distances(q, q_norms, x)
+            best_d, best_i = _merge_topk(best_d, best_i, d, np.arange(start, start + len(x)), k)
+        return best_d, best_i
+
+    def _search_ivf(self, q: np.ndarray, k: int, n_probe: int, block_rows: int):
+        q_norms = np.einsum("ij,ij->i", q, q)
+        n_probe = int(min(n_probe, len(self.centroids)))
+        to_centroids = _sq_distances(q, q_norms, self.centroids)
+        probes = np.argpartition(to_centroids, n_probe - 1, axis=1)[:, :n_probe]
+        # Invertido: por partición, qué queries la sondean
+        flat = probes.ravel()
+        q_of = np.repeat(np.arange(len(q)), n_probe)
+        order = np.argsort(flat, kind="stable")
+        flat, q_of = flat[order], q_of[order]
+        bounds = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1], True])
+
+        n_sorted = self.meta["n_sorted"]
+        tail_lists = np.asarray(self.lists[n_sorted:])
+        tail_order = np.argsort(tail_lists, kind="stable") + n_sorted
+        tail_bounds = np.searchsorted(np.sort(tail_lists), np.arange(len(self.centroids) + 1))
+
+        best_d = np.full((len(q), k), np.inf, dtype=np.float32)
+        best_i = np.full((len(q), k), -1, dtype=np.int64)
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            lst, qs = int(flat[a]), q_of[a:b]
+            qq, qn, bd, bi = q[qs], q_norms[qs], best_d[qs], best_i[qs]
+            lo, hi = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            for start in range(lo, hi, block_rows):
+                stop = min(start + block_rows, hi)
+                d = _sq_distances(qq, qn, np.asarray(self.vectors[start:stop]))
+                bd, bi = _merge_topk(bd, bi, d, np.arange(start, stop), k)
+            tail = tail_order[tail_bounds[lst]:tail_bounds[lst + 1]]
+            if len(tail):
+                bd, bi = _merge_topk(bd, bi, _sq_distances(qq, qn, np.asarray(self.vectors[tail])), tail, k)
+            best_d[qs], best_i[qs] = bd, bi
+        return best_d, best_i
+
+    def row_ids(self, rows: np.ndarray) -> np.ndarray:
+        """Ids de cliente de las filas devueltas por `search` (-1 = sin vecino)."""
+        out = np.asarray(self.ids[np.maximum(rows, 0)]).astype(str)
+        return np.where(rows >= 0, out, "")
+
+    # ---------- Inserts ----------
+
+    def insert(self, vectors: np.ndarray, ids: Sequence[str], compact_ratio: float = 0.2) -> int:
+        """Agrega clientes al final del índice (append a los archivos); compacta si la cola supera `compact_ratio`."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray([str(i) for i in ids])
+        if vectors.shape[1] != self.meta["dim"]:
+            raise ValueError(f"Dimensión {vectors.shape[1]} != {self.meta['dim']} del índice")
+        if len(ids) and max(len(i) for i in ids) > self.meta["id_width"]:
+            raise ValueError(f"Ids de más de {self.meta['id_width']} caracteres")
+        if self.centroids is not None:
+            q_norms = np.einsum("ij,ij->i", vectors, vectors)
+            lists = np.argmin(_sq_distances(vectors, q_norms, self.centroids), axis=1).astype(np.int32)
+        else:
+            lists = np.zeros(len(vectors), dtype=np.int32)
+        for name, arr in (("vectors", vectors), ("ids", ids.astype(f"S{self.meta['id_width']}")), ("lists", lists)):
+            with open(self.root / _FILES[name], "ab") as f:
+                arr.tofile(f)
+        self.meta["n_tail"] += len(vectors)
+        self._write_meta()
+        self._open()
+        if self.centroids is not None and self.meta["n_tail"] > compact_ratio * self.meta["n_sorted"]:
+            self.compact()
+        return len(vectors)
+
+    def compact(self):
+        """Reordena todas las filas por partición (mismos centroides) y vacía la cola."""
+        if self.centroids is None or self.meta["n_tail"] == 0:
+            return
+        order = np.argsort(np.asarray(self.lists), kind="stable")
+        tmp = self.root / ".compact"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name, arr in (("vectors", self.vectors), ("ids", self.ids), ("lists", self.lists)):
+            np.asarray(arr)[order].tofile(tmp / _FILES[name])
+        for name in _FILES.values():
+            os.replace(tmp / name, self.root / name)
+        tmp.rmdir()
+        self.meta["n_sorted"], self.meta["n_tail"] = self.size, 0
+        self._write_meta()
+        self._open()
+        print(f"[OK] Índice compactado: {self.size:,} filas")
+
+    def _write_meta(self):
+        tmp = self.root / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, self.root / "meta.json")
+
+
+# ---------- Vectores desde el modelo ----------
+
+def scaled_vectors(model, X: pd.DataFrame) -> np.ndarray:
+    """Features del modelo pasadas por el StandardScaler del Pipeline (paso `scaler`)."""
+    if not hasattr(model, "named_steps") or "scaler" not in model.named_steps:
+        raise ValueError("El índice necesita un Pipeline con paso 'scaler' (models/model.joblib)")
+    return model.named_steps["scaler"].transform(X[list(model.feature_names_in_)]).astype(np.float32)
+
+
+def lookalikes(index: LookalikeIndex, seed_vectors: np.ndarray, seed_ids: Sequence[str], k: int = 20,
+               top: int = 500, n_probe: int = 8) -> pd.DataFrame:
+    """
+    Clientes más parecidos a un conjunto semilla (p.ej. los que churnearon el mes pasado).
+
+    Cada semilla aporta sus k vecinos; se excluyen las propias semillas y cada candidato queda
+    con la distancia mínima y cuántas semillas lo tienen como vecino.
+    """
+    dist, rows = index.search(seed_vectors, k + 1, n_probe)
+    cand = pd.DataFrame({"customer_id": index.row_ids(rows.ravel()), "distance": dist.ravel()})
+    cand = cand[(cand["customer_id"] != "") & ~cand["customer_id"].isin({str(s) for s in seed_ids})]
+    out = cand.groupby("customer_id")["distance"].agg(min_distance="min", n_seeds="size").reset_index()
+    return out.sort_values(["n_seeds", "min_distance"], ascending=[False, True]).head(top).reset_index(drop=True)
+
+
+def _row_ids(params: Dict[str, Any], cfg: Dict[str, Any], n_rows: int) -> np.ndarray:
+    """`customer_id` del raw (alineado fila a fila con el procesado); si no alinea, número de fila."""
+    from data_prep import load_raw_from_params
+
+    raw = load_raw_from_params(params, cfg.get("raw_data", "data/raw/telco_churn.csv"))
+    if len(raw) == n_rows and "customer_id" in raw.columns:
+        return raw["customer_id"].astype(str).str.strip().to_numpy()
+    print(f"[WARN] El raw ({len(raw)} filas) no está alineado con el procesado ({n_rows}); ids = número de fila")
+    return np.arange(n_rows).astype(str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de clientes parecidos (lookalikes) sobre features escaladas")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (sección lookalike)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bp = sub.add_parser("build", help="Construir el índice desde el dataset procesado")
+    bp.add_argument("--mode", choices=MODES, help="Override de lookalike.mode")
+    ip = sub.add_parser("insert", help="Agregar clientes nuevos (CSV crudo con customer_id)")
+    ip.add_argument("--input", required=True)
+    qp = sub.add_parser("query", help="Lookalikes de un conjunto semilla (CSV crudo con customer_id)")
+    qp.add_argument("--input", required=True)
+    qp.add_argument("--out", required=True, help="CSV de salida")
+    qp.add_argument("--k", type=int, help="Vecinos por semilla (override de lookalike.k)")
+    qp.add_argument("--top", type=int, help="Candidatos a devolver (override de lookalike.top)")
+    sub.add_parser("compact", help="Reordenar la cola de inserts por partición")
+    args = parser.parse_args()
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        params = yaml.safe_load(f) or {}
+    cfg = params.get("lookalike", {}) or {}
+    paths = params.get("paths", {}) or {}
+    model_path = paths.get("model_path", "models/model.joblib")
+    index_dir = cfg.get("index_dir") or str(Path(model_path).with_name("lookalike_index"))
+
+    from score_cache import model_version
+
+    if args.command == "build":
+        model = joblib.load(model_path)
+        X = pd.read_csv(paths["processed_data"]).drop(columns=[params.get("target", "churn")], errors="ignore")
+        LookalikeIndex.build(
+            index_dir, scaled_vectors(model, X), _row_ids(params, cfg, len(X)), list(model.feature_names_in_),
+            args.mode or cfg.get("mode", "auto"), cfg.get("n_lists"), int(cfg.get("exact_max_rows", 200_000)),
+            model_version(model_path), int(params.get("random_state", 42)),
+        )
+        return
+
+    index = LookalikeIndex(index_dir)
+    if args.command == "compact":
+        index.compact()
+        return
+    if index.meta.get("model_version") != model_version(model_path):
+        print("[WARN] El modelo cambió desde que se construyó el índice (escala distinta): reconstruir con `build`")
+
+    from predict import load_fill_values, prepare_features
+
+    model = joblib.load(model_path)
+    raw = pd.read_csv(args.input)
+    if "customer_id" not in raw.columns:
+        raise ValueError("El CSV necesita la columna 'customer_id'")
+    vectors = scaled_vectors(model, prepare_features(raw, list(model.feature_names_in_), load_fill_values(model_path)))
+    ids = raw["customer_id"].astype(str).str.strip().to_numpy()
+    if args.command == "insert":
+        n = index.insert(vectors, ids, float(cfg.get("compact_ratio", 0.2)))
+        print(f"[OK] {n:,} clientes agregados al índice ({index.size:,} filas)")
+        return
+
+    result = lookalikes(index, vectors, ids, args.k or int(cfg.get("k", 20)), args.top or int(cfg.get("top", 500)),
+                        int(cfg.get("n_probe", 8)))
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    result.to_csv(args.out, index=False)
+    print(f"[SAVE] {len(result):,} lookalikes de {len(ids):,} clientes semilla guardados: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+predict.py
+
+Scoring de clientes para TelcoVision (batch y online).
+- Carga el modelo (`models/model.joblib`) y la politica de decision (`models/decision_policy.json`)
+- Aplica la misma limpieza que `data_prep.py` y alinea las dummies con las columnas del modelo;
+  los nulos numericos se imputan con las medianas de train (`imputation.json` junto al modelo),
+  no con las del lote: un cliente suelto con nulos se puntua igual que en batch
+- Una sola llamada a `predict_proba`; la clase se decide con el umbral optimizado (sin `predict`)
+- Si existe `models/calibrator.json`, las probabilidades se calibran (vectorizado) antes del umbral
+- Politica y calibrador llevan el sha256 del modelo para el que se ajustaron; con otro artefacto
+  (`--model`) no se aplican: umbral 0.5 y probabilidades crudas, con un aviso
+- Con `--cache`, las probabilidades de clientes sin cambios salen de un cache SQLite persistente
+  (clave: hash del vector de features + version del modelo); solo los misses van al modelo
+- Con `--write-db`, los scores se escriben ademas en una tabla SQLite (upsert por `customer_id`,
+  version del modelo y timestamp) desde un thread escritor que se solapa con el scoring
+- Opcionalmente agrega las top-k razones por cliente con el explainer cacheado en entrenamiento
+
+Uso:
+python src/predict.py --input data/raw/telco_churn.csv --output predictions/scores.csv
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+
+from data_prep import IMPUTED_COLUMNS, process_telco
+from explain import explain_top_k
+from features import add_features
+from resources import cpu_budget, set_estimator_threads
+from score_cache import model_version
+
+
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_POLICY_PATH = "models/decision_policy.json"
+DEFAULT_CALIBRATOR_PATH = "models/calibrator.json"
+RISK_BINS = [0.3, 0.6]
+RISK_LABELS = np.array(["Bajo", "Medio", "Alto"])
+
+
+def _read_sidecar(path: Path, model_version: Optional[str], fallback: str,
+                  strict: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    JSON de un sidecar del modelo (politica o calibrador); None si no existe.
+
+    Con `model_version` (sha256 del artefacto, ver `score_cache.model_version`) el sidecar sólo
+    se usa si se ajustó para ese mismo artefacto; si no, se avisa y se descarta.
+    Con `strict=True` (serving) un sidecar ausente o de otro modelo es un error.
+    """
+    if not path.exists():
+        if strict:
+            raise FileNotFoundError(f"Falta el sidecar del modelo: {path}")
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    fitted_for = sidecar.get("model_version")
+    if model_version is not None and fitted_for != model_version:
+        msg = f"{path} se ajusto para el modelo {fitted_for or '(sin version)'}, no para {model_version}"
+        if strict:
+            raise ValueError(msg)
+        print(f"[WARN] {msg}: {fallback}")
+        return None
+    return sidecar
+
+
+def load_decision_threshold(policy_path: str = DEFAULT_POLICY_PATH, model_version: Optional[str] = None,
+                            strict: bool = False) -> float:
+    """Lee el umbral guardado por `threshold.py`; sin politica (o de otro modelo) se usa 0.5."""
+    policy = _read_sidecar(Path(policy_path), model_version, f"se usa umbral {DEFAULT_THRESHOLD}", strict)
+    if policy is None:
+        return DEFAULT_THRESHOLD
+    return float(policy.get("threshold", DEFAULT_THRESHOLD))
+
+
+def load_calibrator(calibrator_path: str = DEFAULT_CALIBRATOR_PATH, model_version: Optional[str] = None,
+                    strict: bool = False) -> Optional[Dict[str, Any]]:
+    """Lee la tabla del calibrador guardada por `calibrate.py`; None si no existe o es de otro modelo."""
+    calibrator = _read_sidecar(Path(calibrator_path), model_version, "sin calibracion", strict)
+    if calibrator is None:
+        return None
+    if calibrator.get("method") == "isotonic":
+        calibrator["x"] = np.asarray(calibrator["x"], dtype=np.float64)
+        calibrator["y"] = np.asarray(calibrator["y"], dtype=np.float64)
+    return calibrator
+
+
+def apply_calibration(proba: np.ndarray, calibrator: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Aplica el calibrador de forma vectorizada (interpolacion isotonica o sigmoide de Platt)."""
+    if calibrator is None:
+        return proba
+    if calibrator["method"] == "isotonic":
+        return np.interp(proba, calibrator["x"], calibrator["y"])
+    p = np.clip(proba, 1e-6, 1 - 1e-6)
+    return 1.0 / (1.0 + np.exp(-(calibrator["a"] * np.log(p / (1 - p)) + calibrator["b"])))
+
+
+def _load_params(params_path: str) -> Dict[str, Any]:
+    with open(params_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_scoring_artifacts(params_path: str = "params.yaml",
+                           model_path: Optional[str] = None) -> Tuple[Any, float, Optional[Dict[str, Any]]]:
+    """
+    Carga el modelo, el umbral de decision y el calibrador definidos en params.yaml.
+
+    `model_path` permite usar otro artefacto compatible (p.ej. `models/stacked_model.joblib`).
+    Umbral y calibrador guardan el sha256 del modelo para el que se ajustaron: si no coincide
+    con el artefacto cargado se ignoran (umbral 0.5, sin calibracion) con un aviso.
+    """
+    params = _load_params(params_path)
+    paths = params.get("paths", {})
+    resolved_model = model_path or paths.get("model_path", "models/model.joblib")
+    model = joblib.load(resolved_model)
+    # n_jobs guardado al entrenar -> presupuesto de scoring (resources.scoring_threads)
+    set_estimator_threads(model, int((params.get("resources") or {}).get("scoring_threads") or cpu_budget(params_path)))
+    version = model_version(resolved_model)
+    threshold = load_decision_threshold(paths.get("decision_policy_path", DEFAULT_POLICY_PATH), version)
+    calibrator = load_calibrator(paths.get("calibrator_path", DEFAULT_CALIBRATOR_PATH), version)
+    return model, threshold, calibrator
+
+
+def load_fill_values(model_path: str) -> Optional[Dict[str, float]]:
+    """Medianas de train guardadas por `train.py` junto al modelo (`imputation.json`); None si no existen."""
+    path = Path(model_path).with_name("imputation.json")
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return {k: float(v) for k, v in json.load(f).items()}
+
+
+def prepare_features(df_raw: pd.DataFrame, feature_names: List[str],
+                     fill_values: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Limpia un lote crudo y lo alinea con las columnas vistas en entrenamiento.
+
+    Se generan todas las dummies (sin drop_first) y luego se reindexa: las categorias
+    de referencia y las nunca vistas quedan fuera, las ausentes en el lote quedan en 0.
+    Con `fill_values` (ver `load_fill_values`) los nulos se imputan con las medianas de train.
+    """
+    processed = process_telco(df_raw, require_target=False, drop_first=False, fill_values=fill_values)
+    # Sólo se calculan las features derivadas que el modelo usa
+    processed = add_features(processed, feature_names)
+    return processed.reindex(columns=feature_names, fill_value=0)
+
+
+def score_frame(model, X: pd.DataFrame, threshold: float,
+                calibrator: Optional[Dict[str, Any]] = None, cache=None) -> pd.DataFrame:
+    """Probabilidad (calibrada si hay calibrador), decision y nivel de riesgo con una sola llamada a predict_proba."""
+    proba = cache.predict_proba(model, X) if cache is not None else model.predict_proba(X)[:, 1]
+    proba = apply_calibration(proba, calibrator)
+    return pd.DataFrame({
+        "churn_probability": proba,
+        "will_churn": proba >= threshold,
+        "risk_level": RISK_LABELS[np.searchsorted(RISK_BINS, proba, side="right")],
+    }, index=X.index)
+
+
+def load_explainer(params_path: str = "params.yaml", model_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Carga el explainer precalculado por `train.py` (junto al modelo).
+
+    Con `model_path` (override `--model`) se usa el `explainer.joblib` de ese modelo, no el de params.
+    """
+    if model_path:
+        return joblib.load(Path(model_path).with_name("explainer.joblib"))
+    paths = _load_params(params_path).get("paths", {})
+    default = Path(paths.get("model_path", "models/model.joblib")).with_name("explainer.joblib")
+    return joblib.load(paths.get("explainer_path", default))
+
+
+def score_with_reasons(model, X: pd.DataFrame, threshold: float, explainer: Optional[Dict[str, Any]],
+                       raw_columns: List[str], top_k: int = 0,
+                       calibrator: Optional[Dict[str, Any]] = None, cache=None) -> pd.DataFrame:
+    """`score_frame` + (si top_k > 0) las top-k razones por cliente desde el explainer cacheado."""
+    scores = score_frame(model, X, threshold, calibrator, cache)
+    if top_k <= 0 or explainer is None:
+        return scores
+    return pd.concat([scores, explain_top_k(model, explainer, X, raw_columns, top_k)], axis=1)
+
+
+def score_records(model, records: List[Dict[str, Any]], threshold: float,
+                  explainer: Optional[Dict[str, Any]] = None, top_k: int = 0,
+                  calibrator: Optional[Dict[str, Any]] = None,
+                  fill_values: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Scoring online: lista de clientes crudos (dicts) -> lista de predicciones (con razones opcionales)."""
+    df_raw = pd.DataFrame.from_records(records)
+    X = prepare_features(df_raw, list(model.feature_names_in_), fill_values)
+    scores = score_with_reasons(model, X, threshold, explainer, list(df_raw.columns), top_k, calibrator)
+    return scores.to_dict(orient="records")
+
+
+def check_cache_hit(model, fill_values: Optional[Dict[str, float]]) -> bool:
+    """
+    El mismo cliente puntuado en un chunk sin nulos y luego en uno con nulos debe salir del cache.
+
+    En el segundo chunk la imputacion pasa las numericas a float: la clave no debe cambiar.
+    """
+    import tempfile
+
+    from score_cache import ScoreCache
+
+    customer = {c: int(round((fill_values or {}).get(c, 1.0))) for c in IMPUTED_COLUMNS}
+    feature_names = list(model.feature_names_in_)
+    clean = prepare_features(pd.DataFrame.from_records([customer]), feature_names, fill_values)
+    with_nulls = prepare_features(pd.DataFrame.from_records([customer, {c: None for c in IMPUTED_COLUMNS}]),
+                                  feature_names, fill_values)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScoreCache(str(Path(tmp) / "check.sqlite"), "check")
+        cache.predict_proba(model, clean)
+        cache.predict_proba(model, with_nulls)
+        hit = cache.hits == 1
+        cache.close()
+    if not hit:
+        raise ValueError("El cache de scoring no reconoce al mismo cliente en un chunk con nulos")
+    return hit
+
+
+def check_null_record(model, fill_values: Optional[Dict[str, float]]) -> float:
+    """Puntua un unico cliente con todas las numericas nulas; falla si no sale una probabilidad valida."""
+    record = {c: None for c in IMPUTED_COLUMNS}
+    proba = score_records(model, [record], DEFAULT_THRESHOLD, fill_values=fill_values)[0]["churn_probability"]
+    if not 0.0 <= proba <= 1.0:
+        raise ValueError(f"El scoring de 1 registro con nulos devolvio {proba}")
+    return float(proba)
+
+
+def batch_predict(input_file: str, output_file: str, params_path: str = "params.yaml",
+                  chunksize: int = 100_000, monitor_drift: bool = False, top_k: int = 0,
+                  model_path: Optional[str] = None, use_cache: bool = False, write_db: Optional[str] = None):
+    """
+    Predice churn para un CSV crudo y guarda las predicciones.
+
+    El archivo se procesa por chunks (memoria acotada). Con `monitor_drift=True` cada chunk
+    actualiza los sketches de drift contra `drift.reference_path` y al final se escribe el
+    reporte en `drift.report_path`; no se guarda ningun dato crudo adicional.
+    Con `top_k > 0` se agregan las top-k razones por cliente (`reason_i`, `reason_i_contribution`).
+    Con `use_cache=True` las probabilidades se buscan en `scoring_cache.path` antes de ir al modelo
+    y el hit rate / tiempo ahorrado del run quedan en `scoring_cache.report_path`.
+    Con `write_db` (ruta SQLite) cada chunk se encola al `ScoreSink` (upsert por `customer_id`,
+    seccion `score_sink`); la escritura corre en otro thread mientras se scorea el chunk siguiente.
+    """
+    model, threshold, calibrator = load_scoring_artifacts(params_path, model_path)
+    feature_names = list(model.feature_names_in_)
+    resolved_model = model_path or _load_params(params_path).get("paths", {}).get("model_path", "models/model.joblib")
+    fill_values = load_fill_values(resolved_model)
+    explainer = load_explainer(params_path, model_path) if top_k > 0 else None
+
+    cache = None
+    if use_cache:
+        from score_cache import ScoreCache
+        cache_cfg = _load_params(params_path).get("scoring_cache", {}) or {}
+        cache = ScoreCache(cache_cfg.get("path", "models/score_cache.sqlite"), model_version(resolved_model),
+                           float(cache_cfg.get("max_mb", 512)))
+
+    sink = None
+    if write_db:
+        from score_sink import ScoreSink
+        sink_cfg = _load_params(params_path).get("score_sink", {}) or {}
+        sink = ScoreSink(write_db, model_version(resolved_model), sink_cfg.get("table", "churn_scores"),
+                         int(sink_cfg.get("batch_rows", 50_000)), int(sink_cfg.get("queue_size", 4)))
+
+    monitor = None
+    if monitor_drift:
+        from drift import DriftMonitor, load_reference
+        drift_cfg = _load_params(params_path).get("drift", {}) or {}
+        monitor = DriftMonitor(
+            load_reference(drift_cfg.get("reference_path", "models/drift_reference.json")),
+            psi_warning=float(drift_cfg.get("psi_warning", 0.1)),
+            psi_alert=float(drift_cfg.get("psi_alert", 0.25)),
+        )
+
+    out = Path(output_file)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Procesando {input_file} (umbral={threshold:.4f}, chunks de {chunksize} filas)...")
+
+    n_total, n_churn = 0, 0
+    risk_counts = dict.fromkeys(RISK_LABELS, 0)
+    for i, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize)):
+        X = prepare_features(chunk, feature_names, fill_values)
+        scores = score_with_reasons(model, X, threshold, explainer, list(chunk.columns), top_k, calibrator, cache)
+        if sink is not None:
+            if "customer_id" not in chunk.columns:
+                raise ValueError("--write-db requiere la columna 'customer_id' en el input")
+            sink.put(chunk["customer_id"], scores)
+        pd.concat([chunk, scores], axis=1).to_csv(out, index=False, mode="w" if i == 0 else "a", header=i == 0)
+        if monitor is not None:
+            monitor.update(chunk)
+        n_total += len(scores)
+        n_churn += int(scores["will_churn"].sum())
+        for label, count in scores["risk_level"].value_counts().items():
+            risk_counts[label] += int(count)
+    print(f"Resultados guardados en: {out}")
+
+    print("\nResumen:")
+    print(f"- Total clientes: {n_total}")
+    print(f"- Churn predicho: {n_churn} ({n_churn / max(n_total, 1) * 100:.1f}%)")
+    for label in RISK_LABELS[::-1]:
+        print(f"- Riesgo {label}: {risk_counts[label]}")
+
+    if sink is not None:
+        stats = sink.close()
+        print(f"- Write-back: {stats['rows_written']} filas en {stats['path']}:{stats['table']} "
+              f"({stats['transactions']} transacciones, {stats['write_seconds']:.2f}s escribiendo, "
+              f"{stats['producer_blocked_seconds']:.2f}s de scoring bloqueado por la cola)")
+
+    if monitor is not None:
+        report_path = drift_cfg.get("report_path", "reports/drift_report.json")
+        rep = monitor.save_report(report_path)
+        drifted = rep["drifted_features"]
+        print(f"- Drift: {', '.join(drifted) if drifted else 'sin drift significativo'} (reporte: {report_path})")
+
+    if cache is not None:
+        stats = {**cache.stats(), "evicted": cache.evict()}
+        cache.close()
+        report_path = Path(cache_cfg.get("report_path", "reports/scoring_cache_report.json"))
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        saved = stats["estimated_seconds_saved"]
+        print(f"- Cache: {stats['hits']} hits / {stats['misses']} misses (hit rate {stats['hit_rate']:.1%}, "
+              f"ahorro estimado {'N/A' if saved is None else f'{saved:.2f}s'}, reporte: {report_path})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scoring batch de clientes TelcoVision")
+    ap.add_argument("--input", required=True, help="CSV crudo de clientes")
+    ap.add_argument("--output", required=True, help="CSV de salida con predicciones")
+    ap.add_argument("--params", default="params.yaml", help="Ruta al params.yaml")
+    ap.add_argument("--model", help="Artefacto de modelo (override de params.paths.model_path)")
+    ap.add_argument("--chunksize", type=int, default=100_000, help="Filas por chunk de scoring")
+    ap.add_argument("--monitor-drift", action="store_true", help="Calcula el reporte de drift del lote")
+    ap.add_argument("--explain", type=int, default=0, metavar="K", help="Agrega las top-K razones por cliente")
+    ap.add_argument("--cache", action="store_true", help="Reusa probabilidades de clientes sin cambios (scoring_cache)")
+    ap.add_argument("--write-db", nargs="?", const="", metavar="SQLITE",
+                    help="Upsert de los scores en SQLite (default: score_sink.path)")
+    args = ap.parse_args()
+    write_db = args.write_db
+    if write_db == "":
+        write_db = (_load_params(args.params).get("score_sink", {}) or {}).get("path", "predictions/churn_scores.sqlite")
+    batch_predict(args.input, args.output, args.params, args.chunksize, args.monitor_drift, args.explain,
+                  args.model, args.cache, write_db)
@@ -0,0 +1,111 @@
+"""
+resources.py
+
+Gobernador de CPU de TelcoVision: reparte un presupuesto de cores entre procesos y threads.
+- Presupuesto: `TELCO_CPU_BUDGET` (entorno) > `resources.cpu_budget` de params.yaml > cores disponibles
+  para el proceso (afinidad de CPU, no el total de la máquina)
+- `plan_parallelism(n_tareas, n_jobs)`: cuántos procesos y cuántos threads por proceso, con
+  procesos x threads <= presupuesto
+- `governed_parallel(plan)`: joblib/loky con ese número de procesos y BLAS/OpenMP limitados en
+  cada worker (`inner_max_num_threads`)
+- `thread_env(threads)`: variables de entorno para subprocesos (`run_experiments.py`): el hijo
+  hereda su parte del presupuesto y las limita a su vez
+- `set_estimator_threads(model, n)`: fija `n_jobs` en los estimadores de un artefacto cargado
+  (Pipeline, stacking, router, ...) para scoring y serving
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import yaml
+from joblib import Parallel, parallel_backend
+
+BUDGET_ENV = "TELCO_CPU_BUDGET"
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+class ResourcePlan(NamedTuple):
+    processes: int
+    threads: int
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        return os.cpu_count() or 1
+
+
+def load_resource_config(params_path: str = "params.yaml") -> Dict[str, Any]:
+    path = Path(params_path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return (yaml.safe_load(f) or {}).get("resources", {}) or {}
+
+
+def cpu_budget(params_path: str = "params.yaml") -> int:
+    """Cores que este proceso (y sus hijos) pueden usar en total."""
+    if os.environ.get(BUDGET_ENV):
+        return max(1, int(os.environ[BUDGET_ENV]))
+    configured = load_resource_config(params_path).get("cpu_budget")
+    cores = available_cores()
+    return max(1, min(int(configured), cores)) if configured else cores
+
+
+def plan_parallelism(n_tasks: int, n_jobs: Optional[int] = -1, budget: Optional[int] = None) -> ResourcePlan:
+    """
+    Procesos y threads por proceso para `n_tasks` tareas independientes.
+
+    `n_jobs` (-1/None = sin tope) limita los procesos; los cores que sobran van a threads por
+    proceso, así un fold pesado no queda en un solo core cuando hay pocas tareas.
+    """
+    budget = budget or cpu_budget()
+    cap = budget if n_jobs in (-1, None) else max(1, min(int(n_jobs), budget))
+    processes = max(1, min(n_tasks, cap))
+    return ResourcePlan(processes, max(1, budget // processes))
+
+
+@contextmanager
+def governed_parallel(plan: ResourcePlan):
+    """`Parallel` de joblib (loky) con `plan.processes` workers y BLAS/OpenMP a `plan.threads` en cada uno."""
+    with parallel_backend("loky", inner_max_num_threads=plan.threads):
+        with Parallel(n_jobs=plan.processes) as parallel:
+            yield parallel
+
+
+def thread_env(threads: int, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Copia del entorno con presupuesto y límites de BLAS/OpenMP para un subproceso."""
+    env = dict(os.environ if env is None else env)
+    env[BUDGET_ENV] = str(threads)
+    for var in _THREAD_ENV_VARS:
+        env[var] = str(threads)
+    return env
+
+
+def set_estimator_threads(model: Any, n_jobs: int) -> Any:
+    """Fija `n_jobs` en todos los estimadores de un artefacto (recorre Pipelines y modelos compuestos)."""
+    seen = set()
+
+    def visit(obj):
+        if obj is None or id(obj) in seen:
+            return
+        seen.add(id(obj))
+        if hasattr(obj, "steps"):
+            for _, step in obj.steps:
+                visit(step)
+            return
+        if hasattr(obj, "get_params") and "n_jobs" in obj.get_params(deep=False):
+            obj.set_params(n_jobs=n_jobs)
+        for attr in ("base_models", "segment_models", "fallback", "student", "meta_model"):
+            child = getattr(obj, attr, None)
+            for item in (child.values() if isinstance(child, dict) else child if isinstance(child, list) else [child]):
+                visit(item)
+
+    visit(model)
+    if hasattr(model, "n_jobs") and not hasattr(model, "get_params"):
+        model.n_jobs = n_jobs  # StackedChurnModel: threads para los modelos base
+    return model
@@ -0,0 +1,99 @@
+"""
+robustness.py
+
+Corridas multi-semilla para TelcoVision (`train.py --seeds N`).
+- Repite split estratificado + entrenamiento con semillas distintas en un pool de procesos (joblib),
+  dimensionado por el gobernador de CPU (`resources.py`)
+- El dataset se carga una sola vez y se comparte con los workers como memmap de sólo lectura
+- Corre por rondas del tamaño del pool y se detiene antes de N semillas cuando el intervalo de
+  confianza de todas las métricas queda por debajo de `ci_tol` (semiancho)
+- Devuelve métricas por semilla y, por métrica: media, desvío e IC (t de Student)
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from joblib import delayed
+from scipy import stats
+from sklearn.model_selection import train_test_split
+
+from resources import governed_parallel, plan_parallelism
+
+METRICS = ["accuracy", "precision", "recall", "f1", "roc_auc"]
+
+
+def _fit_seed(X: np.ndarray, y: np.ndarray, columns: List[str], model_cfg: Dict[str, Any],
+              test_size: float, seed: int, threads: int = 1) -> Dict[str, Any]:
+    """Un split + fit + evaluación con `seed` (el estimador usa `threads` cores: el resto del presupuesto es de otras semillas)."""
+    from train import build_pipeline_from_params, evaluate
+
+    idx_train, idx_test = train_test_split(np.arange(len(y)), test_size=test_size, random_state=seed, stratify=y)
+    model = build_pipeline_from_params(model_cfg, seed)
+    if "n_jobs" in model[-1].get_params():
+        model[-1].set_params(n_jobs=threads)
+    model.fit(pd.DataFrame(X[idx_train], columns=columns), y[idx_train])
+    metrics = evaluate(model, pd.DataFrame(X[idx_test], columns=columns), y[idx_test])
+    return {"seed": seed, **metrics}
+
+
+def confidence_interval(values: np.ndarray, confidence: float = 0.95) -> Dict[str, float]:
+    """Media, desvío y IC de la media con t de Student (n - 1 grados de libertad)."""
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if n > 1 else 0.0
+    half = float(stats.t.ppf(0.5 + confidence / 2, n - 1) * std / np.sqrt(n)) if n > 1 else float("inf")
+    return {"mean": mean, "std": std, "ci_low": mean - half, "ci_high": mean + half, "ci_half_width": half, "n": n}
+
+
+def run_seeds(X: pd.DataFrame, y: pd.Series, model_cfg: Dict[str, Any], test_size: float,
+              n_seeds: int, base_seed: int = 42, n_jobs: int = -1, ci_tol: float = 0.005,
+              confidence: float = 0.95, min_seeds: int = 5) -> Dict[str, Any]:
+    """
+    Corre hasta `n_seeds` semillas (base_seed, base_seed + 1, ...) en rondas del tamaño del pool.
+
+    Se detiene en cuanto hay al menos `min_seeds` y el semiancho del IC de cada métrica es <= ci_tol.
+    """
+    tmp = Path(tempfile.mkdtemp(prefix="telco_seeds_"))
+    try:
+        # Una sola copia en disco, mapeada de sólo lectura por todos los workers
+        np.save(tmp / "X.npy", X.to_numpy(dtype=np.float64))
+        np.save(tmp / "y.npy", y.to_numpy())
+        X_mm = np.load(tmp / "X.npy", mmap_mode="r")
+        y_mm = np.load(tmp / "y.npy", mmap_mode="r")
+        columns = list(X.columns)
+
+        plan = plan_parallelism(n_seeds, n_jobs)
+        batch = plan.processes
+        runs: List[Dict[str, Any]] = []
+        summary: Dict[str, Dict[str, float]] = {}
+        stopped_early = False
+        with governed_parallel(plan) as parallel:
+            while len(runs) < n_seeds:
+                seeds = range(base_seed + len(runs), base_seed + min(len(runs) + batch, n_seeds))
+                runs += parallel(delayed(_fit_seed)(X_mm, y_mm, columns, model_cfg, test_size, s, plan.threads)
+                                 for s in seeds)
+                summary = {
+                    m: confidence_interval([r[m] for r in runs if r[m] is not None], confidence) for m in METRICS
+                }
+                widest = max(s["ci_half_width"] for s in summary.values())
+                print(f"[INFO] {len(runs)} semillas | semiancho máximo del IC: {widest:.4f}")
+                if len(runs) >= min_seeds and widest <= ci_tol and len(runs) < n_seeds:
+                    stopped_early = True
+                    break
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {
+        "n_seeds_requested": n_seeds,
+        "n_seeds_run": len(runs),
+        "stopped_early": stopped_early,
+        "confidence": confidence,
+        "ci_tolerance": ci_tol,
+        "summary": summary,
+        "runs": runs,
+    }
@@ -0,0 +1,159 @@
+"""
+sampling.py
+
+Submuestreo de train para TelcoVision (sección `sampling`, lo aplica `train.py` antes del fit).
+- `majority`: conserva todos los churners y una fracción `ratio` de los no-churners; cada no-churner
+  conservado pesa 1 / ratio (`sample_weight`), así las probabilidades del modelo quedan en la tasa
+  base original y el calibrador/umbral siguen siendo válidos
+- `stratified`: fracción `ratio` de cada clase (no cambia la tasa base, no necesita pesos)
+- `correct_proba` corrige analíticamente las probabilidades de un modelo entrenado sin pesos
+  sobre datos submuestreados (la usa el reporte para comparar)
+- CLI: barre ratios y reporta tiempo de fit, ROC-AUC y Brier por ratio para elegir el más barato
+
+Uso:
+python src/sampling.py --ratios 1.0 0.5 0.25 0.1
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+from sklearn.metrics import brier_score_loss, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+STRATEGIES = ("none", "majority", "stratified")
+
+
+def sample_training_set(X: pd.DataFrame, y: pd.Series, strategy: str = "none", ratio: float = 1.0,
+                        random_state: int = 42) -> Tuple[pd.DataFrame, pd.Series, Optional[np.ndarray]]:
+    """Devuelve (X, y, sample_weight) submuestreados; `sample_weight` es None si no hace falta."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"sampling.strategy debe ser uno de {STRATEGIES}")
+    if strategy == "none" or ratio >= 1.0:
+        return X, y, None
+    if not 0.0 < ratio < 1.0:
+        raise ValueError("sampling.ratio debe estar en (0, 1]")
+
+    rng = np.random.default_rng(random_state)
+    labels = y.to_numpy()
+    if strategy == "majority":
+        majority = pd.Series(labels).value_counts().idxmax()
+        is_major = labels == majority
+        keep = ~is_major | (rng.random(len(labels)) < ratio)
+        weight = np.where(is_major[keep], 1.0 / ratio, 1.0)
+        return X[keep], y[keep], weight
+    keep_idx, _ = train_test_split(np.arange(len(labels)), train_size=ratio, stratify=labels,
+                                   random_state=random_state)
+    keep_idx = np.sort(keep_idx)
+    return X.iloc[keep_idx], y.iloc[keep_idx], None
+
+
+def correct_proba(proba: np.ndarray, ratio: float) -> np.ndarray:
+    """Corrige p(churn) de un modelo entrenado sin pesos con no-churners submuestreados a `ratio`."""
+    proba = np.asarray(proba, dtype=np.float64)
+    return ratio * proba / (ratio * proba + 1.0 - proba)
+
+
+def sampling_sweep(X_train: pd.DataFrame, y_train: pd.Series, X_test: pd.DataFrame, y_test: pd.Series,
+                   model_cfg: Dict[str, Any], ratios: List[float], strategy: str = "majority",
+                   random_state: int = 42) -> List[Dict[str, Any]]:
+    """Tiempo de fit y métricas de test por ratio (con pesos y, como referencia, sin pesos + corrección)."""
+    from train import build_pipeline_from_params
+
+    rows = []
+    for ratio in sorted(ratios, reverse=True):
+        X_s, y_s, weight = sample_training_set(X_train, y_train, strategy, ratio, random_state)
+        model = build_pipeline_from_params(model_cfg, random_state)
+        t0 = time.perf_counter()
+        model.fit(X_s, y_s, **({"model__sample_weight": weight} if weight is not None else {}))
+        fit_seconds = time.perf_counter() - t0
+        proba = model.predict_proba(X_test)[:, 1]
+        row = {
+            "ratio": ratio,
+            "n_fit_rows": int(len(y_s)),
+            "fit_seconds": round(fit_seconds, 3),
+            "roc_auc": float(roc_auc_score(y_test, proba)),
+            "brier": float(brier_score_loss(y_test, proba)),
+            "mean_proba": float(proba.mean()),
+        }
+        if strategy == "majority" and ratio < 1.0:
+            unweighted = build_pipeline_from_params(model_cfg, random_state).fit(X_s, y_s)
+            raw = unweighted.predict_proba(X_test)[:, 1]
+            row["brier_unweighted"] = float(brier_score_loss(y_test, raw))
+            row["brier_unweighted_corrected"] = float(brier_score_loss(y_test, correct_proba(raw, ratio)))
+        rows.append(row)
+        print(f"[INFO] ratio={ratio:<5} filas={row['n_fit_rows']:>8,} fit={row['fit_seconds']:.2f}s "
+              f"roc_auc={row['roc_auc']:.4f} brier={row['brier']:.4f}")
+    return rows
+
+
+def cheapest_ratio(rows: List[Dict[str, Any]], max_auc_drop: float) -> float:
+    """Menor ratio cuyo ROC-AUC queda dentro de `max_auc_drop` del ratio más alto barrido."""
+    best = max(rows, key=lambda r: r["ratio"])["roc_auc"]
+    return min(r["ratio"] for r in rows if r["roc_auc"] >= best - max_auc_drop)
+
+
+def plot_sweep(rows: List[Dict[str, Any]], out_path: Path):
+    import matplotlib.pyplot as plt
+
+    ratios = [r["ratio"] for r in rows]
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+    ax1.plot(ratios, [r["roc_auc"] for r in rows], marker="o", color="steelblue", label="ROC-AUC")
+    ax1.set_xlabel("Ratio de la clase mayoritaria conservada")
+    ax1.set_ylabel("ROC-AUC (test)", color="steelblue")
+    ax2 = ax1.twinx()
+    ax2.plot(ratios, [r["fit_seconds"] for r in rows], marker="s", color="darkorange", label="Tiempo de fit")
+    ax2.set_ylabel("Tiempo de fit (s)", color="darkorange")
+    plt.title("Submuestreo: tiempo de fit vs ROC-AUC", fontsize=14, fontweight="bold")
+    ax1.grid(True, alpha=0.3)
+    fig.tight_layout()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.savefig(out_path, dpi=200, bbox_inches="tight")
+    plt.close()
+    print(f"[OK] Gráfico de submuestreo guardado: {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de ratios de submuestreo: tiempo de fit vs ROC-AUC")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml")
+    parser.add_argument("--ratios", type=float, nargs="+", help="Ratios a barrer (override de sampling.sweep_ratios)")
+    parser.add_argument("--strategy", choices=STRATEGIES[1:], help="Override de sampling.strategy")
+    args = parser.parse_args()
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        params = yaml.safe_load(f) or {}
+    cfg = params.get("sampling", {}) or {}
+    strategy = args.strategy or (cfg.get("strategy") if cfg.get("strategy") not in (None, "none") else "majority")
+    ratios = args.ratios or list(cfg.get("sweep_ratios", [1.0, 0.5, 0.25, 0.1]))
+    target = params.get("target", "churn")
+    random_state = int(params.get("random_state", 42))
+
+    df = pd.read_csv(params["paths"]["processed_data"])
+    X, y = df.drop(columns=[target]), df[target]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=float(params.get("test_size", 0.2)), random_state=random_state, stratify=y
+    )
+    rows = sampling_sweep(X_train, y_train, X_test, y_test, params.get("model", {}) or {}, ratios,
+                          strategy, random_state)
+    report = {
+        "strategy": strategy,
+        "max_auc_drop": float(cfg.get("max_auc_drop", 0.002)),
+        "recommended_ratio": cheapest_ratio(rows, float(cfg.get("max_auc_drop", 0.002))),
+        "sweep": rows,
+    }
+    out_path = Path(cfg.get("report_path", "metrics/sampling_report.json"))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[SAVE] Reporte de submuestreo guardado: {out_path}")
+    print(f"[INFO] Ratio recomendado (caída de ROC-AUC <= {report['max_auc_drop']}): {report['recommended_ratio']}")
+    plot_sweep(rows, Path(cfg.get("plot_path", "plots/sampling_sweep.png")))
+
+
+if __name__ == "__main__":
+    main()
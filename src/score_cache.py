@@ -0,0 +1,174 @@
+"""
+score_cache.py
+
+Cache persistente de probabilidades para el scoring batch de TelcoVision.
+- Clave: hash de 128 bits del vector de features ya preprocesado, como float64 (dos
+  `hash_pandas_object` vectorizados con semillas distintas) + version del modelo (sha256 del artefacto)
+- Se guarda la probabilidad cruda de `predict_proba`; calibracion y umbral se aplican despues,
+  asi cambiar la politica de decision no invalida el cache
+- Almacen: SQLite (tabla WITHOUT ROWID, busqueda por lote con una tabla temporal + join)
+- Eviccion por tamano: si el archivo supera `max_mb` se borran las entradas usadas hace mas tiempo
+  (`last_used` es un contador de lotes, no un timestamp: no depende del reloj)
+- Solo los misses llegan al modelo; `stats()` reporta hit rate y tiempo ahorrado estimado
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+_HASH_KEYS = ("telcovision-k1-0", "telcovision-k2-0")
+
+
+def model_version(model_path: str, chunk_size: int = 1 << 20) -> str:
+    """Huella del artefacto de modelo (sha256 del archivo, leido por bloques)."""
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def row_keys(X: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dos hashes de 64 bits por fila (como int64 para SQLite); el indice no participa.
+
+    El hash de pandas depende del dtype: se hashea todo como float64, porque la imputacion
+    convierte `age`/`tenure_months` a float en los chunks con algun nulo y el mismo cliente
+    daria otra clave (miss) segun el resto del chunk.
+    """
+    X = X.astype(np.float64)
+    return tuple(
+        pd.util.hash_pandas_object(X, index=False, hash_key=key).to_numpy().view(np.int64)
+        for key in _HASH_KEYS
+    )
+
+
+class ScoreCache:
+    """Cache clave-valor en SQLite de probabilidades de churn para una version de modelo."""
+
+    def __init__(self, path: str, version: str, max_mb: float = 512.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.version = version
+        self.max_mb = max_mb
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " model TEXT NOT NULL, h1 INTEGER NOT NULL, h2 INTEGER NOT NULL,"
+            " proba REAL NOT NULL, last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (model, h1, h2)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores(last_used)")
+        # Costo por fila del modelo medido en runs anteriores (estima el ahorro aun con 100% de hits)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS model_cost (model TEXT PRIMARY KEY, seconds_per_row REAL)")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_keys (pos INTEGER PRIMARY KEY, h1 INTEGER, h2 INTEGER)")
+        self.generation = self.conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM scores").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.model_seconds = 0.0
+
+    def lookup(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Probabilidades cacheadas por posicion (NaN = miss); marca los hits como usados ahora."""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM batch_keys")
+        cur.executemany("INSERT INTO batch_keys VALUES (?, ?, ?)",
+                        zip(range(len(h1)), h1.tolist(), h2.tolist()))
+        rows = cur.execute(
+            "SELECT b.pos, s.proba FROM batch_keys b JOIN scores s"
+            " ON s.model = ? AND s.h1 = b.h1 AND s.h2 = b.h2", (self.version,)
+        ).fetchall()
+        cur.execute(
+            "UPDATE scores SET last_used = ? WHERE model = ? AND (h1, h2) IN (SELECT h1, h2 FROM batch_keys)",
+            (self.generation, self.version),
+        )
+        proba = np.full(len(h1), np.nan)
+        if rows:
+            pos, vals = np.array(rows).T
+            proba[pos.astype(np.int64)] = vals
+        return proba
+
+    def store(self, h1: np.ndarray, h2: np.ndarray, proba: np.ndarray):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+            ((self.version, a, b, p, self.generation) for a, b, p in zip(h1.tolist(), h2.tolist(), proba.tolist())),
+        )
+
+    def predict_proba(self, model, X: pd.DataFrame) -> np.ndarray:
+        """Probabilidad de churn cruda: hits desde el cache, misses (sin duplicados) al modelo."""
+        t0 = time.perf_counter()
+        self.generation += 1
+        h1, h2 = row_keys(X)
+        proba = self.lookup(h1, h2)
+        miss = np.flatnonzero(np.isnan(proba))
+        self.lookup_seconds += time.perf_counter() - t0
+        self.hits += len(proba) - len(miss)
+        self.misses += len(miss)
+
+        if len(miss):
+            # Filas repetidas dentro del mismo lote se puntúan una sola vez
+            keys = pd.MultiIndex.from_arrays([h1[miss], h2[miss]])
+            first = ~keys.duplicated()
+            t0 = time.perf_counter()
+            fresh = model.predict_proba(X.iloc[miss[first]])[:, 1]
+            self.model_seconds += time.perf_counter() - t0
+            proba[miss] = pd.Series(fresh, index=keys[first]).reindex(keys).to_numpy()
+            t0 = time.perf_counter()
+            self.store(h1[miss[first]], h2[miss[first]], fresh)
+            self.lookup_seconds += time.perf_counter() - t0
+        self.conn.commit()
+        return proba
+
+    def evict(self) -> int:
+        """Si el archivo supera `max_mb`, borra las entradas menos usadas recientemente."""
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        size_mb = self.conn.execute("PRAGMA page_count").fetchone()[0] * page_size / 1024 ** 2
+        if size_mb <= self.max_mb:
+            return 0
+        n = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        keep = int(n * self.max_mb / size_mb * 0.9)
+        cutoff = self.conn.execute(
+            "SELECT last_used FROM scores ORDER BY last_used DESC LIMIT 1 OFFSET ?", (keep,)
+        ).fetchone()
+        if cutoff is None:
+            return 0
+        # Nunca se borra el lote en curso
+        limit = min(cutoff[0], self.generation - 1)
+        deleted = self.conn.execute("DELETE FROM scores WHERE last_used <= ?", (limit,)).rowcount
+        self.conn.commit()
+        self.conn.execute("PRAGMA incremental_vacuum")
+        return deleted
+
+    def _seconds_per_row(self):
+        if self.misses:
+            per_row = self.model_seconds / self.misses
+            self.conn.execute("INSERT OR REPLACE INTO model_cost VALUES (?, ?)", (self.version, per_row))
+            self.conn.commit()
+            return per_row
+        row = self.conn.execute("SELECT seconds_per_row FROM model_cost WHERE model = ?", (self.version,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        per_row = self._seconds_per_row()
+        return {
+            "model_version": self.version,
+            "rows": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "model_seconds": self.model_seconds,
+            "cache_seconds": self.lookup_seconds,
+            "estimated_seconds_saved": (self.hits * per_row - self.lookup_seconds) if per_row else None,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,155 @@
+"""
+score_sink.py
+
+Write-back de scores de churn a una tabla SQLite para las herramientas de campaña (`predict.py --write-db`).
+- Tabla clave por `customer_id` con probabilidad, decisión, nivel de riesgo, versión del modelo
+  (sha256 del artefacto, igual que `score_cache.py`) y timestamp UTC del run
+- Upsert (`INSERT ... ON CONFLICT(customer_id) DO UPDATE`): re-scorear un cliente reemplaza su fila
+- Escritura por lotes: `executemany` de `batch_rows` filas por transacción, WAL + `synchronous=NORMAL`
+- Un thread escritor consume una cola acotada: el scoring del chunk siguiente corre mientras se
+  escribe el anterior; si la base no da abasto, `put` bloquea (backpressure) en lugar de acumular
+  memoria. Un error del escritor se re-lanza en el siguiente `put` / en `close`
+
+Uso:
+python src/predict.py --input data/raw/telco_churn.csv --output predictions/scores.csv --write-db
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+ID_COLUMN = "customer_id"
+_SENTINEL = None
+
+
+class ScoreSink:
+    """Escritor asíncrono de scores con upsert por `customer_id` en transacciones grandes."""
+
+    def __init__(self, path: str, model_version: str, table: str = "churn_scores", batch_rows: int = 50_000,
+                 queue_size: int = 4, scored_at: Optional[str] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.model_version = model_version
+        self.scored_at = scored_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.batch_rows = int(batch_rows)
+        self.queue: "queue.Queue[Optional[pd.DataFrame]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.rows_written = 0
+        self.transactions = 0
+        self.write_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="score-sink", daemon=True)
+        self._thread.start()
+
+    # ---------- Productor (thread de scoring) ----------
+
+    def put(self, ids: pd.Series, scores: pd.DataFrame):
+        """Encola un chunk de scores (bloquea si la cola está llena)."""
+        self._raise_if_failed()
+        frame = pd.DataFrame({
+            ID_COLUMN: ids.astype(str).str.strip().to_numpy(),
+            "churn_probability": scores["churn_probability"].to_numpy(dtype=float),
+            "will_churn": scores["will_churn"].to_numpy(dtype=int),
+            "risk_level": scores["risk_level"].astype(str).to_numpy(),
+        })
+        t0 = time.perf_counter()
+        while True:
+            try:
+                self.queue.put(frame, timeout=1.0)
+                break
+            except queue.Full:
+                self._raise_if_failed()
+        self.blocked_seconds += time.perf_counter() - t0
+
+    def close(self) -> Dict[str, Any]:
+        """Vacía la cola, espera al escritor y devuelve las estadísticas del write-back."""
+        if not self._closed:
+            self._closed = True
+            while self._thread.is_alive():
+                try:
+                    self.queue.put(_SENTINEL, timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+            self._thread.join()
+        self._raise_if_failed()
+        return {
+            "path": str(self.path),
+            "table": self.table,
+            "model_version": self.model_version,
+            "scored_at": self.scored_at,
+            "rows_written": self.rows_written,
+            "transactions": self.transactions,
+            "write_seconds": round(self.write_seconds, 3),
+            "producer_blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f"Fallo el write-back de scores en {self.path}") from self._error
+
+    # ---------- Consumidor (thread escritor) ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.table}" ('
+            f" {ID_COLUMN} TEXT PRIMARY KEY, churn_probability REAL NOT NULL, will_churn INTEGER NOT NULL,"
+            " risk_level TEXT NOT NULL, model_version TEXT NOT NULL, scored_at TEXT NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _write(self, conn: sqlite3.Connection, frames):
+        batch = pd.concat(frames, ignore_index=True)
+        # Un customer_id repetido en el lote: gana la última fila (misma semántica que el upsert)
+        batch = batch.drop_duplicates(ID_COLUMN, keep="last")
+        rows = zip(batch[ID_COLUMN].tolist(), batch["churn_probability"].tolist(), batch["will_churn"].tolist(),
+                   batch["risk_level"].tolist())
+        t0 = time.perf_counter()
+        with conn:
+            conn.executemany(
+                f'INSERT INTO "{self.table}" VALUES (?, ?, ?, ?, ?, ?) '
+                f"ON CONFLICT({ID_COLUMN}) DO UPDATE SET churn_probability = excluded.churn_probability, "
+                "will_churn = excluded.will_churn, risk_level = excluded.risk_level, "
+                "model_version = excluded.model_version, scored_at = excluded.scored_at",
+                ((cid, p, w, r, self.model_version, self.scored_at) for cid, p, w, r in rows),
+            )
+        self.write_seconds += time.perf_counter() - t0
+        self.rows_written += len(batch)
+        self.transactions += 1
+
+    def _run(self):
+        conn = None
+        try:
+            conn = self._connect()
+            pending, n_pending = [], 0
+            while True:
+                frame = self.queue.get()
+                if frame is _SENTINEL:
+                    break
+                pending.append(frame)
+                n_pending += len(frame)
+                if n_pending >= self.batch_rows:
+                    self._write(conn, pending)
+                    pending, n_pending = [], 0
+            if pending:
+                self._write(conn, pending)
+        except BaseException as exc:  # se re-lanza en el thread de scoring
+            self._error = exc
+            # Drenar la cola para no dejar bloqueado al productor
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        finally:
+            if conn is not None:
+                conn.close()
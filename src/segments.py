@@ -0,0 +1,103 @@
+"""
+segments.py
+
+Entrenamiento de un modelo por segmento para TelcoVision (`train.py` con `segmentation.column`).
+- Segmenta por una columna categórica del raw (p.ej. `contract_type`) usando sus dummies procesadas
+- Entrena un Pipeline por segmento en paralelo en procesos (joblib) dentro del presupuesto de CPU
+- Los segmentos con menos de `min_rows` filas de train (o una sola clase) usan el modelo global
+- Se ajusta sobre las mismas filas y pesos que el global (submuestreo de `sampling`), así la
+  comparación en test es justa
+- La categoría de referencia (sin dummy por `drop_first`) se nombra con su valor real del raw
+- Devuelve un `SegmentRouter` y la comparación global vs ruteado en test, total y por segmento
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import delayed
+from sklearn.metrics import roc_auc_score
+
+from ensemble import SegmentRouter, segment_dummy_columns, segment_labels
+from resources import governed_parallel, plan_parallelism
+
+
+def _fit_segment(X: pd.DataFrame, y: pd.Series, model_cfg: Dict[str, Any], random_state: int, threads: int = 1,
+                 sample_weight: Optional[np.ndarray] = None):
+    from train import build_pipeline_from_params
+
+    model = build_pipeline_from_params(model_cfg, random_state)
+    if "n_jobs" in model[-1].get_params():
+        model[-1].set_params(n_jobs=threads)
+    fit_params = {"model__sample_weight": sample_weight} if sample_weight is not None else {}
+    return model.fit(X, y, **fit_params)
+
+
+def reference_category(raw_values: pd.Series, column: str, dummy_columns: List[str]) -> Optional[str]:
+    """Valor de `column` que quedó sin dummy en el procesado, con la misma limpieza que `data_prep`."""
+    from data_prep import process_telco
+
+    all_dummies = process_telco(raw_values.to_frame(column), require_target=False, drop_first=False).columns
+    missing = [c[len(column) + 1:] for c in all_dummies if c not in dummy_columns and c != f"{column}_nan"]
+    return missing[0] if len(missing) == 1 else None
+
+
+def _auc(y: np.ndarray, proba: np.ndarray):
+    return float(roc_auc_score(y, proba)) if len(np.unique(y)) == 2 else None
+
+
+def fit_segment_router(global_model, X_train: pd.DataFrame, y_train: pd.Series, X_test: pd.DataFrame,
+                       y_test: pd.Series, model_cfg: Dict[str, Any], column: str, min_rows: int = 500,
+                       n_jobs: int = -1, random_state: int = 42, sample_weight: Optional[np.ndarray] = None,
+                       raw_values: Optional[pd.Series] = None) -> Tuple[SegmentRouter, Dict[str, Any]]:
+    """
+    Entrena los modelos por segmento y arma el router con `global_model` como respaldo.
+
+    `X_train`/`y_train`/`sample_weight` deben ser las filas de fit del global (ya submuestreadas);
+    `raw_values` (la columna cruda) da el nombre de la categoría de referencia.
+    """
+    dummies = segment_dummy_columns(X_train.columns, column)
+    if not dummies:
+        raise ValueError(f"No hay dummies de '{column}' en el dataset procesado (¿columna podada?)")
+    base_label = reference_category(raw_values, column, dummies) if raw_values is not None else None
+    base_label = base_label or SegmentRouter.BASE_LABEL
+    train_labels = segment_labels(X_train, column, dummies, base_label)
+    counts = pd.Series(train_labels).value_counts()
+    minority = pd.Series(y_train.to_numpy()).groupby(train_labels).agg(lambda s: min(s.sum(), len(s) - s.sum()))
+    trainable = [s for s in counts.index if counts[s] >= min_rows and minority[s] > 0]
+
+    plan = plan_parallelism(max(1, len(trainable)), n_jobs)
+    with governed_parallel(plan) as parallel:
+        fitted = parallel(
+            delayed(_fit_segment)(X_train[train_labels == s], y_train[train_labels == s], model_cfg,
+                                  random_state, plan.threads,
+                                  sample_weight[train_labels == s] if sample_weight is not None else None)
+            for s in trainable
+        )
+    router = SegmentRouter(column, dict(zip(trainable, fitted)), global_model, X_train.columns, base_label)
+
+    # Comparación en test: global vs ruteado, total y por segmento
+    y = y_test.to_numpy()
+    p_global = global_model.predict_proba(X_test)[:, 1]
+    p_routed = router.predict_proba(X_test)[:, 1]
+    test_labels = router.segment_labels(X_test)
+    per_segment = {}
+    for s in sorted(set(counts.index) | set(test_labels)):
+        mask = test_labels == s
+        per_segment[str(s)] = {
+            "n_train": int(counts.get(s, 0)),
+            "n_test": int(mask.sum()),
+            "model": "segment" if s in router.segment_models else "fallback",
+            "roc_auc_global": _auc(y[mask], p_global[mask]) if mask.any() else None,
+            "roc_auc_routed": _auc(y[mask], p_routed[mask]) if mask.any() else None,
+        }
+    report = {
+        "column": column,
+        "min_rows": min_rows,
+        "reference_category": base_label,
+        "n_fit_rows": int(len(y_train)),
+        "roc_auc_global": _auc(y, p_global),
+        "roc_auc_routed": _auc(y, p_routed),
+        "segments": per_segment,
+    }
+    return router, report
@@ -0,0 +1,510 @@
+"""
+serving.py
+
+Servicio de scoring de TelcoVision con recarga en caliente y varias versiones de modelo.
+- Fuente de modelos: registro local (`models/registry/<version>/` + puntero `CURRENT`) o
+  MLflow Model Registry (última versión en un stage, p.ej. `Production`, a la que promueve
+  `scripts/register_best_model.py`)
+- Cada versión trae sus sidecars (umbral, calibrador, medianas de imputación) ajustados para ese
+  artefacto; si faltan o son de otro modelo la versión no se carga (no hay defaults silenciosos)
+- Un hilo vigila la fuente; la versión nueva se carga y se calienta en segundo plano y recién
+  entonces se activa con un único reemplazo de referencia (sin downtime, sin modelo frío)
+- Cada request toma una sola vez la foto del ruteo vigente: los requests en curso terminan
+  con el modelo con el que empezaron aunque haya un swap en el medio
+- La versión anterior queda cargada para `rollback()` inmediato
+- Ruteo A/B por pesos (asignación estable por `customer_id`, registro a registro aunque lleguen
+  en el mismo request) y modo sombra: las versiones sombra puntúan el mismo request en segundo
+  plano y sólo se registran las diferencias
+
+Uso:
+# Publicar el modelo entrenado como nueva versión del registro local (y promoverla)
+python src/serving.py publish --model models/model.joblib
+
+# Levantar el servicio HTTP (POST /predict, GET /status, POST /rollback, GET /health)
+python src/serving.py serve --port 8000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+
+from predict import load_calibrator, load_decision_threshold, load_fill_values, prepare_features, score_frame
+from resources import load_resource_config, set_estimator_threads
+from score_cache import model_version
+
+SIDECAR_FILES = ["decision_policy.json", "calibrator.json", "imputation.json"]
+
+
+# ---------- Fuentes de modelos ----------
+
+class LocalRegistry:
+    """Registro en disco: `<root>/<version>/model.joblib` (+ sidecars) y `<root>/CURRENT` con la versión activa."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def versions(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted((p.name for p in self.root.iterdir() if p.is_dir() and p.name.isdigit()), key=int)
+
+    def current_version(self) -> Optional[str]:
+        pointer = self.root / "CURRENT"
+        if pointer.exists():
+            return pointer.read_text(encoding="utf-8").strip() or None
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def artifact_dir(self, version: str) -> Path:
+        return self.root / str(version)
+
+    def model_version(self, version: str) -> str:
+        """sha256 del artefacto copiado (el mismo que registraron calibrate.py / threshold.py)."""
+        return model_version(str(self.artifact_dir(version) / "model.joblib"))
+
+    def promote(self, version: str):
+        """Actualiza `CURRENT` de forma atómica (escritura a temporal + os.replace)."""
+        tmp = self.root / "CURRENT.tmp"
+        tmp.write_text(str(version), encoding="utf-8")
+        os.replace(tmp, self.root / "CURRENT")
+
+    def publish(self, model_path: str, sidecar_dir: Optional[str] = None, promote: bool = True) -> str:
+        """
+        Copia el modelo (y sus sidecars) como versión nueva.
+
+        Se escribe en un directorio temporal y se renombra al final, así el vigilante nunca
+        ve una versión a medio copiar.
+        """
+        src_dir = Path(sidecar_dir) if sidecar_dir else Path(model_path).parent
+        missing = [name for name in SIDECAR_FILES if not (src_dir / name).exists()]
+        if missing:
+            raise FileNotFoundError(f"Faltan sidecars del modelo en {src_dir}: {', '.join(missing)}")
+        # Umbral y calibrador tienen que ser los de este artefacto (si no, la versión no cargaría)
+        fingerprint = model_version(model_path)
+        load_decision_threshold(str(src_dir / "decision_policy.json"), fingerprint, strict=True)
+        load_calibrator(str(src_dir / "calibrator.json"), fingerprint, strict=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+        versions = self.versions()
+        version = str(int(versions[-1]) + 1 if versions else 1)
+        tmp = self.root / f".tmp-{version}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        shutil.copy2(model_path, tmp / "model.joblib")
+        for name in SIDECAR_FILES:
+            shutil.copy2(src_dir / name, tmp / name)
+        os.rename(tmp, self.artifact_dir(version))
+        if promote:
+            self.promote(version)
+        return version
+
+
+class MlflowRegistry:
+    """Última versión de `model_name` en `stage` del MLflow Model Registry (descargada a `cache_dir`)."""
+
+    def __init__(self, model_name: str, stage: str = "Production", cache_dir: str = "models/registry_cache"):
+        from mlflow.tracking import MlflowClient
+
+        self.client = MlflowClient()
+        self.model_name = model_name
+        self.stage = stage
+        self.cache_dir = Path(cache_dir)
+
+    def current_version(self) -> Optional[str]:
+        latest = self.client.get_latest_versions(self.model_name, stages=[self.stage])
+        return str(latest[0].version) if latest else None
+
+    def model_version(self, version: str) -> Optional[str]:
+        """sha256 del modelo del run de origen (tag `model_version` que escribe train.py)."""
+        run_id = self.client.get_model_version(self.model_name, str(version)).run_id
+        return self.client.get_run(run_id).data.tags.get("model_version")
+
+    def artifact_dir(self, version: str) -> Path:
+        import mlflow
+
+        dst = self.cache_dir / str(version)
+        if not dst.exists():
+            mlflow.artifacts.download_artifacts(f"models:/{self.model_name}/{version}", dst_path=str(dst))
+        return dst
+
+
+# ---------- Versiones cargadas ----------
+
+class LoadedModel:
+    """Modelo de una versión del registro + su umbral, calibrador y medianas de imputación, ya calentado."""
+
+    def __init__(self, version: str, model, threshold: float, calibrator: Optional[Dict[str, Any]],
+                 fill_values: Optional[Dict[str, float]] = None):
+        self.version = version
+        self.model = model
+        self.threshold = threshold
+        self.calibrator = calibrator
+        self.fill_values = fill_values
+        self.feature_names = list(model.feature_names_in_)
+        self.loaded_at = time.time()
+
+    def score(self, df_raw: pd.DataFrame) -> pd.DataFrame:
+        X = prepare_features(df_raw, self.feature_names, self.fill_values)
+        return score_frame(self.model, X, self.threshold, self.calibrator)
+
+    def warm_up(self, df_raw: Optional[pd.DataFrame] = None):
+        """Primeras llamadas (1 fila y lote completo) antes de recibir tráfico real."""
+        if df_raw is None or df_raw.empty:
+            X = pd.DataFrame(np.zeros((100, len(self.feature_names))), columns=self.feature_names)
+            self.model.predict_proba(X.iloc[:1])
+            self.model.predict_proba(X)
+        else:
+            self.score(df_raw.iloc[:1])
+            self.score(df_raw)
+
+
+def load_version(registry, version: str, warmup: Optional[pd.DataFrame] = None) -> LoadedModel:
+    """Carga una versión del registro (joblib o formato MLflow) con sus sidecars y la calienta."""
+    art = Path(registry.artifact_dir(version))
+    missing = [name for name in SIDECAR_FILES if not (art / name).exists()]
+    if missing:
+        raise FileNotFoundError(f"La versión {version} no tiene {', '.join(missing)} "
+                                "(publicar / registrar el modelo con sus sidecars)")
+    fingerprint = registry.model_version(version)
+    if fingerprint is None:
+        raise ValueError(f"La versión {version} no indica para qué modelo se ajustaron sus sidecars")
+    if (art / "model.joblib").exists():
+        model = joblib.load(art / "model.joblib")
+    else:
+        import mlflow.sklearn
+        model = mlflow.sklearn.load_model(str(art))
+    # Los requests ya corren en paralelo (un thread HTTP por request): pocos threads por predict_proba
+    set_estimator_threads(model, int(load_resource_config().get("serving_threads") or 1))
+    loaded = LoadedModel(
+        str(version), model,
+        load_decision_threshold(str(art / "decision_policy.json"), fingerprint, strict=True),
+        load_calibrator(str(art / "calibrator.json"), fingerprint, strict=True),
+        load_fill_values(str(art / "model.joblib")),
+    )
+    loaded.warm_up(warmup)
+    return loaded
+
+
+class Routing(NamedTuple):
+    """Foto inmutable del ruteo; se reemplaza entera en cada cambio."""
+    active: LoadedModel
+    previous: Optional[LoadedModel]
+    traffic: Tuple[Tuple[LoadedModel, float], ...]
+    shadow: Tuple[LoadedModel, ...]
+
+
+def _replace_in_traffic(traffic: Tuple[Tuple[LoadedModel, float], ...], old: LoadedModel,
+                        new: LoadedModel) -> Tuple[Tuple[LoadedModel, float], ...]:
+    """Reparto con `new` en el lugar de `old` (mismos pesos; si `new` ya tenía tráfico se suman)."""
+    merged: Dict[str, Tuple[LoadedModel, float]] = {}
+    for model, weight in traffic:
+        if model is old or model.version == new.version:
+            model = new
+        merged[model.version] = (model, merged.get(model.version, (model, 0.0))[1] + weight)
+    return tuple(merged.values())
+
+
+def _route_bucket(key: str) -> float:
+    """Posición estable en [0, 1) para una clave (mismo cliente -> misma versión)."""
+    return (zlib.crc32(key.encode("utf-8")) % 10_000) / 10_000
+
+
+# ---------- Servidor ----------
+
+class ModelServer:
+    """Sirve predicciones con la versión activa y la reemplaza en caliente cuando cambia la fuente."""
+
+    def __init__(self, registry, poll_interval: float = 10.0, warmup: Optional[pd.DataFrame] = None,
+                 shadow_log_size: int = 1000):
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.warmup = warmup
+        self.shadow_log: Deque[Dict[str, Any]] = deque(maxlen=shadow_log_size)
+        self._routing: Optional[Routing] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._skip_version: Optional[str] = None
+
+    # --- ciclo de vida ---
+
+    def start(self):
+        """Carga la versión vigente (bloqueante: no hay tráfico sin modelo) y arranca el vigilante."""
+        version = self.registry.current_version()
+        if version is None:
+            raise FileNotFoundError("La fuente de modelos no tiene ninguna versión publicada.")
+        self.activate(load_version(self.registry, version, self.warmup))
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        self._shadow_pool.shutdown(wait=True)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_update()
+
+    def check_for_update(self) -> bool:
+        """Si la fuente apunta a otra versión, la carga y calienta fuera del camino de los requests."""
+        try:
+            version = self.registry.current_version()
+            routing = self._routing
+            if version is None or version == routing.active.version or version == self._skip_version:
+                return False
+            print(f"[INFO] Nueva versión detectada: {version} (activa: {routing.active.version})")
+            loaded = load_version(self.registry, version, self.warmup)
+        except Exception as e:
+            # Una versión rota no interrumpe el servicio: se sigue con la activa
+            print(f"[WARN] No se pudo cargar la nueva versión: {e}")
+            return False
+        self.activate(loaded)
+        return True
+
+    # --- cambios de ruteo (siempre reemplazando la foto completa) ---
+
+    def activate(self, loaded: LoadedModel):
+        """La versión nueva toma el lugar de la activa, también en el reparto A/B (pesos intactos)."""
+        with self._lock:
+            old = self._routing
+            if old is None:
+                self._routing = Routing(loaded, None, ((loaded, 1.0),), ())
+            else:
+                traffic = _replace_in_traffic(old.traffic, old.active, loaded)
+                self._routing = Routing(loaded, old.active, traffic, old.shadow)
+        print(f"[OK] Versión activa: {loaded.version}"
+              + (f" (anterior: {old.active.version})" if old else ""))
+
+    def rollback(self) -> str:
+        """Vuelve a la versión anterior y no re-promueve la actual hasta que la fuente cambie."""
+        with self._lock:
+            old = self._routing
+            if old is None or old.previous is None:
+                raise RuntimeError("No hay versión anterior cargada para rollback.")
+            self._skip_version = old.active.version
+            traffic = _replace_in_traffic(old.traffic, old.active, old.previous)
+            self._routing = Routing(old.previous, old.active, traffic, old.shadow)
+        print(f"[OK] Rollback: {old.active.version} -> {old.previous.version}")
+        return old.previous.version
+
+    def _get_loaded(self, version: str) -> LoadedModel:
+        routing = self._routing
+        for m in (routing.active, routing.previous, *[m for m, _ in routing.traffic], *routing.shadow):
+            if m is not None and m.version == str(version):
+                return m
+        return load_version(self.registry, str(version), self.warmup)
+
+    def set_traffic(self, weights: Dict[str, float]):
+        """Reparto A/B entre versiones, p.ej. {"3": 0.9, "4": 0.1} (se cargan y calientan antes)."""
+        total = float(sum(weights.values()))
+        if total <= 0:
+            raise ValueError("Los pesos de tráfico deben sumar un valor positivo.")
+        traffic = tuple((self._get_loaded(v), w / total) for v, w in weights.items() if w > 0)
+        with self._lock:
+            self._routing = self._routing._replace(traffic=traffic)
+
+    def set_shadow(self, versions: List[str]):
+        """Versiones que puntúan en sombra cada request (no afectan la respuesta)."""
+        shadow = tuple(self._get_loaded(v) for v in versions)
+        with self._lock:
+            self._routing = self._routing._replace(shadow=shadow)
+
+    # --- scoring ---
+
+    def _pick(self, routing: Routing, key: Optional[str]) -> LoadedModel:
+        if len(routing.traffic) == 1:
+            return routing.traffic[0][0]
+        u = _route_bucket(key) if key is not None else np.random.random()
+        cum = 0.0
+        for model, weight in routing.traffic:
+            cum += weight
+            if u < cum:
+                return model
+        return routing.traffic[-1][0]
+
+    def score(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Puntúa una lista de clientes crudos; con tráfico repartido cada cliente va a su versión.
+
+        Las filas se agrupan por versión (un `predict_proba` por grupo) y las predicciones vuelven
+        en el orden del request, cada una con la versión que la puntuó. `version` es la del
+        request si todo fue a una sola versión, None si el lote quedó repartido.
+        """
+        routing = self._routing
+        df_raw = pd.DataFrame.from_records(records)
+        if len(routing.traffic) == 1:
+            groups = [(routing.traffic[0][0], list(range(len(records))))]
+        else:
+            by_version: Dict[str, Tuple[LoadedModel, List[int]]] = {}
+            for i, record in enumerate(records):
+                key = record.get("customer_id")
+                model = self._pick(routing, None if key is None else str(key))
+                by_version.setdefault(model.version, (model, []))[1].append(i)
+            groups = list(by_version.values())
+
+        predictions: List[Optional[Dict[str, Any]]] = [None] * len(records)
+        for model, rows in groups:
+            df_group = df_raw if len(groups) == 1 else df_raw.iloc[rows].reset_index(drop=True)
+            scores = model.score(df_group)
+            for i, pred in zip(rows, scores.to_dict(orient="records")):
+                predictions[i] = {**pred, "version": model.version}
+            for shadow in routing.shadow:
+                if shadow is not model:
+                    self._shadow_pool.submit(self._score_shadow, shadow, model.version, df_group,
+                                             scores["churn_probability"].to_numpy(), scores["will_churn"].to_numpy())
+        version = groups[0][0].version if len(groups) == 1 else None
+        return {"version": version, "predictions": predictions}
+
+    def _score_shadow(self, shadow: LoadedModel, primary_version: str, df_raw: pd.DataFrame,
+                      proba: np.ndarray, decision: np.ndarray):
+        try:
+            s = shadow.score(df_raw)
+            self.shadow_log.append({
+                "time": time.time(),
+                "shadow_version": shadow.version,
+                "primary_version": primary_version,
+                "n": int(len(df_raw)),
+                "mean_abs_diff": float(np.mean(np.abs(s["churn_probability"].to_numpy() - proba))),
+                "decision_agreement": float(np.mean(s["will_churn"].to_numpy() == decision)),
+            })
+        except Exception as e:
+            print(f"[WARN] Scoring en sombra de la versión {shadow.version} falló: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        routing = self._routing
+        log = list(self.shadow_log)
+        shadow_summary = {}
+        for m in routing.shadow:
+            entries = [e for e in log if e["shadow_version"] == m.version]
+            if entries:
+                shadow_summary[m.version] = {
+                    "requests": len(entries),
+                    "mean_abs_diff": float(np.mean([e["mean_abs_diff"] for e in entries])),
+                    "decision_agreement": float(np.mean([e["decision_agreement"] for e in entries])),
+                }
+        return {
+            "active_version": routing.active.version,
+            "previous_version": routing.previous.version if routing.previous else None,
+            "traffic": {m.version: w for m, w in routing.traffic},
+            "shadow": shadow_summary or [m.version for m in routing.shadow],
+        }
+
+
+# ---------- HTTP ----------
+
+def make_handler(server: ModelServer):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, default=lambda o: o.item() if hasattr(o, "item") else str(o)).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "healthy", "version": server.status()["active_version"]})
+            elif self.path == "/status":
+                self._send(200, server.status())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                if self.path == "/predict":
+                    payload = self._read_json()
+                    self._send(200, server.score(payload if isinstance(payload, list) else [payload]))
+                elif self.path == "/rollback":
+                    self._send(200, {"active_version": server.rollback()})
+                elif self.path == "/traffic":
+                    server.set_traffic(self._read_json())
+                    self._send(200, server.status())
+                elif self.path == "/shadow":
+                    server.set_shadow(self._read_json())
+                    self._send(200, server.status())
+                else:
+                    self._send(404, {"error": "not found"})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def build_registry(cfg: Dict[str, Any]):
+    if cfg.get("source", "local") == "mlflow":
+        return MlflowRegistry(cfg.get("model_name", "TelcoChurn_Model"), cfg.get("mlflow_stage", "Production"),
+                              cfg.get("cache_dir", "models/registry_cache"))
+    return LocalRegistry(cfg.get("registry_dir", "models/registry"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de scoring con recarga en caliente de modelos")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (sección serving)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pub = sub.add_parser("publish", help="Publicar un modelo como nueva versión del registro local")
+    pub.add_argument("--model", default="models/model.joblib", help="Artefacto a publicar")
+    pub.add_argument("--no-promote", action="store_true", help="Publicar sin moverle el puntero CURRENT")
+
+    srv = sub.add_parser("serve", help="Levantar el servicio HTTP")
+    srv.add_argument("--host", default="0.0.0.0")
+    srv.add_argument("--port", type=int, default=8000)
+
+    args = parser.parse_args()
+    with open(args.params, "r", encoding="utf-8") as f:
+        cfg = (yaml.safe_load(f) or {}).get("serving", {}) or {}
+
+    if args.command == "publish":
+        registry = LocalRegistry(cfg.get("registry_dir", "models/registry"))
+        version = registry.publish(args.model, promote=not args.no_promote)
+        print(f"[SAVE] Versión {version} publicada en {registry.root}"
+              + ("" if args.no_promote else " (CURRENT actualizado)"))
+        return
+
+    warmup = None
+    if cfg.get("warmup_data"):
+        warmup = pd.read_csv(cfg["warmup_data"], nrows=int(cfg.get("warmup_rows", 100)))
+    server = ModelServer(build_registry(cfg), float(cfg.get("poll_interval", 10)), warmup)
+    server.start()
+    if cfg.get("shadow"):
+        server.set_shadow([str(v) for v in cfg["shadow"]])
+    if cfg.get("traffic"):
+        server.set_traffic({str(k): float(v) for k, v in cfg["traffic"].items()})
+
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(server))
+    print(f"[OK] Sirviendo en http://{args.host}:{args.port} (versión {server.status()['active_version']})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
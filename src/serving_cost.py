@@ -0,0 +1,123 @@
+"""
+serving_cost.py
+
+Costo de servir un modelo de TelcoVision (lo que el ROC-AUC no muestra).
+- Tamaño serializado del artefacto y tiempo de carga (`joblib.load`)
+- Cantidad total de nodos de árbol (0 para modelos lineales)
+- Latencia p50/p99 de `predict_proba` por lote a distintos tamaños de batch (1 / 100 / 10k)
+- `train.py` lo guarda como `serving_cost.json` junto al modelo; `run_experiments.py`
+  lo usa para la vista de Pareto y los presupuestos de latencia/tamaño
+
+Uso:
+python src/serving_cost.py --model models/model.joblib
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+
+DEFAULT_BATCH_SIZES = [1, 100, 10_000]
+
+
+def count_tree_nodes(model) -> int:
+    """Nodos totales de los árboles del estimador final del Pipeline (0 si no es de árboles)."""
+    est = model[-1] if hasattr(model, "steps") else model
+    if hasattr(est, "estimators_"):
+        return int(sum(t.tree_.node_count for t in np.ravel(est.estimators_) if hasattr(t, "tree_")))
+    if hasattr(est, "tree_"):
+        return int(est.tree_.node_count)
+    return 0
+
+
+def _n_repeats(batch_size: int, max_rows: int = 200_000, min_repeats: int = 5, max_repeats: int = 200) -> int:
+    """Más repeticiones para lotes chicos (p99 estable) y menos para los grandes (tiempo acotado)."""
+    return int(np.clip(max_rows // max(batch_size, 1), min_repeats, max_repeats))
+
+
+def measure_latency(model, X: pd.DataFrame, batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+                    random_state: int = 42) -> Dict[int, Dict[str, float]]:
+    """
+    Latencia de `predict_proba` (ms por llamada) para cada tamaño de lote.
+
+    Los lotes se arman remuestreando filas de `X` con reemplazo, así un set de test chico
+    alcanza para medir lotes de 10k. Cada tamaño tiene una llamada de calentamiento.
+    """
+    rng = np.random.default_rng(random_state)
+    pool = X.iloc[rng.integers(0, len(X), size=max(batch_sizes))].reset_index(drop=True)
+    result: Dict[int, Dict[str, float]] = {}
+    for batch in batch_sizes:
+        n_repeats = _n_repeats(batch)
+        starts = rng.integers(0, len(pool) - batch + 1, size=n_repeats + 1)
+        batches = [pool.iloc[s:s + batch] for s in starts]
+        model.predict_proba(batches[0])
+        times = np.empty(n_repeats)
+        for i, xb in enumerate(batches[1:]):
+            t0 = time.perf_counter()
+            model.predict_proba(xb)
+            times[i] = (time.perf_counter() - t0) * 1000.0
+        result[int(batch)] = {
+            "p50_ms": float(np.percentile(times, 50)),
+            "p99_ms": float(np.percentile(times, 99)),
+            "n_repeats": n_repeats,
+        }
+    return result
+
+
+def measure_serving_cost(model_path: Path, X: pd.DataFrame, batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+                         n_loads: int = 3) -> Dict[str, Any]:
+    """Tamaño, tiempo de carga, nodos y latencias del artefacto guardado en `model_path`."""
+    load_times: List[float] = []
+    for _ in range(n_loads):
+        t0 = time.perf_counter()
+        model = joblib.load(model_path)
+        load_times.append((time.perf_counter() - t0) * 1000.0)
+
+    cost: Dict[str, Any] = {
+        "model_size_mb": Path(model_path).stat().st_size / 1024 ** 2,
+        "load_time_ms": float(np.median(load_times)),
+        "n_tree_nodes": count_tree_nodes(model),
+    }
+    for batch, lat in measure_latency(model, X, batch_sizes).items():
+        cost[f"latency_p50_ms_b{batch}"] = lat["p50_ms"]
+        cost[f"latency_p99_ms_b{batch}"] = lat["p99_ms"]
+    return cost
+
+
+def save_serving_cost(model_path: Path, X: pd.DataFrame, out_path: Path,
+                      batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES) -> Dict[str, Any]:
+    """Mide el costo de servir el modelo y lo guarda como JSON plano (una clave por métrica)."""
+    print(f"[INFO] Midiendo costo de serving (batches: {', '.join(str(b) for b in batch_sizes)})...")
+    cost = measure_serving_cost(model_path, X, batch_sizes)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(cost, f, indent=2)
+    print(f"[SAVE] Costo de serving guardado: {out_path} "
+          f"({cost['model_size_mb']:.2f} MB, p99@{batch_sizes[0]}: {cost[f'latency_p99_ms_b{batch_sizes[0]}']:.2f} ms)")
+    return cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medir tamaño, carga y latencia de un modelo entrenado")
+    parser.add_argument("--model", default="models/model.joblib", help="Artefacto .joblib a medir")
+    parser.add_argument("--data", default="data/processed/telco_churn_processed.csv",
+                        help="CSV procesado para armar los lotes")
+    parser.add_argument("--target", default="churn", help="Columna objetivo a descartar (default: churn)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES,
+                        help="Tamaños de lote (default: 1 100 10000)")
+    parser.add_argument("--out", help="JSON de salida (default: serving_cost.json junto al modelo)")
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    X = pd.read_csv(args.data).drop(columns=[args.target], errors="ignore")
+    save_serving_cost(model_path, X, Path(args.out) if args.out else model_path.with_name("serving_cost.json"),
+                      args.batch_sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+slices.py
+
+Evaluacion por segmentos de clientes (slices) para TelcoVision.
+- Las claves de segmento salen del dataset raw (`region`, `contract_type`, ... y tramos de
+  `tenure_months`), porque el procesado ya las tiene codificadas en dummies; el raw y el procesado
+  estan alineados fila a fila, asi que el indice del split de test sirve para ambos
+- Todos los slices (simples y cruzados, p.ej. region x contract_type) se apilan en un solo frame
+  largo y se agregan en una unica pasada agrupada: matriz de confusion con sumas de indicadores y
+  ROC-AUC por Mann-Whitney con rangos dentro de cada grupo (sin un loop de Python por slice)
+- Los slices con menos de `min_support` filas se descartan (el reporte indica cuantos)
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SEGMENTS = ["region", "contract_type", "internet_service", "payment_method", "tenure_band"]
+DEFAULT_TENURE_BANDS = [0, 12, 24, 48]
+
+
+def segment_keys(raw: pd.DataFrame, columns: Sequence[str],
+                 tenure_bands: Sequence[float] = DEFAULT_TENURE_BANDS) -> pd.DataFrame:
+    """Columnas de segmento (texto) desde el raw; `tenure_band` se arma con los cortes `tenure_bands`."""
+    raw = raw.rename(columns=lambda c: c.strip().lower())
+    keys = pd.DataFrame(index=raw.index)
+    for col in columns:
+        if col == "tenure_band":
+            edges = list(tenure_bands) + [np.inf]
+            labels = [f"{int(lo)}-{int(hi)}" if np.isfinite(hi) else f">{int(lo)}" for lo, hi in zip(edges, edges[1:])]
+            tenure = pd.to_numeric(raw["tenure_months"], errors="coerce")
+            keys[col] = pd.cut(tenure, edges, labels=labels, right=True, include_lowest=True).astype(str)
+        else:
+            keys[col] = raw[col].astype(str).str.strip()
+    return keys
+
+
+def _joined_keys(keys: pd.DataFrame, columns: List[str]) -> pd.Series:
+    value = keys[columns[0]].astype(str)
+    for col in columns[1:]:
+        value = value + " | " + keys[col].astype(str)
+    return value
+
+
+def slice_metrics(keys: pd.DataFrame, y_true: np.ndarray, y_proba: np.ndarray, y_pred: np.ndarray,
+                  crosses: Optional[List[List[str]]] = None, min_support: int = 30) -> Tuple[pd.DataFrame, int]:
+    """
+    Metricas por slice en una sola pasada agrupada.
+
+    Devuelve un DataFrame con `slice` (p.ej. "region x contract_type"), `value`
+    ("North | One year"), soporte, matriz de confusion, precision, recall, f1, tasa de churn y ROC-AUC
+    (NaN si el slice tiene una sola clase), y la cantidad de slices descartados por `min_support`.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    definitions = [[c] for c in keys.columns] + [list(c) for c in (crosses or [])]
+
+    # Frame largo: una copia de las predicciones por definicion de slice
+    base = pd.DataFrame({
+        "y": y_true,
+        "proba": np.asarray(y_proba, dtype=np.float64),
+        "pred": np.asarray(y_pred, dtype=np.int64),
+    })
+    long = pd.concat([
+        base.assign(slice=" x ".join(d), value=_joined_keys(keys, d).to_numpy()) for d in definitions
+    ], ignore_index=True)
+    long["tp"] = (long["y"] == 1) & (long["pred"] == 1)
+    long["fp"] = (long["y"] == 0) & (long["pred"] == 1)
+    long["fn"] = (long["y"] == 1) & (long["pred"] == 0)
+    # Rango de la probabilidad dentro de su slice (empates promediados, como en roc_auc_score)
+    groups = long.groupby(["slice", "value"], sort=False)
+    long["pos_rank"] = groups["proba"].rank(method="average").where(long["y"] == 1, 0.0)
+
+    out = long.groupby(["slice", "value"], sort=False).agg(
+        support=("y", "size"), positives=("y", "sum"), tp=("tp", "sum"), fp=("fp", "sum"),
+        fn=("fn", "sum"), pos_rank_sum=("pos_rank", "sum"),
+    ).reset_index()
+    out["negatives"] = out["support"] - out["positives"]
+    out["tn"] = out["negatives"] - out["fp"]
+    out["churn_rate"] = out["positives"] / out["support"]
+    out["precision"] = out["tp"] / (out["tp"] + out["fp"]).replace(0, np.nan)
+    out["recall"] = out["tp"] / out["positives"].replace(0, np.nan)
+    out["f1"] = 2 * out["tp"] / (2 * out["tp"] + out["fp"] + out["fn"]).replace(0, np.nan)
+    u = out["pos_rank_sum"] - out["positives"] * (out["positives"] + 1) / 2
+    out["roc_auc"] = u / (out["positives"] * out["negatives"]).replace(0, np.nan)
+    out = out.drop(columns=["pos_rank_sum"])
+    return out[out["support"] >= min_support].reset_index(drop=True), int((out["support"] < min_support).sum())
+
+
+def slices_report(table: pd.DataFrame, n_filtered: int, min_support: int,
+                  global_metrics: Dict[str, float]) -> Dict[str, Any]:
+    """Reporte JSON: metricas por slice agrupadas por definicion + delta de recall/AUC vs global."""
+    report: Dict[str, Any] = {
+        "min_support": min_support,
+        "slices_filtered_low_support": n_filtered,
+        "global": global_metrics,
+        "slices": {},
+    }
+    cols = ["support", "churn_rate", "tp", "fp", "fn", "tn", "precision", "recall", "f1", "roc_auc"]
+    for name, part in table.groupby("slice", sort=False):
+        report["slices"][name] = {
+            row["value"]: {
+                **{c: (None if pd.isna(row[c]) else (int(row[c]) if c in ("support", "tp", "fp", "fn", "tn")
+                                                    else round(float(row[c]), 4))) for c in cols},
+                "recall_delta": None if pd.isna(row["recall"]) else round(float(row["recall"] - global_metrics["recall"]), 4),
+                "roc_auc_delta": None if pd.isna(row["roc_auc"]) else round(float(row["roc_auc"] - global_metrics["roc_auc"]), 4),
+            }
+            for _, row in part.iterrows()
+        }
+    return report
+
+
+def plot_slice_heatmap(table: pd.DataFrame, out_path: str, metrics: Sequence[str] = ("precision", "recall", "f1", "roc_auc")):
+    """Heatmap slice x metrica (las filas se anotan con el soporte)."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    data = table.set_index(table["slice"] + " = " + table["value"] + "  (n=" + table["support"].astype(str) + ")")
+    data = data[list(metrics)].astype(float)
+    plt.figure(figsize=(9, max(4, 0.32 * len(data) + 1.5)))
+    sns.heatmap(data, annot=True, fmt=".2f", cmap="RdYlGn", vmin=0, vmax=1, cbar_kws={"label": "Valor"})
+    plt.title("Metricas por Segmento de Clientes", fontsize=14, fontweight="bold")
+    plt.ylabel("")
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=200, bbox_inches="tight")
+    plt.close()
+    print(f"[OK] Heatmap por segmento guardado: {out_path}")
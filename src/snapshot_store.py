@@ -0,0 +1,219 @@
+"""
+snapshot_store.py
+
+Almacen local de snapshots mensuales de clientes con consultas point-in-time.
+- Cada snapshot es una particion columnar: un `.npy` por columna (numericas tal cual, texto como
+  codigos enteros + diccionario en `part.json`), legible con memmap y sin dependencias extra
+- Indice global `index.npz` ordenado por (hash de `customer_id`, fecha) con la particion y la
+  fila de cada registro: "estado de cada cliente al dia D" es un filtro + ultimo por grupo
+  vectorizado, leyendo solo las filas necesarias de cada particion
+- `append` agrega un mes nuevo sin reescribir las particiones existentes (solo se re-ordena el indice)
+- `data_prep.py --store DIR --as-of FECHA` lo usa como alternativa a un CSV unico
+
+Uso:
+python src/snapshot_store.py append --store data/snapshot_store --input telco_churn_2024-03.csv
+python src/snapshot_store.py as-of --store data/snapshot_store --date 2024-03-31 --out asof.csv
+python src/snapshot_store.py info --store data/snapshot_store
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMN = "customer_id"
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _to_day(date) -> int:
+    """Fecha (str/Timestamp) como dias desde 1970-01-01."""
+    return int((np.datetime64(pd.Timestamp(date).date(), "D") - _EPOCH).astype(np.int64))
+
+
+def _from_day(day: int) -> str:
+    return str(_EPOCH + np.timedelta64(int(day), "D"))
+
+
+def customer_keys(ids: pd.Series) -> np.ndarray:
+    """Hash de 64 bits del `customer_id` (como int64) para el indice ordenado."""
+    return pd.util.hash_array(ids.astype(str).str.strip().to_numpy(dtype=object)).view(np.int64)
+
+
+class SnapshotStore:
+    """Particiones columnares por fecha de snapshot + indice (cliente, fecha) -> (particion, fila)."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.parts_dir = self.root / "parts"
+        self.index_path = self.root / "index.npz"
+
+    # ---------- Escritura ----------
+
+    def partitions(self) -> List[str]:
+        return sorted(p.name for p in self.parts_dir.iterdir() if (p / "part.json").exists()) \
+            if self.parts_dir.exists() else []
+
+    def append(self, df: pd.DataFrame, date, replace: bool = False) -> Dict[str, Any]:
+        """Escribe el snapshot `df` con fecha `date` como particion nueva y actualiza el indice."""
+        df = df.rename(columns=lambda c: c.strip().lower())
+        if ID_COLUMN not in df.columns:
+            raise ValueError(f"El snapshot no tiene la columna '{ID_COLUMN}'")
+        day = _to_day(date)
+        name = _from_day(day)
+        part_dir = self.parts_dir / name
+        if part_dir.exists():
+            if not replace:
+                raise FileExistsError(f"Ya existe el snapshot {name} (usar replace=True / --replace)")
+            shutil.rmtree(part_dir)
+        tmp_dir = self.parts_dir / f".{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        meta: Dict[str, Any] = {"date": name, "rows": len(df), "columns": {}}
+        for col in df.columns:
+            values = df[col]
+            if pd.api.types.is_numeric_dtype(values):
+                np.save(tmp_dir / f"{col}.npy", values.to_numpy())
+                meta["columns"][col] = {"kind": "numeric"}
+            else:
+                codes, categories = pd.factorize(values.astype("string").str.strip())
+                np.save(tmp_dir / f"{col}.npy", codes.astype(np.int32))
+                meta["columns"][col] = {"kind": "category", "categories": [str(c) for c in categories]}
+        with open(tmp_dir / "part.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        tmp_dir.rename(part_dir)
+
+        self._update_index(name, customer_keys(df[ID_COLUMN]), day)
+        print(f"[OK] Snapshot {name} agregado: {len(df):,} filas, {len(df.columns)} columnas")
+        return meta
+
+    def _update_index(self, part: str, keys: np.ndarray, day: int):
+        parts = self.partitions()
+        part_id = parts.index(part)
+        new = {
+            "key": keys,
+            "day": np.full(len(keys), day, dtype=np.int64),
+            "part": np.full(len(keys), part_id, dtype=np.int32),
+            "row": np.arange(len(keys), dtype=np.int64),
+        }
+        if self.index_path.exists():
+            with np.load(self.index_path) as old:
+                old_parts = [str(p) for p in old["parts"]]
+                # Las particiones se identifican por posicion en el listado ordenado: remapear las viejas
+                remap = np.array([parts.index(p) if p in parts else -1 for p in old_parts], dtype=np.int32)
+                old_part = remap[old["part"]]
+                keep = (old_part >= 0) & (old_part != part_id)
+                merged = {k: np.concatenate([old[k][keep] if k != "part" else old_part[keep], new[k]]) for k in new}
+        else:
+            merged = new
+        order = np.lexsort((merged["day"], merged["key"]))
+        np.savez(self.index_path, parts=np.array(parts), **{k: v[order] for k, v in merged.items()})
+
+    # ---------- Lectura ----------
+
+    def _load_index(self) -> Dict[str, np.ndarray]:
+        if not self.index_path.exists():
+            raise FileNotFoundError(f"Store vacio o inexistente: {self.root}")
+        with np.load(self.index_path) as idx:
+            return {k: idx[k] for k in idx.files}
+
+    def _read_rows(self, part: str, rows: np.ndarray, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        part_dir = self.parts_dir / part
+        with open(part_dir / "part.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        out = {}
+        for col, info in meta["columns"].items():
+            if columns is not None and col not in columns and col != ID_COLUMN:
+                continue
+            values = np.load(part_dir / f"{col}.npy", mmap_mode="r")[rows]
+            if info["kind"] == "category":
+                out[col] = pd.Categorical.from_codes(values, categories=info["categories"]).astype(object)
+            else:
+                out[col] = np.asarray(values)
+        return pd.DataFrame(out)
+
+    def as_of(self, date, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Ultimo estado conocido de cada cliente con fecha de snapshot <= `date`.
+
+        Agrega `snapshot_date` con la fecha del registro elegido. Orden de filas: por particion y fila.
+        """
+        idx = self._load_index()
+        mask = idx["day"] <= _to_day(date)
+        key, part, row, day = idx["key"][mask], idx["part"][mask], idx["row"][mask], idx["day"][mask]
+        if not len(key):
+            raise ValueError(f"No hay snapshots con fecha <= {date}")
+        # Indice ordenado por (cliente, fecha): el ultimo registro de cada cliente es el as-of
+        last = np.flatnonzero(np.r_[key[1:] != key[:-1], True])
+        part, row, day = part[last], row[last], day[last]
+
+        parts = [str(p) for p in idx["parts"]]
+        frames = []
+        for pid in np.unique(part):
+            sel = part == pid
+            rows = np.sort(row[sel])
+            frame = self._read_rows(parts[pid], rows, columns)
+            frame["snapshot_date"] = parts[pid]
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True, sort=False)
+
+    def history(self, customer_id: str) -> pd.DataFrame:
+        """Todos los registros de un cliente, ordenados por fecha (busqueda binaria en el indice)."""
+        idx = self._load_index()
+        key = customer_keys(pd.Series([customer_id]))[0]
+        lo, hi = np.searchsorted(idx["key"], key, "left"), np.searchsorted(idx["key"], key, "right")
+        parts = [str(p) for p in idx["parts"]]
+        frames = [self._read_rows(parts[p], np.array([r])).assign(snapshot_date=parts[p])
+                  for p, r in zip(idx["part"][lo:hi], idx["row"][lo:hi])]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def info(self) -> Dict[str, Any]:
+        idx = self._load_index() if self.index_path.exists() else {"key": np.array([], dtype=np.int64)}
+        return {
+            "root": str(self.root),
+            "partitions": self.partitions(),
+            "records": int(len(idx["key"])),
+            "customers": int(len(np.unique(idx["key"]))),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacen de snapshots con consultas point-in-time")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ap = sub.add_parser("append", help="Agregar un snapshot (CSV con el esquema del raw)")
+    ap.add_argument("--store", default="data/snapshot_store")
+    ap.add_argument("--input", required=True, help="CSV del snapshot")
+    ap.add_argument("--date", help="Fecha del snapshot (default: YYYY-MM del nombre del archivo, dia 1)")
+    ap.add_argument("--replace", action="store_true", help="Reemplazar si ya existe esa fecha")
+
+    qp = sub.add_parser("as-of", help="Estado de cada cliente a una fecha")
+    qp.add_argument("--store", default="data/snapshot_store")
+    qp.add_argument("--date", required=True)
+    qp.add_argument("--out", required=True, help="CSV de salida")
+
+    ip = sub.add_parser("info", help="Particiones y tamano del indice")
+    ip.add_argument("--store", default="data/snapshot_store")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if args.command == "append":
+        date = args.date
+        if date is None:
+            from backtest import snapshot_month
+            date = snapshot_month(Path(args.input)).start_time
+        store.append(pd.read_csv(args.input), date, args.replace)
+    elif args.command == "as-of":
+        df = store.as_of(args.date)
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(args.out, index=False)
+        print(f"[OK] Estado al {args.date}: {len(df):,} clientes -> {args.out}")
+    print(f"[INFO] {json.dumps(store.info(), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+sql_source.py
+
+Conector SQL para el dataset raw de TelcoVision (alternativa al CSV en `data_prep.py`).
+- Ejecuta una query contra un archivo SQLite (o cualquier conexión DB-API 2.0) y lee el resultado
+  en lotes con `fetchmany`, acumulando columna a columna: no hay export intermedio a CSV
+- Tipos: enteros/reales/texto según los valores devueltos por el driver (NULL -> NaN); `dtypes`
+  fuerza el tipo de columnas puntuales (p.ej. `total_charges` guardada como TEXT)
+- Una conexión por base y por proceso (`get_connection`): `data_prep`, las claves de segmento de
+  `evaluate.py` y `attribution.py` la reutilizan cuando corren en el mismo proceso
+- CLI `load`: carga un CSV en una tabla SQLite en lotes (`executemany`), útil como fixture local
+
+Uso:
+python src/sql_source.py load --csv data/raw/telco_churn.csv --db data/raw/telco_churn.db --table customers
+python src/data_prep.py --db data/raw/telco_churn.db --query "SELECT * FROM customers ORDER BY rowid" --out data/processed/telco_churn_processed.csv
+"""
+
+import argparse
+import atexit
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUERY = "SELECT * FROM customers ORDER BY rowid"
+DEFAULT_BATCH_SIZE = 5000
+
+_CONNECTIONS: Dict[str, sqlite3.Connection] = {}
+
+
+def get_connection(database: str) -> sqlite3.Connection:
+    """Conexión SQLite compartida por base dentro del proceso (se cierra al salir)."""
+    key = str(Path(database).resolve())
+    if key not in _CONNECTIONS:
+        if not Path(database).exists():
+            raise FileNotFoundError(f"Base SQLite no encontrada: {database}")
+        _CONNECTIONS[key] = sqlite3.connect(key, check_same_thread=False)
+    return _CONNECTIONS[key]
+
+
+@atexit.register
+def close_connections():
+    for conn in _CONNECTIONS.values():
+        conn.close()
+    _CONNECTIONS.clear()
+
+
+def _resolve(source: Union[str, Any]):
+    """Ruta a un archivo SQLite -> conexión compartida; cualquier otra cosa se usa como conexión DB-API."""
+    return get_connection(str(source)) if isinstance(source, (str, Path)) else source
+
+
+def iter_batches(source: Union[str, Any], query: str, params: Sequence[Any] = (),
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """Genera (columnas, filas) de a `batch_size` filas con `fetchmany`."""
+    cursor = _resolve(source).cursor()
+    try:
+        cursor.execute(query, tuple(params))
+        columns = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+
+
+def query_columns(source: Union[str, Any], query: str, params: Sequence[Any] = ()) -> List[str]:
+    """Nombres de columnas de la query sin leer filas."""
+    cursor = _resolve(source).cursor()
+    try:
+        cursor.execute(query, tuple(params))
+        return [d[0] for d in cursor.description]
+    finally:
+        cursor.close()
+
+
+def _typed_column(values: List[Any]) -> np.ndarray:
+    """Array con el tipo más específico: int64 si no hay NULL ni reales, float64, si no object."""
+    kinds = {type(v) for v in values if v is not None}
+    if kinds and kinds <= {int, bool} and None not in values:
+        return np.asarray(values, dtype=np.int64)
+    if kinds and kinds <= {int, float, bool}:
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.asarray(values, dtype=object)
+
+
+def read_query(source: Union[str, Any], query: str = DEFAULT_QUERY, params: Sequence[Any] = (),
+               batch_size: int = DEFAULT_BATCH_SIZE, dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Resultado completo de la query como DataFrame tipado, leído en lotes.
+
+    El preprocesamiento (medianas, dummies) necesita todas las filas, así que los lotes se
+    acumulan por columna y el DataFrame se construye una sola vez al final.
+    """
+    columns: List[str] = []
+    data: List[List[Any]] = []
+    n_batches = 0
+    for columns, rows in iter_batches(source, query, params, batch_size):
+        if not data:
+            data = [[] for _ in columns]
+        for store, values in zip(data, zip(*rows)):
+            store.extend(values)
+        n_batches += 1
+    if not columns:
+        columns = query_columns(source, query, params)
+        data = [[] for _ in columns]
+    df = pd.DataFrame({col: _typed_column(values) for col, values in zip(columns, data)}, columns=columns)
+    for col, dtype in (dtypes or {}).items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce") if dtype == "numeric" else df[col].astype(dtype)
+    print(f"[INFO] Query SQL: {len(df):,} filas, {len(columns)} columnas en {n_batches} lotes de <= {batch_size:,}")
+    return df
+
+
+def load_csv(csv_path: str, database: str, table: str = "customers", batch_size: int = DEFAULT_BATCH_SIZE,
+             replace: bool = False) -> int:
+    """Carga un CSV en una tabla SQLite por lotes (tipos de columna según pandas)."""
+    conn = get_connection(database) if Path(database).exists() else sqlite3.connect(database)
+    total = 0
+    with conn:
+        if replace:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=batch_size)):
+            if i == 0:
+                decl = {c: "INTEGER" if pd.api.types.is_integer_dtype(t) else
+                        "REAL" if pd.api.types.is_float_dtype(t) else "TEXT" for c, t in chunk.dtypes.items()}
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ('
+                             + ", ".join(f'"{c}" {t}' for c, t in decl.items()) + ")")
+            placeholders = ", ".join("?" for _ in chunk.columns)
+            rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+            conn.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', rows)
+            total += len(chunk)
+    if str(Path(database).resolve()) not in _CONNECTIONS:
+        conn.close()
+    print(f"[OK] {total:,} filas cargadas en {database}:{table}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuente SQL (SQLite) para el dataset raw")
+    sub = parser.add_subparsers(dest="command", required=True)
+    lp = sub.add_parser("load", help="Cargar un CSV en una tabla SQLite")
+    lp.add_argument("--csv", required=True, help="CSV de entrada")
+    lp.add_argument("--db", required=True, help="Archivo SQLite (se crea si no existe)")
+    lp.add_argument("--table", default="customers")
+    lp.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    lp.add_argument("--replace", action="store_true", help="Reemplazar la tabla si ya existe")
+    args = parser.parse_args()
+
+    if args.command == "load":
+        Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+        load_csv(args.csv, args.db, args.table, args.batch_size, args.replace)
+
+
+if __name__ == "__main__":
+    main()
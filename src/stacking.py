@@ -0,0 +1,115 @@
+"""
+stacking.py
+
+Stage de stacking para TelcoVision.
+- Lee las probabilidades out-of-fold que `train.py` guardó para cada experimento
+  (`models/experiments/<exp>/oof_predictions.csv`); los modelos base NO se reentrenan
+- Ajusta un meta-modelo liviano (LogisticRegression sobre logits) con las OOF de train
+- Evalúa ensamble y modelos base sobre test con las probabilidades ya cacheadas
+- Exporta un único artefacto de scoring (`StackedChurnModel`) en `models/stacked_model.joblib`
+
+Uso:
+python src/stacking.py
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from ensemble import StackedChurnModel, to_logit
+
+
+def load_oof_matrix(models_dir: Path, experiments: List[str]) -> pd.DataFrame:
+    """Une las OOF de todos los experimentos por (row_id, split) en columnas, una por experimento."""
+    merged = None
+    for exp in experiments:
+        path = models_dir / exp / "oof_predictions.csv"
+        if not path.exists():
+            raise FileNotFoundError(f"Faltan predicciones out-of-fold de {exp}: {path} (definir oof_folds en su YAML)")
+        df = pd.read_csv(path).rename(columns={"proba": exp})
+        if merged is None:
+            merged = df
+        else:
+            merged = merged.merge(df[["row_id", "split", exp]], on=["row_id", "split"], how="inner", validate="one_to_one")
+    if merged is None or merged.empty:
+        raise ValueError("No hay filas comunes entre las predicciones out-of-fold de los experimentos.")
+    return merged
+
+
+def binary_metrics(y_true: np.ndarray, proba: np.ndarray, threshold: float = 0.5) -> Dict[str, float]:
+    y_pred = (proba >= threshold).astype(int)
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision": float(precision_score(y_true, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_true, y_pred, zero_division=0)),
+        "f1": float(f1_score(y_true, y_pred, zero_division=0)),
+        "roc_auc": float(roc_auc_score(y_true, proba)),
+    }
+
+
+def main():
+    print("="*80)
+    print("STACKING DE EXPERIMENTOS - TELCOVISION")
+    print("="*80)
+
+    with open("params.yaml", "r", encoding="utf-8") as f:
+        params = yaml.safe_load(f) or {}
+    cfg = params.get("stacking", {}) or {}
+    experiments = cfg.get("experiments") or params.get("experiments", [])
+    models_dir = Path(cfg.get("models_dir", "models/experiments"))
+    out_path = Path(cfg.get("out_path", "models/stacked_model.joblib"))
+    metrics_path = Path(cfg.get("metrics_path", "metrics/stacking_metrics.json"))
+
+    print(f"\n[INFO] Modelos base: {', '.join(experiments)}")
+    oof = load_oof_matrix(models_dir, experiments)
+    train = oof[oof["split"] == "train"]
+    test = oof[oof["split"] == "test"]
+    print(f"[OK] OOF train: {len(train)} filas | test: {len(test)} filas")
+
+    meta = LogisticRegression(C=float(cfg.get("C", 1.0)), max_iter=1000)
+    meta.fit(to_logit(train[experiments].to_numpy()), train["y_true"].to_numpy())
+    print("[OK] Meta-modelo ajustado sobre probabilidades out-of-fold")
+
+    y_test = test["y_true"].to_numpy()
+    stacked_proba = meta.predict_proba(to_logit(test[experiments].to_numpy()))[:, 1]
+    results: Dict[str, Any] = {
+        "experiments": experiments,
+        "meta_model": {
+            "type": "LogisticRegression",
+            "coef": dict(zip(experiments, meta.coef_.ravel().tolist())),
+            "intercept": float(meta.intercept_[0]),
+        },
+        "test": {"stacked": binary_metrics(y_test, stacked_proba)},
+    }
+    for exp in experiments:
+        results["test"][exp] = binary_metrics(y_test, test[exp].to_numpy())
+
+    base_models = [joblib.load(models_dir / exp / "model.joblib") for exp in experiments]
+    stacked = StackedChurnModel(base_models, experiments, meta, n_jobs=int(cfg.get("n_jobs", -1)))
+    results["shared_scaler_groups"] = [[experiments[i] for i in g] for g in stacked._scaler_groups]
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(stacked, out_path)
+    print(f"[SAVE] Artefacto de stacking guardado: {out_path}")
+
+    metrics_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"[SAVE] Métricas de stacking guardadas: {metrics_path}")
+
+    print("\n" + "="*80)
+    print(f"{'Modelo':28s} {'ROC-AUC':>8s} {'F1':>8s}")
+    for name, m in results["test"].items():
+        print(f"{name:28s} {m['roc_auc']:8.4f} {m['f1']:8.4f}")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+threshold.py
+
+Optimizacion del umbral de decision para TelcoVision.
+- Carga el modelo entrenado y el split de test (mismo split que `train.py`)
+- Barre todos los umbrales posibles sobre las probabilidades de test en una sola pasada vectorizada
+- Elige el umbral segun la politica de `params.yaml` (seccion `threshold`):
+    * cost:      minimiza el costo esperado de la matriz de costos (fn, fp, tp, tn)
+    * recall:    mayor umbral que alcanza `target_recall`
+    * precision: menor umbral que mantiene `target_precision` (maximiza recall)
+- Guarda la politica en `models/decision_policy.json` (con el sha256 del modelo), que usan
+  `evaluate.py` y `predict.py`
+
+Uso:
+python src/threshold.py
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from evaluate import load_artifacts, load_params
+from predict import (
+    DEFAULT_CALIBRATOR_PATH, DEFAULT_POLICY_PATH, DEFAULT_THRESHOLD, apply_calibration, load_calibrator
+)
+from score_cache import model_version
+
+
+DEFAULT_COSTS = {"fn": 5.0, "fp": 1.0, "tp": 0.0, "tn": 0.0}
+
+
+def sweep_thresholds(y_true, y_proba, costs: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """
+    Calcula la matriz de confusion para todos los umbrales distintos en O(n log n).
+
+    Ordena las probabilidades de mayor a menor y acumula positivos/negativos:
+    el umbral i predice churn para todas las muestras con proba >= thresholds[i].
+    El primer umbral (mayor que el maximo) corresponde a no predecir ningun churn.
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+
+    order = np.argsort(-y_proba, kind="mergesort")
+    p_sorted = y_proba[order]
+    y_sorted = y_true[order]
+
+    # Ultima posicion de cada valor distinto (empates se deciden juntos)
+    distinct = np.r_[np.flatnonzero(np.diff(p_sorted)), p_sorted.size - 1]
+    tp = np.r_[0, np.cumsum(y_sorted)[distinct]]
+    fp = np.r_[0, np.cumsum(1 - y_sorted)[distinct]]
+    thresholds = np.r_[np.nextafter(p_sorted[0], np.inf), p_sorted[distinct]]
+
+    n_pos = int(y_true.sum())
+    n_neg = int(y_true.size - n_pos)
+    fn = n_pos - tp
+    tn = n_neg - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / n_pos if n_pos else np.zeros_like(tp, dtype=np.float64)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    cost = (
+        costs.get("fn", 0.0) * fn
+        + costs.get("fp", 0.0) * fp
+        + costs.get("tp", 0.0) * tp
+        + costs.get("tn", 0.0) * tn
+    )
+
+    return {
+        "thresholds": thresholds,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": precision, "recall": recall, "f1": f1,
+        "cost": cost,
+    }
+
+
+def select_threshold(sweep: Dict[str, np.ndarray], strategy: str,
+                     target_recall: float = 0.8, target_precision: float = 0.6) -> int:
+    """Devuelve el indice del umbral elegido dentro del barrido."""
+    if strategy == "cost":
+        return int(np.argmin(sweep["cost"]))
+    if strategy == "recall":
+        feasible = np.flatnonzero(sweep["recall"] >= target_recall)
+        if feasible.size == 0:
+            raise ValueError(f"Ningun umbral alcanza recall >= {target_recall}")
+        # Los umbrales estan en orden descendente: el primero factible es el mas alto
+        return int(feasible[0])
+    if strategy == "precision":
+        feasible = np.flatnonzero(sweep["precision"] >= target_precision)
+        if feasible.size == 0:
+            raise ValueError(f"Ningun umbral alcanza precision >= {target_precision}")
+        return int(feasible[np.argmax(sweep["recall"][feasible])])
+    raise ValueError("threshold.strategy debe ser 'cost', 'recall' o 'precision'.")
+
+
+def point_summary(sweep: Dict[str, np.ndarray], idx: int) -> Dict[str, Any]:
+    """Metricas del barrido en un indice concreto, serializables a JSON."""
+    return {
+        "threshold": float(sweep["thresholds"][idx]),
+        "precision": float(sweep["precision"][idx]),
+        "recall": float(sweep["recall"][idx]),
+        "f1": float(sweep["f1"][idx]),
+        "expected_cost": float(sweep["cost"][idx]),
+        "true_positives": int(sweep["tp"][idx]),
+        "false_positives": int(sweep["fp"][idx]),
+        "false_negatives": int(sweep["fn"][idx]),
+        "true_negatives": int(sweep["tn"][idx]),
+    }
+
+
+def plot_threshold_sweep(sweep: Dict[str, np.ndarray], chosen: float, out_path: str):
+    """Grafica costo esperado, precision y recall en funcion del umbral"""
+    fig, ax_cost = plt.subplots(figsize=(10, 7))
+    ax_cost.plot(sweep["thresholds"], sweep["cost"], color='darkred', lw=2, label='Costo esperado')
+    ax_cost.set_xlabel('Umbral de decision', fontsize=12)
+    ax_cost.set_ylabel('Costo esperado', fontsize=12)
+    ax_cost.set_xlim([0.0, 1.0])
+
+    ax_rate = ax_cost.twinx()
+    ax_rate.plot(sweep["thresholds"], sweep["precision"], color='blue', lw=1.5, label='Precision')
+    ax_rate.plot(sweep["thresholds"], sweep["recall"], color='green', lw=1.5, label='Recall')
+    ax_rate.set_ylabel('Precision / Recall', fontsize=12)
+    ax_rate.set_ylim([0.0, 1.05])
+
+    ax_cost.axvline(chosen, color='black', linestyle='--', lw=1.5, label=f'Umbral elegido ({chosen:.3f})')
+    lines = ax_cost.get_legend_handles_labels()
+    rates = ax_rate.get_legend_handles_labels()
+    ax_cost.legend(lines[0] + rates[0], lines[1] + rates[1], loc="upper center", fontsize=11)
+    plt.title('Barrido de Umbrales de Decision', fontsize=14, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+    print(f"[OK] Barrido de umbrales guardado: {out_path}")
+
+
+def main():
+    """Funcion principal de optimizacion del umbral"""
+    print("="*80)
+    print("OPTIMIZACION DEL UMBRAL DE DECISION - TELCOVISION")
+    print("="*80)
+
+    params = load_params()
+    cfg = params.get("threshold", {}) or {}
+    strategy = cfg.get("strategy", "cost")
+    costs = {**DEFAULT_COSTS, **(cfg.get("costs", {}) or {})}
+    target_recall = float(cfg.get("target_recall", 0.8))
+    target_precision = float(cfg.get("target_precision", 0.6))
+    policy_path = Path(params.get("paths", {}).get("decision_policy_path", DEFAULT_POLICY_PATH))
+
+    print("\n[INFO] Cargando modelo y datos...")
+    model, X_test, y_test = load_artifacts()
+    version = model_version(params.get("paths", {}).get("model_path", "models/model.joblib"))
+    calibrator = load_calibrator(params.get("paths", {}).get("calibrator_path", DEFAULT_CALIBRATOR_PATH), version)
+    # El umbral se optimiza sobre la misma escala que usa el scoring (calibrada si hay calibrador)
+    y_proba = apply_calibration(model.predict_proba(X_test)[:, 1], calibrator)
+    print(f"[OK] Probabilidades de test: {len(y_proba)} muestras "
+          f"(calibrador: {calibrator['method'] if calibrator else 'ninguno'})")
+
+    sweep = sweep_thresholds(y_test, y_proba, costs)
+    idx = select_threshold(sweep, strategy, target_recall, target_precision)
+    default_idx = int(np.searchsorted(-sweep["thresholds"], -DEFAULT_THRESHOLD, side="right") - 1)
+
+    chosen = point_summary(sweep, idx)
+    policy = {
+        "threshold": chosen["threshold"],
+        "model_version": version,
+        "strategy": strategy,
+        "costs": costs,
+        "target_recall": target_recall,
+        "target_precision": target_precision,
+        "n_thresholds_evaluated": int(sweep["thresholds"].size),
+        "at_threshold": chosen,
+        "at_default_0_5": point_summary(sweep, max(default_idx, 0)),
+    }
+
+    policy_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(policy_path, "w", encoding="utf-8") as f:
+        json.dump(policy, f, indent=4)
+    print(f"[OK] Politica de decision guardada: {policy_path}")
+
+    plot_path = 'plots/threshold_sweep.png'
+    Path(plot_path).parent.mkdir(parents=True, exist_ok=True)
+    plot_threshold_sweep(sweep, chosen["threshold"], plot_path)
+
+    print("\n" + "="*80)
+    print(f"Estrategia: {strategy}")
+    print(f"   Umbral elegido: {chosen['threshold']:.4f}")
+    print(f"   Precision:      {chosen['precision']:.4f}")
+    print(f"   Recall:         {chosen['recall']:.4f}")
+    print(f"   Costo esperado: {chosen['expected_cost']:.2f} "
+          f"(con 0.5: {policy['at_default_0_5']['expected_cost']:.2f})")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
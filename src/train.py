@@ -7,7 +7,21 @@ Entrenador de modelo para TelcoVision.
 - Entrena un modelo base (LogisticRegression o RandomForest, según params.yaml)
 - Calcula métricas: accuracy, precision, recall, f1, roc_auc
 - Guarda el modelo en `models/model.joblib` y las métricas en `models/metrics.json`
+- Precalcula el explainer (valores esperados / matrices de contribución) en `models/explainer.joblib`
+- Guarda las medianas de train de las numéricas en `imputation.json` junto al modelo (imputación
+  del scoring) y verifica que un cliente suelto con nulos se puntúe sin error
+- Si `oof_folds > 1`, guarda probabilidades out-of-fold de train + probabilidades de test
+  en `oof_predictions.csv` junto al modelo (las usa `stacking.py` sin reentrenar)
+- Mide el costo de serving (tamaño, carga, nodos, latencia p50/p99 por batch) en
+  `serving_cost.json` junto al modelo (lo usa `run_experiments.py` para presupuestos)
 - Registra todo en MLflow (local o remoto según configuración)
+- Con `sampling.strategy` submuestrea train antes del fit (clase mayoritaria con pesos 1 / ratio,
+  o estratificado) para acortar el entrenamiento en datasets grandes
+- Con `segmentation.column` (o `--segment-by`) entrena además un modelo por segmento en paralelo y
+  guarda el router (`segment_router.joblib`) y la comparación con el global (`segment_metrics.json`);
+  sin columna ambos se escriben igual (router que delega en el global, `{"column": null}`)
+- Con `--seeds N` repite split + entrenamiento con N semillas en paralelo (`robustness.py`) y guarda
+  media e intervalos de confianza por métrica en `seed_metrics.json` junto a las métricas
 
 Uso:
 python src/train.py --params params.yaml
@@ -29,10 +43,22 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 )
-from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
+from data_prep import fit_fill_values, load_raw_from_params
+from ensemble import SegmentRouter
+from explain import build_explainer
+from predict import check_cache_hit, check_null_record
+from resources import cpu_budget
+from robustness import run_seeds
+from sampling import sample_training_set
+from score_cache import model_version
+from segments import fit_segment_router
+from serving_cost import DEFAULT_BATCH_SIZES, save_serving_cost
+
 
 # ---------- Utilidades ----------
 
@@ -98,11 +124,19 @@ def resolve_config(params: Dict[str, Any], cli: argparse.Namespace) -> Dict[str,
         "input_path": Path(cli.input) if cli.input else Path(paths.get("processed_data", "")),
         "model_path": Path(cli.out) if cli.out else Path(paths.get("model_path", "models/model.joblib")),
         "metrics_path": Path(cli.metrics) if cli.metrics else Path(paths.get("metrics_path", "models/metrics.json")),
+        "explainer_path": Path(paths["explainer_path"]) if paths.get("explainer_path") else None,
         "target": cli.target or target,
         "test_size": cli.test_size if cli.test_size is not None else float(test_size),
         "random_state": cli.random_state if cli.random_state is not None else int(random_state),
         "model_cfg": model_cfg,
+        "oof_folds": int(params.get("oof_folds", 0) or 0),
+        "serving_batch_sizes": list((params.get("serving_cost") or {}).get("batch_sizes", DEFAULT_BATCH_SIZES)),
+        "segmentation": dict(params.get("segmentation") or {}),
+        "sql_source": dict(params.get("sql_source") or {}),
+        "sampling": dict(params.get("sampling") or {}),
     }
+    if getattr(cli, "segment_by", None):
+        cfg["segmentation"]["column"] = cli.segment_by
     
     if not cfg["input_path"] or not str(cfg["input_path"]):
         raise ValueError("No se definió la ruta de datos procesados (paths.processed_data o --input).")
@@ -120,7 +154,9 @@ def build_pipeline_from_params(model_cfg: Dict[str, Any], random_state: int) ->
 
     if mtype == "RandomForest":
         params.setdefault("n_estimators", 100)
-        params.setdefault("n_jobs", -1)
+        # Todos los cores del presupuesto (resources.py), no -1: un train lanzado por un proceso
+        # paralelo (experimentos, folds) hereda sólo su parte
+        params.setdefault("n_jobs", cpu_budget())
         model = RandomForestClassifier(**params)
     elif mtype == "LogisticRegression":
         params.setdefault("max_iter", 200)
@@ -135,15 +171,19 @@ def build_pipeline_from_params(model_cfg: Dict[str, Any], random_state: int) ->
     return pipe
 
 
-def evaluate(model: Pipeline, X_test: pd.DataFrame, y_test: pd.Series) -> Dict[str, Any]:
-    y_pred = model.predict(X_test)
-
+def evaluate(model: Pipeline, X_test: pd.DataFrame, y_test: pd.Series, threshold: float = 0.5) -> Dict[str, Any]:
     # Probabilidades (si el estimador las soporta)
     try:
         proba = model.predict_proba(X_test)
     except Exception:
         proba = None
 
+    # Caso binario: la clase sale de las probabilidades, sin una segunda pasada por el modelo
+    if proba is not None and proba.ndim == 2 and proba.shape[1] == 2:
+        y_pred = model.classes_[(proba[:, 1] >= threshold).astype(int)]
+    else:
+        y_pred = model.predict(X_test)
+
     metrics: Dict[str, Any] = {
         "accuracy": float(accuracy_score(y_test, y_pred)),
         "precision": float(precision_score(y_test, y_pred, zero_division=0)),
@@ -165,6 +205,32 @@ def evaluate(model: Pipeline, X_test: pd.DataFrame, y_test: pd.Series) -> Dict[s
     return metrics
 
 
+def save_oof_predictions(model: Pipeline, X_train: pd.DataFrame, y_train: pd.Series,
+                         X_test: pd.DataFrame, y_test: pd.Series, folds: int,
+                         random_state: int, out_path: Path, sample_weight=None) -> None:
+    """
+    Probabilidades out-of-fold sobre train (K clones del pipeline) y del modelo final sobre test.
+
+    `row_id` es el índice del dataset procesado: con el mismo split, las filas de distintos
+    experimentos quedan alineadas para el meta-modelo de stacking. Con train submuestreado
+    (`sample_weight`) los clones se ajustan con los mismos pesos y se guarda la columna `weight`.
+    """
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state)
+    fit_params = {"model__sample_weight": sample_weight} if sample_weight is not None else None
+    oof = cross_val_predict(clone(model), X_train, y_train, cv=cv, method="predict_proba",
+                            fit_params=fit_params)[:, 1]
+    test_proba = model.predict_proba(X_test)[:, 1]
+    train_frame = pd.DataFrame({"row_id": X_train.index, "split": "train", "y_true": y_train.to_numpy(), "proba": oof})
+    test_frame = pd.DataFrame({"row_id": X_test.index, "split": "test", "y_true": y_test.to_numpy(), "proba": test_proba})
+    if sample_weight is not None:
+        train_frame["weight"] = sample_weight
+        test_frame["weight"] = 1.0
+    frame = pd.concat([train_frame, test_frame], ignore_index=True)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(out_path, index=False)
+    print(f"[SAVE] Predicciones out-of-fold ({folds} folds) guardadas: {out_path}")
+
+
 def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dict[str, Any]]:
     inp: Path = cfg["input_path"]
     model_path: Path = cfg["model_path"]
@@ -204,6 +270,16 @@ def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dic
     print(f"Train: {X_train.shape[0]} samples")
     print(f"Test: {X_test.shape[0]} samples")
 
+    # Submuestreo opcional de train (los pesos mantienen las probabilidades en la tasa base original)
+    sampling_cfg = cfg["sampling"]
+    X_fit, y_fit, sample_weight = sample_training_set(
+        X_train, y_train, sampling_cfg.get("strategy", "none"), float(sampling_cfg.get("ratio", 1.0)), random_state
+    )
+    fit_params = {"model__sample_weight": sample_weight} if sample_weight is not None else {}
+    if len(y_fit) < len(y_train):
+        print(f"Submuestreo '{sampling_cfg.get('strategy')}' (ratio {sampling_cfg.get('ratio')}): "
+              f"{len(y_fit)} filas de fit, distribución {y_fit.value_counts().to_dict()}")
+
     model = build_pipeline_from_params(model_cfg, random_state)
 
     if use_mlflow:
@@ -238,11 +314,14 @@ def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dic
             mlflow.log_param("target", target)
             mlflow.log_param("n_features", X_train.shape[1])
             mlflow.log_param("n_samples_train", X_train.shape[0])
+            mlflow.log_param("sampling_strategy", sampling_cfg.get("strategy", "none"))
+            mlflow.log_param("sampling_ratio", sampling_cfg.get("ratio", 1.0))
+            mlflow.log_param("n_samples_fit", len(y_fit))
             mlflow.log_param("n_samples_test", X_test.shape[0])
 
             # Entrenar
             print("\n[TRAIN] Entrenando modelo...")
-            model.fit(X_train, y_train)
+            model.fit(X_fit, y_fit, **fit_params)
             print("[TRAIN] OK - Entrenamiento completado")
             
             # Evaluar
@@ -258,6 +337,8 @@ def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dic
             model_path.parent.mkdir(parents=True, exist_ok=True)
             joblib.dump(model, model_path)
             print(f"[SAVE] Modelo guardado: {model_path}")
+            # Huella del artefacto: register_best_model.py la compara con la de umbral y calibrador
+            mlflow.set_tag("model_version", model_version(str(model_path)))
             
             # Guardar metricas localmente
             metrics_path.parent.mkdir(parents=True, exist_ok=True)
@@ -306,7 +387,7 @@ def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dic
     else:
         print("\n[INFO] MLflow desactivado - entrenamiento sin tracking")
         
-        model.fit(X_train, y_train)
+        model.fit(X_fit, y_fit, **fit_params)
         metrics = evaluate(model, X_test, y_test)
 
         model_path.parent.mkdir(parents=True, exist_ok=True)
@@ -318,6 +399,55 @@ def train_and_save(cfg: Dict[str, Any], use_mlflow: bool) -> Tuple[Pipeline, Dic
             json.dump(metrics, f, indent=2)
         print(f"[SAVE] Métricas guardadas: {metrics_path}")
 
+    # Explainer precalculado con el fondo de train (explicaciones por cliente en scoring)
+    explainer_path: Path = cfg["explainer_path"] or model_path.with_name("explainer.joblib")
+    explainer_path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(build_explainer(model, X_train), explainer_path)
+    print(f"[SAVE] Explainer guardado: {explainer_path}")
+
+    # Medianas de train para imputar en scoring (un lote chico no tiene medianas propias)
+    fill_values = fit_fill_values(X_train)
+    imputation_path = model_path.with_name("imputation.json")
+    with open(imputation_path, "w", encoding="utf-8") as f:
+        json.dump(fill_values, f, indent=2)
+    print(f"[SAVE] Medianas de imputación guardadas: {imputation_path}")
+    print(f"[OK] Scoring de 1 registro con nulos: p={check_null_record(model, fill_values):.4f}")
+    check_cache_hit(model, fill_values)
+    print("[OK] Cache de scoring: mismo cliente en un chunk con nulos -> hit")
+
+    if cfg["oof_folds"] > 1:
+        save_oof_predictions(model, X_fit, y_fit, X_test, y_test, cfg["oof_folds"],
+                             random_state, model_path.with_name("oof_predictions.csv"), sample_weight)
+
+    if cfg["serving_batch_sizes"]:
+        save_serving_cost(model_path, X_test, model_path.with_name("serving_cost.json"), cfg["serving_batch_sizes"])
+
+    seg_cfg = cfg["segmentation"]
+    router_path = model_path.with_name("segment_router.joblib")
+    if seg_cfg.get("column"):
+        column = seg_cfg["column"]
+        print(f"\n[TRAIN] Modelos por segmento de '{column}'...")
+        raw = load_raw_from_params({"sql_source": cfg["sql_source"]},
+                                   seg_cfg.get("raw_data", "data/raw/telco_churn.csv"))
+        raw.columns = [c.strip().lower() for c in raw.columns]
+        # Mismas filas y pesos que el global (submuestreo) para que la comparación sea justa
+        router, seg_report = fit_segment_router(
+            model, X_fit, y_fit, X_test, y_test, model_cfg, column,
+            int(seg_cfg.get("min_rows", 500)), int(seg_cfg.get("n_jobs", -1)), random_state,
+            sample_weight, raw[column]
+        )
+    else:
+        # Sin segmentación el router delega todo en el global: los outs del stage existen siempre
+        router, seg_report = SegmentRouter(None, {}, model, X_train.columns), {"column": None}
+    joblib.dump(router, router_path)
+    with open(metrics_path.with_name("segment_metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(seg_report, f, indent=2, ensure_ascii=False)
+    if seg_cfg.get("column"):
+        print(f"[SAVE] Router por segmento guardado: {router_path} "
+              f"({len(router.segment_models)} modelos + respaldo global)")
+        print(f"[EVAL] ROC-AUC test: global {seg_report['roc_auc_global']:.4f} | "
+              f"por segmento {seg_report['roc_auc_routed']:.4f}")
+
     return model, metrics
 
 
@@ -333,6 +463,11 @@ def parse_args() -> argparse.Namespace:
     ap.add_argument("--test-size", type=float, help="Tamaño del set de test (override de params.test_size)")
     ap.add_argument("--random-state", type=int, help="Semilla aleatoria (override de params.random_state)")
     ap.add_argument("--no-mlflow", action="store_true", help="Desactiva MLflow aunque esté disponible")
+    ap.add_argument("--segment-by", help="Entrenar también un modelo por valor de esta columna (override de segmentation.column)")
+    ap.add_argument("--seeds", type=int, default=0, help="Corridas extra con N semillas (split + modelo) para IC")
+    ap.add_argument("--seed-jobs", type=int, default=-1, help="Procesos para las corridas multi-semilla (default: -1)")
+    ap.add_argument("--ci-tol", type=float, default=0.005,
+                    help="Cortar antes de N semillas cuando el semiancho del IC de todas las métricas es <= este valor")
     return ap.parse_args()
 
 
@@ -348,6 +483,21 @@ def main():
 
     model, metrics = train_and_save(cfg, use_mlflow)
 
+    if args.seeds > 1:
+        print(f"\n[INFO] Corridas multi-semilla (hasta {args.seeds}, IC 95%, tolerancia {args.ci_tol})...")
+        df = pd.read_csv(cfg["input_path"])
+        seed_results = run_seeds(
+            df.drop(columns=[cfg["target"]]), df[cfg["target"]], cfg["model_cfg"], cfg["test_size"],
+            args.seeds, cfg["random_state"], args.seed_jobs, args.ci_tol
+        )
+        seed_path = cfg["metrics_path"].with_name("seed_metrics.json")
+        with open(seed_path, "w", encoding="utf-8") as f:
+            json.dump(seed_results, f, indent=2)
+        print(f"[SAVE] Métricas multi-semilla guardadas: {seed_path} "
+              f"({seed_results['n_seeds_run']} semillas{', corte temprano' if seed_results['stopped_early'] else ''})")
+        for name, ci in seed_results["summary"].items():
+            print(f"  {name:12s}: {ci['mean']:.4f} [{ci['ci_low']:.4f}, {ci['ci_high']:.4f}]")
+
     print(f"\n{'='*80}")
     print("RESUMEN FINAL")
     print(f"{'='*80}")
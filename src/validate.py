@@ -0,0 +1,183 @@
+"""
+validate.py
+
+Validacion del dataset crudo de TelcoVision contra un esquema declarado (seccion `validation.schema`).
+- Chequea por columna: tipo (numerico/entero/texto), rango [min, max], categorias permitidas,
+  unicidad (`customer_id`) y proporcion maxima de nulos; ademas columnas faltantes/inesperadas
+- Una sola pasada vectorizada por chunk (`pd.read_csv(..., chunksize)`, todo leido como texto para
+  distinguir "vacio" de "no parseable"); la unicidad entre chunks usa hashes de 64 bits
+- Reporte compacto con conteos y algunos ejemplos por problema en `validation.report_path`
+- Sale con codigo 1 si hay errores (el pipeline DVC se corta antes de `data_prep`/`train`);
+  con `--fail-fast` deja de leer en el primer chunk con errores
+
+Uso:
+python src/validate.py --input data/raw/telco_churn.csv
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import yaml
+
+
+class ColumnStats:
+    """Acumuladores de una columna a lo largo de los chunks."""
+
+    def __init__(self, name: str, rule: Dict[str, Any], max_examples: int):
+        self.name = name
+        self.rule = rule
+        self.max_examples = max_examples
+        self.n_null = 0
+        self.counts = {"invalid_type": 0, "out_of_range": 0, "unknown_category": 0, "duplicated": 0}
+        self.examples: Dict[str, List[Any]] = {k: [] for k in self.counts}
+        self.hashes: List[np.ndarray] = []
+
+    def _record(self, kind: str, bad: pd.Series):
+        n = int(bad.size)
+        if not n:
+            return
+        self.counts[kind] += n
+        room = self.max_examples - len(self.examples[kind])
+        if room > 0:
+            self.examples[kind] += [v for v in pd.unique(bad)[:room].tolist() if v not in self.examples[kind]]
+
+    def update(self, col: pd.Series):
+        null = col.isna() | (col.str.strip() == "")
+        self.n_null += int(null.sum())
+        values = col[~null].str.strip()
+        kind = self.rule.get("type", "string")
+
+        if kind in ("numeric", "integer"):
+            num = pd.to_numeric(values, errors="coerce")
+            self._record("invalid_type", values[num.isna()])
+            if kind == "integer":
+                self._record("invalid_type", values[num.notna() & (num % 1 != 0)])
+            lo, hi = self.rule.get("min", -np.inf), self.rule.get("max", np.inf)
+            self._record("out_of_range", values[(num < lo) | (num > hi)])
+            allowed = self.rule.get("allowed")
+            if allowed is not None:
+                self._record("unknown_category", values[num.notna() & ~num.isin(allowed)])
+        else:
+            allowed = self.rule.get("allowed")
+            if allowed is not None:
+                self._record("unknown_category", values[~values.isin([str(a) for a in allowed])])
+
+        if self.rule.get("unique", False):
+            self._record("duplicated", values[values.duplicated(keep="first")])
+            self.hashes.append(pd.util.hash_array(values.to_numpy(dtype=object)))
+
+    def finalize(self, n_rows: int) -> Dict[str, Any]:
+        if self.hashes:
+            # Conteo global (incluye duplicados entre chunks; los ejemplos son sólo de dentro de un chunk)
+            all_hashes = np.concatenate(self.hashes)
+            self.counts["duplicated"] = int(all_hashes.size - np.unique(all_hashes).size)
+        null_ratio = self.n_null / n_rows if n_rows else 0.0
+        errors = {k: v for k, v in self.counts.items() if v}
+        max_null = self.rule.get("max_null_ratio", 0.0)
+        if null_ratio > max_null:
+            errors["null_ratio"] = round(null_ratio, 6)
+        return {
+            "n_null": self.n_null,
+            "null_ratio": round(null_ratio, 6),
+            **({"errors": errors, "examples": {k: v for k, v in self.examples.items() if v}} if errors else {}),
+            "status": "error" if errors else "ok",
+        }
+
+
+def validate_file(path: str, schema: Dict[str, Dict[str, Any]], chunksize: int = 200_000,
+                  fail_fast: bool = False, allow_extra_columns: bool = True,
+                  max_examples: int = 5) -> Dict[str, Any]:
+    """Valida el CSV por chunks y devuelve el reporte (no lanza excepciones por datos invalidos)."""
+    t0 = time.perf_counter()
+    stats = {name: ColumnStats(name, rule or {}, max_examples) for name, rule in schema.items()}
+    n_rows, n_chunks = 0, 0
+    header: List[str] = []
+    stopped_early = False
+
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=True):
+        chunk.columns = [c.strip().lower() for c in chunk.columns]
+        if not header:
+            header = list(chunk.columns)
+            missing = [c for c in schema if c not in header]
+            if missing:
+                # Sin las columnas del esquema no tiene sentido seguir leyendo
+                return _report(path, n_rows, n_chunks, header, schema, stats, missing, allow_extra_columns,
+                               time.perf_counter() - t0, stopped_early=True)
+        n_rows += len(chunk)
+        n_chunks += 1
+        for name, st in stats.items():
+            st.update(chunk[name])
+        if fail_fast and any(any(st.counts.values()) for st in stats.values()):
+            stopped_early = True
+            break
+
+    return _report(path, n_rows, n_chunks, header, schema, stats, [], allow_extra_columns,
+                   time.perf_counter() - t0, stopped_early)
+
+
+def _report(path: str, n_rows: int, n_chunks: int, header: List[str], schema: Dict[str, Any],
+            stats: Dict[str, ColumnStats], missing: List[str], allow_extra_columns: bool,
+            seconds: float, stopped_early: bool) -> Dict[str, Any]:
+    columns = {name: st.finalize(n_rows) for name, st in stats.items() if name not in missing}
+    extra = [c for c in header if c not in schema]
+    problems = [f"columna faltante: {c}" for c in missing]
+    if extra and not allow_extra_columns:
+        problems += [f"columna inesperada: {c}" for c in extra]
+    problems += [f"{name}: {', '.join(res['errors'])}" for name, res in columns.items() if res["status"] == "error"]
+    return {
+        "input": str(path),
+        "status": "error" if problems else "ok",
+        "n_rows": n_rows,
+        "n_chunks": n_chunks,
+        "stopped_early": stopped_early,
+        "seconds": round(seconds, 3),
+        "missing_columns": missing,
+        "extra_columns": extra,
+        "problems": problems,
+        "columns": columns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validar el dataset crudo contra el esquema de params.yaml")
+    parser.add_argument("--input", help="CSV crudo (override de validation.input)")
+    parser.add_argument("--params", default="params.yaml", help="Ruta al params.yaml (seccion validation)")
+    parser.add_argument("--report", help="Reporte JSON (override de validation.report_path)")
+    parser.add_argument("--chunksize", type=int, help="Filas por chunk (override de validation.chunksize)")
+    parser.add_argument("--fail-fast", action="store_true", help="Cortar en el primer chunk con errores")
+    args = parser.parse_args()
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        cfg = (yaml.safe_load(f) or {}).get("validation", {}) or {}
+    input_path = args.input or cfg.get("input", "data/raw/telco_churn.csv")
+    report_path = Path(args.report or cfg.get("report_path", "metrics/validation.json"))
+
+    print(f"[INFO] Validando {input_path}...")
+    report = validate_file(
+        input_path, cfg.get("schema", {}), args.chunksize or int(cfg.get("chunksize", 200_000)),
+        args.fail_fast or bool(cfg.get("fail_fast", False)), bool(cfg.get("allow_extra_columns", True)),
+        int(cfg.get("max_examples", 5)),
+    )
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"[INFO] Filas: {report['n_rows']:,} | Chunks: {report['n_chunks']} | Tiempo: {report['seconds']:.2f}s")
+    print(f"[SAVE] Reporte guardado: {report_path}")
+    if report["status"] == "error":
+        print("[WARN] Validacion fallida:")
+        for p in report["problems"]:
+            print(f"   - {p}")
+        return 1
+    print("[OK] Dataset valido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())